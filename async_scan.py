@@ -0,0 +1,118 @@
+import asyncio
+import aiohttp
+import ccxt.async_support as ccxt_async
+import config
+from ratelimit import RateLimiter
+
+"""
+	Asynchronous scan loop.
+	Order books are fetched with ccxt.async_support on one shared aiohttp
+	session with keep-alive connections, so hundreds of requests can be in
+	flight at once while the shared RateLimiter of the exchange keeps them
+	within the rate limit. Each alt is
+	estimated as soon as its books arrive instead of waiting for a batch.
+	Estimations and executions still use the synchronous Crypto methods: the
+	fetched books are put in the Crypto cache, and estimations and executions
+	run in threads, so a book missing from the cache is fetched without
+	blocking the event loop. The asynchronous client uses the credentials of
+	the synchronous one.
+	For example:
+	scanner = AsyncScanner(crypto, crypto.binance, UniverseManager(crypto, crypto.binance).refresh(), process)
+	asyncio.run(scanner.run())
+"""
+class AsyncScanner:
+
+	"""
+		crypto:		the Crypto instance used for estimations and executions.
+		exchange:	the synchronous ccxt exchange we scan.
+		alts:		the alts to scan.
+		process:	function(alt) called in a thread when an estimation is
+					above the threshold.
+	"""
+	def __init__(self, crypto, exchange, alts, process):
+		self.crypto = crypto
+		self.exchange = exchange
+		self.alts = list(alts)
+		self.process = process
+		self.semaphore = None
+		self.session = None
+		self.client = None
+		self.busy = set()
+
+	"""
+		Open the shared session and the asynchronous client.
+	"""
+	async def open(self):
+		self.semaphore = asyncio.Semaphore(config.ASYNC_CONCURRENCY)
+		connector = aiohttp.TCPConnector(limit=config.ASYNC_CONNECTIONS, keepalive_timeout=60, ttl_dns_cache=300)
+		self.session = aiohttp.ClientSession(connector=connector)
+		self.client = getattr(ccxt_async, self.exchange.id)({
+			'apiKey': getattr(self.exchange, 'apiKey', None),
+			'secret': getattr(self.exchange, 'secret', None),
+			'timeout': 30000,
+			'enableRateLimit': True,
+			'session': self.session,
+		})
+		RateLimiter(self.client, self.crypto.log).install()
+
+	"""
+		Close the client and the session.
+	"""
+	async def close(self):
+		await self.client.close()
+		await self.session.close()
+
+	"""
+		Fetch an order book and put it in the Crypto cache.
+		returns:	True if success.
+	"""
+	async def fetch_order_book(self, asset1, asset2):
+		async with self.semaphore:
+			try:
+				with self.crypto.metrics.timer('fetch_order_book', self.exchange, '{}/{}'.format(asset1, asset2)):
+					book = await self.client.fetch_order_book('{}/{}'.format(asset1, asset2))
+			except Exception as e:
+				self.crypto.log("Error while fetching order book for {}/{}: {}".format(asset1, asset2, str(e)))
+				return False
+		self.crypto.cache_order_book(self.exchange, asset1, asset2, book)
+		return True
+
+	"""
+		Estimate both arbitrages of an alt. Runs in a thread.
+		returns:	the forward and backward estimations.
+	"""
+	def estimate(self, alt):
+		return self.crypto.estimate_arbitrage_forward(self.exchange, alt), self.crypto.estimate_arbitrage_backward(self.exchange, alt)
+
+	"""
+		Fetch the books of an alt, estimate both arbitrages and process the
+		alt if one of them is above the threshold.
+	"""
+	async def scan_asset(self, alt):
+		results = await asyncio.gather(self.fetch_order_book(alt, 'ETH'), self.fetch_order_book(alt, 'BTC'))
+		if (not all(results)):
+			return
+		delta_forward, delta_backward = await asyncio.get_running_loop().run_in_executor(None, self.estimate, alt)
+		self.crypto.log("{:10} / {:5}: {:8.4f}% / {:8.4f}%".format(str(self.exchange), alt, delta_forward, delta_backward))
+		if (max(delta_forward, delta_backward) > config.THRESHOLD and alt not in self.busy):
+			self.busy.add(alt)
+			asyncio.get_running_loop().run_in_executor(None, self.process, alt).add_done_callback(lambda _: self.busy.discard(alt))
+
+	"""
+		Scan every alt once, all of them in flight at the same time.
+	"""
+	async def scan(self):
+		await self.fetch_order_book('ETH', 'BTC')
+		await asyncio.gather(*[self.scan_asset(alt) for alt in self.alts])
+
+	"""
+		Scan until stop is set.
+		stop:	an optional threading.Event.
+	"""
+	async def run(self, stop=None):
+		await self.open()
+		try:
+			while (not stop or not stop.is_set()):
+				await self.scan()
+		finally:
+			await self.close()
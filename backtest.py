@@ -0,0 +1,474 @@
+"""
+	Replay backtester.
+	Recorded books (see recorder.py) are replayed through the real estimation
+	and execution code of the Crypto class. The exchange is replaced by a
+	simulated one that fills market orders on the replayed books and limit
+	orders when the replayed books cross them, and the clock is the timestamp
+	of the replayed records, so waiting for a limit order only means replaying
+	the next records. Each parameter set runs in its own process.
+	For example:
+	python3 backtest.py binance --days 2018-05-21 2018-05-22 --param THRESHOLD=-0.3,-0.2,0 --param WAIT_LIMIT_ORDER=1,3
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+import ccxt
+import numpy as np
+import config
+from book import Book, BookSide
+from crypto import Crypto
+from fees import FeeSchedule
+from fill import simulate_buy, simulate_sell
+from markets import MarketRegistry
+from recorder import BookReader, BID, SNAPSHOT, UPDATE, TICKER, GAP
+
+"""
+	Order books rebuilt from the recorded records, served like a depth stream.
+	After a GAP, the book of the symbol is unknown until its next snapshot, or
+	its next ticker if it only has tickers.
+"""
+class ReplayBooks:
+
+	def __init__(self):
+		self.books = {}
+		self.levels = {}
+		self.depth = set()
+		self.gaps = set()
+
+	"""
+		Apply the records of one symbol with the same timestamp and kind.
+		symbol:	the symbol of the records.
+		kind:	SNAPSHOT, UPDATE, TICKER or GAP.
+		sides:	an array of BID or ASK.
+		prices:	an array of prices.
+		sizes:	an array of sizes.
+	"""
+	def apply(self, symbol, kind, sides, prices, sizes):
+		bids = sides == BID
+		if (kind == GAP):
+			self.books.pop(symbol, None)
+			self.levels.pop(symbol, None)
+			self.gaps.add(symbol)
+		elif (kind == SNAPSHOT or (kind == TICKER and symbol not in self.depth)):
+			self.gaps.discard(symbol)
+			self.books[symbol] = Book(
+				BookSide(prices[bids], sizes[bids], descending=True, presorted=kind == SNAPSHOT),
+				BookSide(prices[~bids], sizes[~bids], descending=False, presorted=kind == SNAPSHOT)
+			)
+			self.levels.pop(symbol, None)
+			if (kind == SNAPSHOT):
+				self.depth.add(symbol)
+		elif (kind == UPDATE and symbol not in self.gaps):
+			if (symbol not in self.levels):
+				book = self.books.get(symbol)
+				self.levels[symbol] = (
+					dict(zip(book.bids.prices, book.bids.sizes)) if book else {},
+					dict(zip(book.asks.prices, book.asks.sizes)) if book else {}
+				)
+			for side, price, size in zip(sides, prices, sizes):
+				levels = self.levels[symbol][0 if side == BID else 1]
+				if (size == 0):
+					levels.pop(price, None)
+				else:
+					levels[price] = size
+			self.books.pop(symbol, None)
+			self.depth.add(symbol)
+
+	"""
+		Get the current book of a symbol, None if it has not been seen yet.
+	"""
+	def get_order_book(self, symbol):
+		if (symbol not in self.books and symbol in self.levels):
+			bids, asks = self.levels[symbol]
+			self.books[symbol] = Book(
+				BookSide(list(bids), list(bids.values()), descending=True),
+				BookSide(list(asks), list(asks.values()), descending=False)
+			)
+		return self.books.get(symbol)
+
+"""
+	Cursor over the recorded records of some days. Each step applies the
+	records of one symbol with the same timestamp and kind.
+"""
+class Replay:
+
+	def __init__(self, reader, exchange_id, days):
+		self.reader = reader
+		self.exchange_id = exchange_id
+		self.days = list(days)
+		self.books = ReplayBooks()
+		self.now = 0
+		self.events = self.groups()
+
+	def groups(self):
+		for day in self.days:
+			symbols = {symbol_id: symbol for symbol, symbol_id in self.reader.symbols(self.exchange_id, day).items()}
+			records = self.reader.records(self.exchange_id, day)
+			if (len(records) == 0):
+				continue
+			keys = np.vstack((records['timestamp'], records['symbol'], records['kind']))
+			bounds = np.concatenate(([0], np.flatnonzero((keys[:, 1:] != keys[:, :-1]).any(axis=0)) + 1, [len(records)]))
+			for start, end in zip(bounds[:-1], bounds[1:]):
+				group = records[start:end]
+				yield float(group['timestamp'][0]), symbols[int(group['symbol'][0])], int(group['kind'][0]), group['side'], group['price'], group['size']
+
+	"""
+		Apply the next records.
+		returns:	the symbol that changed, None at the end of the data.
+	"""
+	def step(self):
+		event = next(self.events, None)
+		if (event is None):
+			return None
+		self.now, symbol, kind, sides, prices, sizes = event
+		self.books.apply(symbol, kind, sides, prices, sizes)
+		return symbol
+
+"""
+	Simulated ccxt exchange trading on the replayed books.
+	Market orders take the replayed book. A limit order is filled by the size
+	available at its price or better, when the replayed book crosses it. What
+	fills when the order is placed pays the taker fee, what fills it while it
+	rests pays the maker fee.
+"""
+class ReplayExchange:
+
+	def __init__(self, exchange_id, replay, balances):
+		self.id = exchange_id
+		self.replay = replay
+		self.balances = dict(balances)
+		self.has = {}
+		self.precisionMode = ReplayExchange.precision_mode(exchange_id)
+		self.markets = {}
+		self.orders = {}
+		self.fee = lambda side, symbol, liquidity: 1
+
+	"""
+		Get the precision mode of the live ccxt client, the markets cache has
+		been written in this mode.
+	"""
+	@staticmethod
+	def precision_mode(exchange_id):
+		if (hasattr(ccxt, exchange_id)):
+			return getattr(ccxt, exchange_id)().precisionMode
+		return MarketRegistry.DECIMAL_PLACES
+
+	def __str__(self):
+		for name, (client, _, _) in Crypto.CLIENTS.items():
+			if (client == self.id):
+				return name.capitalize()
+		return self.id
+
+	"""
+		Load the markets from the cache of the markets registry, or allow every
+		recorded symbol if there is none.
+	"""
+	def load_markets(self, reload=False):
+		path = os.path.join(config.MARKETS_CACHE_DIRECTORY, 'markets_{}.json'.format(self.id))
+		if (os.path.isfile(path)):
+			with open(path, 'r') as file:
+				self.markets = json.load(file)
+		else:
+			symbols = set()
+			for day in self.replay.days:
+				symbols |= set(self.replay.reader.symbols(self.id, day))
+			self.markets = {symbol: {'symbol': symbol, 'active': True} for symbol in symbols}
+		return self.markets
+
+	def set_markets(self, markets):
+		self.markets = markets
+
+	"""
+		Update the balances with a fill.
+	"""
+	def settle(self, symbol, side, filled, price, liquidity):
+		base, quote = symbol.split('/')
+		fee = self.fee(side, symbol, liquidity)
+		if (side == 'buy'):
+			self.balances[base] = self.balances.get(base, 0) + filled * fee
+			self.balances[quote] = self.balances.get(quote, 0) - filled * price
+		else:
+			self.balances[base] = self.balances.get(base, 0) - filled
+			self.balances[quote] = self.balances.get(quote, 0) + filled * price * fee
+
+	def market_order(self, symbol, side, amount):
+		book = self.replay.books.get_order_book(symbol)
+		if (not book):
+			raise Exception("no book for {}".format(symbol))
+		if (side == 'buy'):
+			price, filled, _ = simulate_buy(book.asks, base_amount=amount)
+		else:
+			price, filled, _ = simulate_sell(book.bids, amount)
+		if (filled):
+			self.settle(symbol, side, filled, price, 'taker')
+		return {'id': None, 'symbol': symbol, 'side': side, 'amount': amount, 'filled': filled, 'average': price, 'status': 'closed'}
+
+	def createMarketBuyOrder(self, symbol, amount):
+		return self.market_order(symbol, 'buy', amount)
+
+	def createMarketSellOrder(self, symbol, amount):
+		return self.market_order(symbol, 'sell', amount)
+
+	def limit_order(self, symbol, side, amount, price):
+		order = {'id': str(len(self.orders) + 1), 'symbol': symbol, 'side': side, 'amount': amount, 'price': price, 'filled': 0, 'status': 'open'}
+		self.orders[order['id']] = order
+		self.match(order, 'taker')
+		return order
+
+	def createLimitBuyOrder(self, symbol, amount, price):
+		return self.limit_order(symbol, 'buy', amount, price)
+
+	def createLimitSellOrder(self, symbol, amount, price):
+		return self.limit_order(symbol, 'sell', amount, price)
+
+	"""
+		Fill an open limit order with what the current book offers at its
+		price or better.
+		liquidity:	taker when the order is placed, maker while it rests.
+	"""
+	def match(self, order, liquidity='maker'):
+		if (order['status'] != 'open'):
+			return
+		book = self.replay.books.get_order_book(order['symbol'])
+		if (not book):
+			return
+		available = book.asks.depth(order['price']) if order['side'] == 'buy' else book.bids.depth(order['price'])
+		filled = min(order['amount'], available) - order['filled']
+		if (filled > 0):
+			order['filled'] += filled
+			self.settle(order['symbol'], order['side'], filled, order['price'], liquidity)
+		if (order['filled'] >= order['amount'] * 0.999999):
+			order['status'] = 'closed'
+
+	def cancelOrder(self, order_id, symbol=None):
+		order = self.orders[order_id]
+		if (order['status'] == 'open'):
+			order['status'] = 'canceled'
+		return order
+
+	def fetchTicker(self, symbol):
+		book = self.replay.books.get_order_book(symbol)
+		if (not book or not book.bids or not book.asks):
+			raise Exception("no book for {}".format(symbol))
+		return {'symbol': symbol, 'bid': book.bids[0][0], 'ask': book.asks[0][0]}
+
+	def fetchOrderBook(self, symbol, limit=None):
+		raise Exception("no book for {}".format(symbol))
+
+	def fetchBalance(self):
+		return {'free': dict(self.balances)}
+
+"""
+	Balances of a replay, read from the ReplayExchange that settles the fills.
+"""
+class ReplayLedger:
+
+	def get(self, exchange, asset):
+		return exchange.balances.get(asset, 0)
+
+	def record_fill(self, exchange, asset1, asset2, side, filled, price, fee):
+		pass
+
+	def reconcile(self, exchange):
+		pass
+
+	def request_reconcile(self):
+		pass
+
+"""
+	Crypto running on a replay: the books come from the replay, the orders go
+	to a ReplayExchange and waiting for a limit order replays the records
+	until its timeout. It has no side effect outside of its process: it logs
+	nothing, records nothing and starts no thread.
+"""
+class ReplayCrypto(Crypto):
+
+	def __init__(self, exchange, replay):
+		self.exchange = exchange
+		self.replay = replay
+		self.trades = []
+		super().__init__([])
+		self.streams = {exchange.id: replay.books}
+		exchange.fee = lambda side, symbol, liquidity: self.get_fees(exchange, side, symbol, liquidity)
+
+	"""
+		The registry writes its cache in a temporary directory, so the markets
+		of the live bot are not replaced by the replayed ones.
+	"""
+	def init_markets(self):
+		self.markets = MarketRegistry(tempfile.mkdtemp())
+		self.fees = FeeSchedule(self.markets)
+
+	def init_logs(self):
+		pass
+
+	"""
+		The orders are filled by the ReplayExchange, which also keeps the balances.
+	"""
+	def init_orders(self):
+		self.ledger = ReplayLedger()
+
+	def init_recorder(self):
+		pass
+
+	def init_notifier(self):
+		pass
+
+	def init_metrics(self):
+		pass
+
+	def log(self, text, mode="log"):
+		pass
+
+	def get_price_cache(self, exchange, asset1, asset2):
+		return None
+
+	def get_order_book_cache(self, exchange, asset1, asset2):
+		return None
+
+	def cache_price(self, exchange, asset1, asset2, ticker):
+		pass
+
+	def cache_order_book(self, exchange, asset1, asset2, book):
+		return Book.from_ccxt(book)
+
+	"""
+		Replay the records until the order is filled or times out, with the
+		same partial fill handling as the live code.
+	"""
+	def wait_limit_order(self, exchange, order, asset1, asset2, timeout, undo):
+		deadline = self.replay.now + timeout
+		extended = False
+		while (order['status'] == 'open'):
+			if (self.replay.now >= deadline):
+				if (order['filled'] > 0 and not extended):
+					deadline += timeout * config.WAIT_TIMES_WHEN_FILLED
+					extended = True
+					continue
+				break
+			symbol = self.replay.step()
+			if (symbol is None):
+				break
+			if (symbol == order['symbol']):
+				exchange.match(order)
+		exchange.cancelOrder(order['id'])
+		if (order['status'] == 'closed'):
+			return True
+		if (order['filled'] > 0):
+			undo()
+		return False
+
+	def summarize_arbitrage(self, exchange, balance_before, asset):
+		self.trades.append({
+			'time': self.replay.now,
+			'asset': asset,
+			'diff': self.get_balance(exchange, 'ETH') - balance_before,
+		})
+
+"""
+	Get the alts of the recorded triangles.
+"""
+def get_alts(reader, exchange_id, days):
+	symbols = set()
+	for day in days:
+		symbols |= set(reader.symbols(exchange_id, day))
+	return sorted(symbol.split('/')[0] for symbol in symbols if symbol.endswith('/ETH') and symbol.replace('/ETH', '/BTC') in symbols and symbol != 'BTC/ETH')
+
+"""
+	Replay some days with one parameter set. Runs in a worker process, the
+	parameters are set in the config module of the process.
+	job:		(directory, exchange id, days, parameters).
+	returns:	the parameters with the results.
+"""
+def replay(job):
+	directory, exchange_id, days, params = job
+	for name, value in params.items():
+		setattr(config, name, value)
+	reader = BookReader(directory)
+	cursor = Replay(reader, exchange_id, days)
+	exchange = ReplayExchange(exchange_id, cursor, {'ETH': config.BACKTEST_BALANCE_ETH})
+	crypto = ReplayCrypto(exchange, cursor)
+	alts = get_alts(reader, exchange_id, days)
+	triangles = {}
+	for alt in alts:
+		for quote in ('ETH', 'BTC'):
+			triangles.setdefault('{}/{}'.format(alt, quote), set()).add(alt)
+	triangles['ETH/BTC'] = set(alts)
+	dirty = set()
+	last_scan = 0
+	estimations = 0
+	opportunities = 0
+	while True:
+		symbol = cursor.step()
+		if (symbol is None):
+			break
+		dirty |= triangles.get(symbol, set())
+		if (cursor.now - last_scan < config.BACKTEST_SCAN_INTERVAL):
+			continue
+		last_scan = cursor.now
+		scanned = dirty
+		dirty = set()
+		for alt in scanned:
+			delta_forward = crypto.estimate_arbitrage_forward(exchange, alt)
+			delta_backward = crypto.estimate_arbitrage_backward(exchange, alt)
+			estimations += 2
+			if (delta_forward > config.THRESHOLD):
+				opportunities += 1
+				crypto.run_arbitrage_forward(exchange, alt)
+			elif (delta_backward > config.THRESHOLD):
+				opportunities += 1
+				crypto.run_arbitrage_backward(exchange, alt)
+	diffs = [trade['diff'] for trade in crypto.trades]
+	return dict(params, **{
+		'estimations': estimations,
+		'opportunities': opportunities,
+		'trades': len(diffs),
+		'winning': sum(1 for diff in diffs if diff > 0),
+		'gain': sum(diffs),
+		'balance': exchange.balances,
+	})
+
+"""
+	Parse --param NAME=v1,v2 options into every combination of values.
+"""
+def parameter_sets(options):
+	names = []
+	values = []
+	for option in options:
+		name, choices = option.split('=', 1)
+		names.append(name)
+		values.append([json.loads(choice) for choice in choices.split(',')])
+	return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+"""
+	Main
+"""
+if (__name__ == "__main__"):
+	parser = argparse.ArgumentParser(description="Replay recorded books through the estimations and the execution.")
+	parser.add_argument('exchange', help="the ccxt id of the recorded exchange, for example binance")
+	parser.add_argument('--days', nargs='*', help="the days to replay, every recorded day by default")
+	parser.add_argument('--param', action='append', default=[], help="a config value to try, for example THRESHOLD=-0.3,-0.2")
+	parser.add_argument('--directory', default=config.RECORDER_DIRECTORY, help="the directory of the recorded books")
+	parser.add_argument('--processes', type=int, default=None, help="the number of worker processes, one per core by default")
+	parser.add_argument('--output', default='backtest.json', help="where to write the results")
+	args = parser.parse_args()
+	days = args.days or BookReader(args.directory).days(args.exchange)
+	jobs = [(args.directory, args.exchange, days, params) for params in parameter_sets(args.param)]
+	results = []
+	with multiprocessing.Pool(args.processes) as pool:
+		for result in pool.imap_unordered(replay, jobs):
+			print("{} -> {} trades ({} winning) on {} opportunities, gain {:.8f} ETH".format(
+				{name: result[name] for name in jobs[0][3]},
+				result['trades'],
+				result['winning'],
+				result['opportunities'],
+				result['gain']
+			))
+			results.append(result)
+	results.sort(key=lambda result: -result['gain'])
+	with open(args.output, 'w') as file:
+		json.dump(results, file, indent=4)
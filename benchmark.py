@@ -0,0 +1,353 @@
+"""
+	Benchmark suite of the detection and execution hot paths.
+	Everything runs in process against MockExchange, a deterministic ccxt-like
+	exchange with a configurable latency and book depth, so two runs on the
+	same machine can be compared. The results are written as JSON, and
+	--compare prints the change of every metric from a previous result file.
+	For example:
+	python3 benchmark.py --latency 0.02 --depth 100 --output benchmark.json
+	python3 benchmark.py --compare benchmark.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import config
+from crypto import Crypto
+from evaluator import TriangleEvaluator
+from logger import Notifier
+from markets import MarketRegistry
+from pool import WorkerPool
+
+"""
+	Deterministic in-process exchange. Books are generated once from the seed,
+	every call sleeps the configured latency. The alts are named ALT0, ALT1...
+	and their prices leave no arbitrage, unless misprice is called.
+"""
+class MockExchange:
+
+	def __init__(self, alts=50, depth=100, latency=0.0, seed=0):
+		self.id = 'mock'
+		self.latency = latency
+		self.depth = depth
+		self.precisionMode = MarketRegistry.DECIMAL_PLACES
+		self.has = {'fetchBidsAsks': True, 'fetchOrderBooks': True}
+		self.alts = ['ALT{}'.format(i) for i in range(alts)]
+		self.balances = {'ETH': 10.0, 'BTC': 0.0}
+		self.orders = {}
+		self.first_order = None
+		self.lock = threading.Lock()
+		generator = random.Random(seed)
+		self.mids = {'ETH/BTC': 0.05}
+		for alt in self.alts:
+			price = generator.uniform(0.0001, 0.1)
+			self.mids['{}/ETH'.format(alt)] = price
+			self.mids['{}/BTC'.format(alt)] = price * 0.05 * 0.998
+			self.balances[alt] = 0.0
+		self.books = {symbol: self.generate(mid) for symbol, mid in self.mids.items()}
+		self.markets = {symbol: {
+			'symbol': symbol,
+			'active': True,
+			'precision': {'amount': 8, 'price': 10},
+			'limits': {'amount': {'min': 0}, 'cost': {'min': 0}},
+			'maker': 0.001,
+			'taker': 0.001,
+		} for symbol in self.mids}
+
+	def __str__(self):
+		return 'Mock'
+
+	"""
+		Generate the levels of a book around a mid price.
+	"""
+	def generate(self, mid):
+		step = mid * 0.0005
+		return {
+			'bids': [[mid - step * (i + 1), 10.0 / (i + 1)] for i in range(self.depth)],
+			'asks': [[mid + step * (i + 1), 10.0 / (i + 1)] for i in range(self.depth)],
+		}
+
+	"""
+		Move the ALT/BTC book of an alt so the forward triangle makes about
+		percentage percents before fees.
+	"""
+	def misprice(self, alt, percentage):
+		symbol = '{}/BTC'.format(alt)
+		self.mids[symbol] = self.mids['{}/ETH'.format(alt)] * 0.05 * (1 + percentage / 100)
+		self.books[symbol] = self.generate(self.mids[symbol])
+
+	def wait(self):
+		if (self.latency):
+			time.sleep(self.latency)
+
+	def load_markets(self, reload=False):
+		self.wait()
+		return self.markets
+
+	def set_markets(self, markets):
+		self.markets = markets
+
+	"""
+		Copy a book like ccxt returns it.
+	"""
+	def copy(self, symbol, limit=None):
+		book = self.books[symbol]
+		return {'bids': [list(level) for level in book['bids'][:limit]], 'asks': [list(level) for level in book['asks'][:limit]], 'timestamp': None, 'nonce': None}
+
+	def fetchOrderBook(self, symbol, limit=None):
+		self.wait()
+		return self.copy(symbol, limit)
+
+	def fetchOrderBooks(self, symbols=None, limit=None):
+		self.wait()
+		return {symbol: self.copy(symbol, limit) for symbol in (symbols or self.books)}
+
+	def ticker(self, symbol):
+		book = self.books[symbol]
+		return {'symbol': symbol, 'bid': book['bids'][0][0], 'ask': book['asks'][0][0], 'bidVolume': book['bids'][0][1], 'askVolume': book['asks'][0][1]}
+
+	def fetchTicker(self, symbol):
+		self.wait()
+		return self.ticker(symbol)
+
+	def fetchBidsAsks(self, symbols=None):
+		self.wait()
+		return {symbol: self.ticker(symbol) for symbol in (symbols or self.books)}
+
+	def fetchBalance(self):
+		self.wait()
+		with self.lock:
+			return {'free': dict(self.balances)}
+
+	"""
+		Every order is filled at once at its price, or at the best price for a
+		market order. The time of the first order is kept.
+	"""
+	def order(self, symbol, side, amount, price=None):
+		self.wait()
+		with self.lock:
+			if (self.first_order is None):
+				self.first_order = time.time()
+			book = self.books[symbol]
+			price = price or (book['asks'][0][0] if side == 'buy' else book['bids'][0][0])
+			base, quote = symbol.split('/')
+			if (side == 'buy'):
+				self.balances[base] += amount * 0.999
+				self.balances[quote] -= amount * price
+			else:
+				self.balances[base] -= amount
+				self.balances[quote] += amount * price * 0.999
+			order = {'id': str(len(self.orders) + 1), 'symbol': symbol, 'side': side, 'amount': amount, 'price': price, 'average': price, 'filled': amount, 'status': 'closed'}
+			self.orders[order['id']] = order
+			return order
+
+	def createLimitBuyOrder(self, symbol, amount, price):
+		return self.order(symbol, 'buy', amount, price)
+
+	def createLimitSellOrder(self, symbol, amount, price):
+		return self.order(symbol, 'sell', amount, price)
+
+	def createMarketBuyOrder(self, symbol, amount):
+		return self.order(symbol, 'buy', amount)
+
+	def createMarketSellOrder(self, symbol, amount):
+		return self.order(symbol, 'sell', amount)
+
+	def fetchOrder(self, order_id, symbol=None):
+		self.wait()
+		return self.orders[order_id]
+
+	def cancelOrder(self, order_id, symbol=None):
+		self.wait()
+		return self.orders[order_id]
+
+"""
+	Null Telegram bot, the benchmark does not send anything.
+"""
+class NullBot:
+
+	def sendMessage(self, chat_id, text):
+		pass
+
+"""
+	Crypto without exchange clients nor Telegram, on the MockExchange.
+"""
+class BenchmarkCrypto(Crypto):
+
+	def __init__(self):
+		super().__init__([])
+
+	def init_notifier(self):
+		self.bot = NullBot()
+		self.notifier = Notifier(self.bot, None)
+
+	def init_metrics(self):
+		pass
+
+	def summarize_arbitrage(self, exchange, balance_before, asset):
+		self.ledger.reconcile(exchange)
+
+"""
+	Time a function called many times.
+	returns:	the mean time of a call in seconds.
+"""
+def timeit(function, count):
+	start = time.perf_counter()
+	for _ in range(count):
+		function()
+	return (time.perf_counter() - start) / count
+
+"""
+	Cost of a cache hit, a cache miss, and a get_order_book served by the cache.
+"""
+def bench_cache(crypto, exchange, count):
+	for alt in exchange.alts:
+		crypto.cache_order_book(exchange, alt, 'ETH', exchange.copy('{}/ETH'.format(alt)))
+	alt = exchange.alts[0]
+	return {
+		'cache_hit_ns': timeit(lambda: crypto.get_order_book_cache(exchange, alt, 'ETH'), count) * 1e9,
+		'cache_miss_ns': timeit(lambda: crypto.get_order_book_cache(exchange, 'MISSING', 'ETH'), count) * 1e9,
+		'get_order_book_cached_ns': timeit(lambda: crypto.get_order_book(exchange, alt, 'ETH', mode='asks'), count) * 1e9,
+	}
+
+"""
+	Estimations per second with every book in the cache, and vectorized
+	top of book evaluations per second.
+"""
+def bench_estimate(crypto, exchange, duration):
+	symbols = ['ETH/BTC'] + ['{}/{}'.format(alt, quote) for alt in exchange.alts for quote in ('ETH', 'BTC')]
+	count = 0
+	start = time.perf_counter()
+	while (time.perf_counter() - start < duration):
+		crypto.fetch_order_books(exchange, symbols)
+		for alt in exchange.alts:
+			crypto.estimate_arbitrage_forward(exchange, alt)
+			crypto.estimate_arbitrage_backward(exchange, alt)
+			count += 2
+	estimates = count / (time.perf_counter() - start)
+	evaluator = TriangleEvaluator(exchange.alts)
+	evaluator.update_tickers(exchange.fetchBidsAsks(symbols))
+	return {
+		'estimates_per_second': estimates,
+		'vectorized_evaluations_per_second': len(exchange.alts) * 2 / timeit(evaluator.evaluate, 100),
+	}
+
+"""
+	Time of one full sweep of the universe: bulk top of book, vectorized
+	filter, then every alt estimated by the worker pool with its books
+	fetched one by one, as when nothing is cached.
+"""
+def bench_sweep(crypto, exchange, threads):
+	symbols = ['ETH/BTC'] + ['{}/{}'.format(alt, quote) for alt in exchange.alts for quote in ('ETH', 'BTC')]
+	evaluator = TriangleEvaluator(exchange.alts)
+	crypto.flush_cache()
+	start = time.perf_counter()
+	evaluator.update_tickers(crypto.fetch_tickers(exchange, symbols))
+	evaluator.opportunities(config.THRESHOLD)
+	prefetch = time.perf_counter() - start
+	crypto.flush_cache()
+	pool = WorkerPool(threads, lambda alt: (crypto.estimate_arbitrage_forward(exchange, alt), crypto.estimate_arbitrage_backward(exchange, alt)), name="benchmark", log=crypto.log)
+	start = time.perf_counter()
+	for alt in exchange.alts:
+		pool.submit(alt)
+	pool.join()
+	sweep = time.perf_counter() - start
+	pool.stop()
+	return {'prefetch_seconds': prefetch, 'sweep_seconds': sweep}
+
+"""
+	Time from an opportunity appearing on the exchange to our first order,
+	through the estimations and the configured execution.
+"""
+def bench_first_order(crypto, exchange):
+	from run import process_asset
+	alt = exchange.alts[0]
+	exchange.misprice(alt, 5)
+	crypto.flush_cache()
+	exchange.first_order = None
+	start = time.time()
+	process_asset(crypto, exchange, alt)
+	if (exchange.first_order is None):
+		return {'first_order_ms': None}
+	return {'first_order_ms': (exchange.first_order - start) * 1000}
+
+"""
+	Get the commit of the tree, None outside of git.
+"""
+def get_version():
+	try:
+		return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL).decode().strip()
+	except Exception:
+		return None
+
+"""
+	Run every benchmark.
+	returns:	a dict of metrics, ready to be written as JSON.
+"""
+def run_benchmarks(latency, depth, threads, duration, sizes):
+	results = {}
+	crypto = BenchmarkCrypto()
+	exchange = MockExchange(alts=150, depth=depth, latency=0)
+	results.update(bench_cache(crypto, exchange, 100000))
+	results.update(bench_estimate(crypto, exchange, duration))
+	for size in sizes:
+		exchange = MockExchange(alts=size, depth=depth, latency=latency)
+		for name, value in bench_sweep(crypto, exchange, threads).items():
+			results['{}_{}_alts'.format(name, size)] = value
+	exchange = MockExchange(alts=50, depth=depth, latency=latency)
+	results.update(bench_first_order(crypto, exchange))
+	crypto.log_writer.close()
+	return results
+
+"""
+	Print the change of every metric from a previous result file.
+"""
+def compare(previous, current):
+	for name, value in current['results'].items():
+		before = previous['results'].get(name)
+		if (before and value is not None):
+			print("{:40} {:14.4f} -> {:14.4f} ({:+.1f}%)".format(name, before, value, (value / before - 1) * 100))
+		else:
+			print("{:40} {:>14} -> {}".format(name, str(before), value))
+
+"""
+	Main
+"""
+if (__name__ == "__main__"):
+	parser = argparse.ArgumentParser(description="Benchmark the detection and execution hot paths on a mock exchange.")
+	parser.add_argument('--latency', type=float, default=0.02, help="seconds of latency of every mock call")
+	parser.add_argument('--depth', type=int, default=100, help="levels of every side of the mock books")
+	parser.add_argument('--threads', type=int, default=config.POOL_SIZE.get('Binance', 8), help="worker threads of the sweep")
+	parser.add_argument('--duration', type=float, default=5, help="seconds of the throughput benchmarks")
+	parser.add_argument('--sizes', type=int, nargs='*', default=[50, 150, 1000], help="universe sizes of the sweep")
+	parser.add_argument('--output', default='benchmark.json', help="where to write the results")
+	parser.add_argument('--compare', help="a previous result file to compare with")
+	args = parser.parse_args()
+	output = os.path.abspath(args.output)
+	previous = None
+	if (args.compare):
+		with open(args.compare, 'r') as file:
+			previous = json.load(file)
+	os.chdir(tempfile.mkdtemp())
+	config.ESTIMATION_ETH = 1
+	results = {
+		'version': get_version(),
+		'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+		'python': sys.version.split()[0],
+		'machine': platform.machine(),
+		'parameters': {'latency': args.latency, 'depth': args.depth, 'threads': args.threads, 'duration': args.duration},
+		'results': run_benchmarks(args.latency, args.depth, args.threads, args.duration, args.sizes),
+	}
+	with open(output, 'w') as file:
+		json.dump(results, file, indent=4)
+	for name, value in results['results'].items():
+		print("{:40} {}".format(name, value))
+	if (previous):
+		compare(previous, results)
@@ -0,0 +1,163 @@
+import numpy as np
+
+"""
+	Compact immutable order books.
+	A BookSide holds the prices and sizes of one side in read-only NumPy
+	arrays, sorted once when the book is ingested (asks ascending, bids
+	descending), so it can be shared between threads without copying or
+	sorting again. It behaves like the ccxt list of [price, size] levels:
+	book['asks'][0][0] is the best ask price.
+	For example:
+	book = Book.from_ccxt(exchange.fetchOrderBook('LTC/ETH'))
+	book['asks'].fill(quote_amount=1)
+"""
+class BookSide:
+
+	def __init__(self, prices, sizes, descending=False, presorted=False):
+		prices = np.array(prices, dtype=np.float64)
+		sizes = np.array(sizes, dtype=np.float64)
+		if (not presorted and len(prices) > 1):
+			order = np.argsort(-prices if descending else prices, kind='stable')
+			prices = prices[order]
+			sizes = sizes[order]
+		prices.flags.writeable = False
+		sizes.flags.writeable = False
+		self.prices = prices
+		self.sizes = sizes
+		self.descending = descending
+		self._cumulative_sizes = None
+		self._cumulative_notionals = None
+
+	"""
+		Build a side from ccxt levels.
+		levels:		a list of [price, size].
+		descending:	True for bids.
+		presorted:	True if the levels are already sorted from the best price.
+	"""
+	@staticmethod
+	def from_levels(levels, descending=False, presorted=False):
+		if (len(levels) == 0):
+			return BookSide([], [], descending, presorted=True)
+		levels = np.array(levels, dtype=np.float64)[:, :2]
+		return BookSide(levels[:, 0], levels[:, 1], descending, presorted)
+
+	def __len__(self):
+		return len(self.prices)
+
+	def __iter__(self):
+		for i in range(len(self.prices)):
+			yield (float(self.prices[i]), float(self.sizes[i]))
+
+	def __getitem__(self, index):
+		if (isinstance(index, slice)):
+			return BookSide(self.prices[index], self.sizes[index], self.descending, presorted=True)
+		return (float(self.prices[index]), float(self.sizes[index]))
+
+	"""
+		Cumulative size from the best level, computed on first use. Two threads
+		may compute it at the same time, they get the same result.
+	"""
+	@property
+	def cumulative_sizes(self):
+		if (self._cumulative_sizes is None):
+			self._cumulative_sizes = np.cumsum(self.sizes)
+		return self._cumulative_sizes
+
+	"""
+		Cumulative price * size from the best level, computed on first use.
+	"""
+	@property
+	def cumulative_notionals(self):
+		if (self._cumulative_notionals is None):
+			self._cumulative_notionals = np.cumsum(self.prices * self.sizes)
+		return self._cumulative_notionals
+
+	"""
+		Find the level of a price with a binary search.
+		price:		the wanted price.
+		returns:	the index of the first level at this price or worse.
+	"""
+	def level_index(self, price):
+		if (self.descending):
+			return len(self.prices) - int(np.searchsorted(self.prices[::-1], price, side='right'))
+		return int(np.searchsorted(self.prices, price, side='left'))
+
+	"""
+		Get the size available at the given price or better.
+		price:		the limit price.
+	"""
+	def depth(self, price):
+		if (self.descending):
+			i = len(self.prices) - int(np.searchsorted(self.prices[::-1], price, side='left'))
+		else:
+			i = int(np.searchsorted(self.prices, price, side='right'))
+		if (i == 0):
+			return 0.0
+		return float(self.cumulative_sizes[i - 1])
+
+	"""
+		Simulate a market order taking this side, for a base or a quote amount.
+		base_amount:	the amount of base asset to trade.
+		quote_amount:	the amount of quote asset to trade, if base_amount is None.
+		returns:		the VWAP, the base amount filled and the quote amount.
+						The VWAP is None if nothing can be filled.
+	"""
+	def fill(self, base_amount=None, quote_amount=None):
+		if (len(self.prices) == 0):
+			return None, 0, 0
+		if (base_amount is not None):
+			cumulative = self.cumulative_sizes
+			amount = base_amount
+		else:
+			cumulative = self.cumulative_notionals
+			amount = quote_amount
+		if (amount <= 0):
+			return None, 0, 0
+		i = int(np.searchsorted(cumulative, amount, side='left'))
+		if (i >= len(self.prices)):
+			filled = float(self.cumulative_sizes[-1])
+			notional = float(self.cumulative_notionals[-1])
+			return notional / filled, filled, notional
+		previous_size = float(self.cumulative_sizes[i - 1]) if i > 0 else 0.0
+		previous_notional = float(self.cumulative_notionals[i - 1]) if i > 0 else 0.0
+		price = float(self.prices[i])
+		if (base_amount is not None):
+			filled = base_amount
+			notional = previous_notional + (base_amount - previous_size) * price
+		else:
+			filled = previous_size + (quote_amount - previous_notional) / price
+			notional = quote_amount
+		return notional / filled, filled, notional
+
+"""
+	Immutable order book with both sides, readable like a ccxt order book.
+"""
+class Book:
+
+	def __init__(self, bids, asks, timestamp=None, nonce=None):
+		self.bids = bids
+		self.asks = asks
+		self.timestamp = timestamp
+		self.nonce = nonce
+
+	"""
+		Build a book from a ccxt order book, sorting each side once.
+		presorted:	True if the sides are already sorted from the best price.
+	"""
+	@staticmethod
+	def from_ccxt(book, presorted=False):
+		if (isinstance(book, Book)):
+			return book
+		return Book(
+			BookSide.from_levels(book['bids'], descending=True, presorted=presorted),
+			BookSide.from_levels(book['asks'], descending=False, presorted=presorted),
+			book.get('timestamp'),
+			book.get('nonce')
+		)
+
+	def __getitem__(self, mode):
+		if (mode == 'bids'):
+			return self.bids
+		if (mode == 'asks'):
+			return self.asks
+		raise KeyError(mode)
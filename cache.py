@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+"""
+	Thread-safe market data cache.
+	Entries are keyed by (exchange id, data type, symbol) and stamped with the
+	time they were stored. An entry older than the max age of its data type is
+	considered missing. When the cache holds more than max_entries items, the
+	least recently used ones are evicted.
+	For example, to cache the ETH/BTC ticker of binance for 2 seconds:
+	cache = MarketCache({'ticker': 2})
+	cache.put(binance, 'ticker', 'ETH/BTC', ticker)
+"""
+class MarketCache:
+
+	def __init__(self, max_ages, max_entries=1000):
+		self.max_ages = dict(max_ages)
+		self.max_entries = max_entries
+		self.entries = OrderedDict()
+		self.lock = threading.Lock()
+
+	"""
+		Build the key of an entry.
+		exchange:	the wanted exchange.
+		kind:		the data type, for example ticker or order_book.
+		symbol:		the market symbol, for example ETH/BTC.
+	"""
+	def key(self, exchange, kind, symbol):
+		return (getattr(exchange, 'id', str(exchange)), kind, symbol)
+
+	"""
+		Get a cached value if it is fresh enough.
+		exchange:	the wanted exchange.
+		kind:		the data type.
+		symbol:		the market symbol.
+		max_age:	override the max age of the data type, in seconds.
+		returns:	the cached value, None if missing or too old.
+	"""
+	def get(self, exchange, kind, symbol, max_age=None):
+		if (max_age is None):
+			max_age = self.max_ages.get(kind, 0)
+		key = self.key(exchange, kind, symbol)
+		with self.lock:
+			entry = self.entries.get(key)
+			if (entry is None):
+				return None
+			if (time.time() - entry[0] > max_age):
+				del self.entries[key]
+				return None
+			self.entries.move_to_end(key)
+			return entry[1]
+
+	"""
+		Put a value in cache.
+		exchange:	the wanted exchange.
+		kind:		the data type.
+		symbol:		the market symbol.
+		value:		the value to cache.
+	"""
+	def put(self, exchange, kind, symbol, value):
+		key = self.key(exchange, kind, symbol)
+		with self.lock:
+			self.entries[key] = (time.time(), value)
+			self.entries.move_to_end(key)
+			while (len(self.entries) > self.max_entries):
+				self.entries.popitem(last=False)
+
+	"""
+		Get the age of a cached value.
+		returns:	the age in seconds, None if not cached.
+	"""
+	def age(self, exchange, kind, symbol):
+		with self.lock:
+			entry = self.entries.get(self.key(exchange, kind, symbol))
+		if (entry is None):
+			return None
+		return time.time() - entry[0]
+
+	"""
+		Remove every entry, or only the entries of the given data type.
+	"""
+	def clear(self, kind=None):
+		with self.lock:
+			if (kind is None):
+				self.entries.clear()
+				return
+			for key in [key for key in self.entries if key[1] == kind]:
+				del self.entries[key]
+
+	def __len__(self):
+		with self.lock:
+			return len(self.entries)
@@ -10,3 +10,135 @@ WAIT_LIMIT_ORDER=1
 ETH_PERCENTAGE=0.8
 # The number of time we wait before closing the order when it has been filled partially
 WAIT_TIMES_WHEN_FILLED=20
+# How many seconds a cached ticker is considered fresh
+PRICE_CACHE_MAX_AGE=2
+# How many seconds a cached order book is considered fresh
+ORDER_BOOK_CACHE_MAX_AGE=1
+# The maximum number of entries kept in the market data cache
+CACHE_MAX_ENTRIES=2000
+# The base url of the depth diff streams
+STREAM_URL="wss://stream.binance.com:9443/stream"
+# How many levels we fetch when syncing a streamed order book
+STREAM_SNAPSHOT_DEPTH=1000
+# How many seconds we wait before reconnecting a stream or retrying a snapshot
+STREAM_RECONNECT_DELAY=1
+# The maximum number of trades in a cycle found by the graph engine
+GRAPH_MAX_CYCLE_LENGTH=4
+# How many price updates between two exact recomputations of the cycles
+GRAPH_REFRESH_UPDATES=1000
+# How many seconds between two ticker fetches of the graph mode
+GRAPH_SCAN_INTERVAL=1
+# Fixed amount of ETH used to estimate arbitrages, None to use ETH_PERCENTAGE of the balance
+ESTIMATION_ETH=None
+# The maximum number of requests in flight in the async scan mode
+ASYNC_CONCURRENCY=100
+# The maximum number of open connections in the async scan mode
+ASYNC_CONNECTIONS=50
+# How many worker threads process alts on each exchange
+POOL_SIZE={'Binance': 8, 'Bittrex': 4, 'Bitfinex': 2}
+# How many seconds between two logs of the worker pool metrics
+POOL_SUMMARY_INTERVAL=300
+# The maximum number of log lines or notifications waiting to be written or sent
+LOG_QUEUE_SIZE=10000
+# The maximum number of log lines written at once
+LOG_BATCH_SIZE=500
+# How many times we try to send a Telegram notification
+NOTIFICATION_RETRIES=5
+# How many seconds between the first two polls of an order, the interval then doubles
+ORDER_POLL_MIN=0.1
+# The maximum number of seconds between two polls of an order
+ORDER_POLL_MAX=1
+# How many seconds the state of a resolved order is kept if it is not forgotten
+ORDER_STATE_TTL=600
+# How many reports of orders we do not track yet are kept, a fill can be reported before the order returns
+ORDER_EARLY_REPORTS=100
+# The base url of the Binance user data stream
+USER_STREAM_URL="wss://stream.binance.com:9443/ws"
+# How many seconds between two keep alive of the user data stream
+USER_STREAM_KEEP_ALIVE=1800
+# Execute arbitrages with the pipelined executor, False to run the legs one after the other
+PIPELINED_EXECUTION=False
+# How many seconds the first leg of a pipelined arbitrage stays open
+PIPELINE_TIMEOUT=10
+# How many seconds between two reconciliations of the balance ledger with the exchange
+LEDGER_RECONCILE_INTERVAL=60
+# Relative difference between the ledger and the exchange balance that is logged as drift
+LEDGER_DRIFT_TOLERANCE=0.001
+# The directory where the markets metadata of each exchange is cached
+MARKETS_CACHE_DIRECTORY="."
+# How many seconds the cached markets metadata is used before loading it again
+MARKETS_REFRESH_INTERVAL=86400
+# How many seconds the fee schedule of an exchange is used before fetching it again
+FEES_REFRESH_INTERVAL=3600
+# Discount applied to the fetched fee rates, for example 0.25 when Binance fees are paid in BNB
+FEE_DISCOUNT={'binance': 0}
+# Minimum 24h volume in BTC of the thinnest leg of a triangle to keep it in the universe
+UNIVERSE_MIN_VOLUME_BTC=1
+# Maximum relative spread of a leg to keep a triangle in the universe, 0.01 is 1%
+UNIVERSE_MAX_SPREAD=0.01
+# How many of the best ranked alts are scanned every cycle
+UNIVERSE_HOT_SIZE=30
+# The other alts are scanned every UNIVERSE_COLD_EVERY cycles
+UNIVERSE_COLD_EVERY=5
+# How many seconds the universe is used before ranking it again
+UNIVERSE_REFRESH_INTERVAL=3600
+# An estimation within this many percents of the threshold counts as a hit
+UNIVERSE_NEAR_MARGIN=0.3
+# How much the hit rate weighs in the ranking of an alt
+UNIVERSE_HIT_WEIGHT=10
+# How many alts are scanned at most in one cycle, the most urgent first
+SCHEDULER_BUDGET=40
+# Shortest time in seconds between two scans of an alt near the threshold
+SCHEDULER_MIN_INTERVAL=0.5
+# Longest time in seconds between two scans of a hot alt, the minimum refresh rate
+SCHEDULER_MAX_INTERVAL=30
+# Distance to the threshold in percents at which an alt waits the longest
+SCHEDULER_GAP_SCALE=1
+# How many times its volatility an alt is moved closer to the threshold
+SCHEDULER_VOLATILITY_WEIGHT=2
+# Weight of the last estimation in the moving average of the estimate and the volatility
+SCHEDULER_SMOOTHING=0.3
+# Request budget of every exchange, as (weight, seconds)
+RATE_LIMITS={'binance': (1200, 60), 'bittrex': (60, 60), 'bitfinex2': (30, 60)}
+# Share of the request budget we allow ourselves to use
+RATE_LIMIT_MARGIN=0.9
+# How many seconds we stop after a 429 or a 418 without a Retry-After header
+RATE_LIMIT_BACKOFF=30
+# How much the refill factor grows back after every successful request, it is halved on a 429 or a 418
+RATE_LIMIT_RECOVERY=0.01
+# Share the rate limit of an exchange between processes through shared memory, for run.sh
+RATE_LIMIT_SHARED=False
+# Record every book and ticker we see in binary files, for backtests and analysis
+RECORDER_ENABLED=False
+# Directory of the recorded books
+RECORDER_DIRECTORY="books"
+# How many levels of each side of a book are recorded, None for all of them
+RECORDER_DEPTH=None
+# The maximum number of recorded books waiting to be written, more are dropped
+RECORDER_QUEUE_SIZE=10000
+# The maximum number of recorded books written at once
+RECORDER_BATCH_SIZE=500
+# ETH balance at the start of a backtest
+BACKTEST_BALANCE_ETH=1
+# How many replayed seconds between two scans of the changed triangles in a backtest
+BACKTEST_SCAN_INTERVAL=1
+# Exchange whose public market data feeds the paper trading exchange
+PAPER_SOURCE='binance'
+# Balances of the paper trading exchange at start
+PAPER_BALANCES={'ETH': 1}
+# Network latency in seconds of every paper trading call
+PAPER_LATENCY=0.05
+# Random latency in seconds added to every paper trading call
+PAPER_LATENCY_JITTER=0.05
+# How resting paper orders are filled: instant, cross (when the book crosses them) or queue (also when the size ahead of them has traded)
+PAPER_FILL_MODE='queue'
+# Age in seconds of a book of the source before the paper exchange fetches it again to move its orders
+PAPER_BOOK_MAX_AGE=0.5
+# Fee rate of the paper trading exchange when the market does not give one
+PAPER_DEFAULT_FEE=0.001
+# Local port of the Prometheus endpoint of the latency metrics, for example 9108, None to disable it
+METRICS_PORT=None
+# Address the Prometheus endpoint listens on
+METRICS_HOST="127.0.0.1"
+# How many seconds between two latency summaries in the logs, None to disable them
+METRICS_SUMMARY_INTERVAL=300
@@ -3,16 +3,26 @@ import secrets
 from datetime import datetime
 import telegram
 import os
-import time
 import config
-from operator import itemgetter
+from cache import MarketCache
+from fill import simulate_buy, simulate_sell
+from book import Book
+from logger import LogWriter, Notifier
+from orders import OrderTracker
+from ledger import BalanceLedger
+from markets import MarketRegistry
+from fees import FeeSchedule
+from ratelimit import RateLimiter
+from recorder import BookRecorder
+from paper import PaperExchange
+from metrics import Metrics
 
 """
 	This class is a manager for multiple crypto exchanges.
 	You can get your balance, create orders...
 	Most of functions takes exchange as argument, this is the exchnage you want
 	to use. For example, to use binance:
-	crypto.get_fees(crypto.binance)
+	crypto.get_fees(crypto.binance, 'buy')
 	Asset1 and asset2 represents A1/A2 pair. If you want this ETH/BTC price,
 	asset1 is 'ETH' and asset2 is 'BTC'.
 """
@@ -20,47 +30,118 @@ class Crypto:
 
 	binance = None
 	bittrex = None
+	bitfinex = None
+	paper = None
 	bot = None
-	cache_prices = []
-	cache_order_books = []
+	notifier = None
+	log_writer = None
+	cache = None
+	streams = None
+	orders = None
+	ledger = None
+	markets = None
+	fees = None
+	recorder = None
+	metrics = None
 	ORDER_NOT_FILLED = 0
 	ORDER_IN_PROGRESS = 1
 	ORDER_FILLED = 2
+	# ccxt class and secrets of every exchange we can use
+	CLIENTS = {
+		'binance': ('binance', 'BINANCE_KEY', 'BINANCE_SECRET'),
+		'bittrex': ('bittrex', 'BITTREX_KEY', 'BITTREX_SECRET'),
+		'bitfinex': ('bitfinex2', 'BITFINEX_KEY', 'BITFINEX_SECRET'),
+	}
 
-	def __init__(self):
-		self.init_ccxt()
+	"""
+		exchanges:	the names of the exchanges to connect to, every configured
+					one if None.
+	"""
+	def __init__(self, exchanges=None):
+		self.metrics = Metrics()
+		self.cache = MarketCache({
+			'ticker': config.PRICE_CACHE_MAX_AGE,
+			'order_book': config.ORDER_BOOK_CACHE_MAX_AGE,
+		}, max_entries=config.CACHE_MAX_ENTRIES)
+		self.streams = {}
+		self.init_logs()
+		self.init_orders()
+		self.init_markets()
+		self.init_recorder()
+		self.init_ccxt(exchanges)
+		self.init_notifier()
+		self.init_metrics()
+
+	"""
+		Open the log file.
+	"""
+	def init_logs(self):
+		self.log_writer = LogWriter('logs.txt')
+
+	"""
+		Create the order tracker and the balance ledger.
+	"""
+	def init_orders(self):
+		self.orders = OrderTracker()
+		self.ledger = BalanceLedger(self.log)
+
+	"""
+		Create the book recorder if RECORDER_ENABLED.
+	"""
+	def init_recorder(self):
+		if (config.RECORDER_ENABLED):
+			self.recorder = BookRecorder(log=self.log, metrics=self.metrics)
+
+	"""
+		Create the markets registry and the fee schedule.
+	"""
+	def init_markets(self):
+		self.markets = MarketRegistry()
+		self.fees = FeeSchedule(self.markets, self.log)
+
+	"""
+		Create the Telegram bot and the notifier.
+	"""
+	def init_notifier(self):
 		self.bot = telegram.Bot(token=secrets.TELEGRAM)
+		self.notifier = Notifier(self.bot, secrets.TELEGRAM_CHAT)
+
+	"""
+		Start the metrics endpoint and the periodic latency summary. The bot
+		keeps running without the endpoint if its port is taken.
+	"""
+	def init_metrics(self):
+		if (config.METRICS_PORT):
+			try:
+				self.metrics.serve(config.METRICS_PORT)
+			except OSError as e:
+				self.log("Cannot serve the metrics on port {}: {}".format(config.METRICS_PORT, str(e)))
+		if (config.METRICS_SUMMARY_INTERVAL):
+			self.metrics.report(self.log, config.METRICS_SUMMARY_INTERVAL)
 
 	"""
 		Reset caches.
 	"""
 	def flush_cache(self):
-		self.cache_prices = []
-		self.cache_order_books = []
+		self.cache.clear()
 
 	"""
-		Check if a price is cached, if yes, returns it.
+		Check if a price is cached and fresh enough, if yes, returns it.
 		exchange:	the wanted exchange.
 		asset1:		first asset.
 		asset2:		second asset.
 	"""
 	def get_price_cache(self, exchange, asset1, asset2):
-		for item in self.cache_prices:
-			if (item['exchange'] == str(exchange) and item['asset1'] == asset1 and item['asset2'] == asset2):
-				return item['ticker']
-		return None
+		return self.cache.get(exchange, 'ticker', '{}/{}'.format(asset1, asset2))
 
 	"""
-		Check if an order book is cached, if yes, returns it.
+		Check if an order book is cached and fresh enough, if yes, returns it.
 		exchange:	the wanted exchange.
 		asset1:		first asset.
 		asset2:		second asset.
 	"""
 	def get_order_book_cache(self, exchange, asset1, asset2):
-		for item in self.cache_order_books:
-			if (item['exchange'] == str(exchange) and item['asset1'] == asset1 and item['asset2'] == asset2):
-				return item['book']
-		return None
+		return self.cache.get(exchange, 'order_book', '{}/{}'.format(asset1, asset2))
 
 	"""
 		Put price in cache.
@@ -70,78 +151,140 @@ class Crypto:
 		ticker:		the ccxt object that contains the price to cache.
 	"""
 	def cache_price(self, exchange, asset1, asset2, ticker):
-		self.cache_prices.append({
-			'exchange': str(exchange),
-			'asset1': asset1,
-			'asset2': asset2,
-			'ticker': ticker
-		})
+		self.cache.put(exchange, 'ticker', '{}/{}'.format(asset1, asset2), ticker)
+		if (self.recorder):
+			self.recorder.record_ticker(exchange, '{}/{}'.format(asset1, asset2), ticker)
 
 	"""
 		Put order book in cache.
 		exchange:	the wanted exchange.
 		asset1:		first asset.
 		asset2:		second asset.
-		book:		the ccxt object that contains the order book to cache.
+		book:		the ccxt object that contains the order book to cache. It is
+					converted once to an immutable sorted book.Book.
 	"""
 	def cache_order_book(self, exchange, asset1, asset2, book):
-		self.cache_order_books.append({
-			'exchange': str(exchange),
-			'asset1': asset1,
-			'asset2': asset2,
-			'book': book
-		})
+		book = Book.from_ccxt(book)
+		self.cache.put(exchange, 'order_book', '{}/{}'.format(asset1, asset2), book)
+		if (self.recorder):
+			self.recorder.record_book(exchange, '{}/{}'.format(asset1, asset2), book)
+		return book
 
 	"""
-		Init exchanges, create connections with secrets file.
+		Serve the order books of an exchange from a depth stream. Symbols that
+		are not synced on the stream are still fetched with REST.
+		exchange:	the wanted exchange.
+		stream:		a started stream.DepthStream.
 	"""
-	def init_ccxt(self):
-		self.binance = ccxt.binance({
-			'apiKey': secrets.BINANCE_KEY,
-		    'secret': secrets.BINANCE_SECRET,
-			'timeout': 30000,
-		    'enableRateLimit': True,
-		})
-		self.bittrex = ccxt.bittrex({
-			'apiKey': secrets.BITTREX_KEY,
-		    'secret': secrets.BITTREX_SECRET,
-			'timeout': 30000,
-		    'enableRateLimit': True,
-		})
-		self.bitfinex = ccxt.bitfinex2({
-			'apiKey': secrets.BITFINEX_KEY,
-			'secret': secrets.BITFINEX_SECRET,
+	def attach_stream(self, exchange, stream):
+		self.streams[exchange.id] = stream
+
+	"""
+		Check if an order book is streamed and synced, if yes, returns it.
+		exchange:	the wanted exchange.
+		asset1:		first asset.
+		asset2:		second asset.
+	"""
+	def get_order_book_stream(self, exchange, asset1, asset2):
+		stream = self.streams.get(exchange.id)
+		if (not stream):
+			return None
+		return stream.get_order_book('{}/{}'.format(asset1, asset2))
+
+	"""
+		Get the names of the exchanges that have keys in the secrets file.
+	"""
+	@staticmethod
+	def configured():
+		return [name for name, (_, key, _) in Crypto.CLIENTS.items() if getattr(secrets, key, None)]
+
+	"""
+		Init exchanges, create connections with secrets file. Only the wanted
+		clients are created, the others stay None.
+		exchanges:	the names of the exchanges, every configured one if None.
+	"""
+	def init_ccxt(self, exchanges=None):
+		for name in (Crypto.configured() if exchanges is None else exchanges):
+			if (name == 'paper'):
+				self.paper = self.init_paper()
+				continue
+			client, key, secret = Crypto.CLIENTS[name]
+			exchange = getattr(ccxt, client)({
+				'apiKey': getattr(secrets, key, None),
+				'secret': getattr(secrets, secret, None),
+				'timeout': 30000,
+				'enableRateLimit': True,
+			})
+			RateLimiter(exchange, self.log).install()
+			setattr(self, name, exchange)
+
+	"""
+		Init the paper trading exchange, with the public market data of
+		PAPER_SOURCE and a local matching engine for the orders.
+	"""
+	def init_paper(self):
+		source = getattr(ccxt, Crypto.CLIENTS[config.PAPER_SOURCE][0])({
 			'timeout': 30000,
 			'enableRateLimit': True,
 		})
+		RateLimiter(source, self.log).install()
+		self.log("Paper trading with the markets of {}".format(str(source)))
+		return PaperExchange(source)
+
+	"""
+		Get the client of an exchange by name, for example binance.
+	"""
+	def get_exchange(self, name):
+		return getattr(self, name, None)
+
+	"""
+		Stop the streams and send the queued logs and notifications.
+	"""
+	def close(self):
+		for stream in self.streams.values():
+			stream.stop()
+		self.orders.stop()
+		self.metrics.close()
+		if (self.recorder):
+			self.recorder.close()
+		self.notifier.close()
+		self.log_writer.close()
 
 	"""
-		Get your balance for given asset.
+		Get your balance for given asset. Balances are fetched once then kept
+		up to date from our fills by the ledger.
 		exchange:	the wanted exchange.
 		asset:		the wanted asset.
 		returns:	the amount of the given asset you own.
 	"""
 	def get_balance(self, exchange, asset):
 		try:
-			balance = exchange.fetchBalance()
-			if (asset in balance):
-				return balance[asset]['free']
-			return 0
+			return self.ledger.get(exchange, asset)
 		except Exception as e:
 			self.log("Error while getting balance: {}".format(str(e)))
 			raise
 
 	"""
- 		Get the multiplicator for each exchange. If the fee is 0.1%, then the
-		multiplicator will be 0.999.
+ 		Get the multiplicator for a trade. If the fee is 0.1%, then the
+		multiplicator will be 0.999. When the symbol is given, the rate comes
+		from the fee schedule of the exchange: the maker rate for a fill that
+		rested in the book, the taker rate for a fill that took it. Otherwise,
+		or if the schedule does not know the symbol, a default rate of the
+		exchange is used.
 		exchange:	the wanted exchange.
 		mode:		buy or sell.
-		returns:	the multiplicator for the given exchange.
+		symbol:		the traded symbol, for example LTC/ETH.
+		liquidity:	maker or taker.
+		returns:	the multiplicator for the given trade.
 	"""
-	def get_fees(self, exchange, mode):
+	def get_fees(self, exchange, mode, symbol=None, liquidity='taker'):
 		if (mode != 'buy' and mode != 'sell'):
 			print("Get fees: mode should be buy or sell.")
 			return
+		if (symbol):
+			rate = self.fees.rate(exchange, symbol, liquidity)
+			if (rate is not None):
+				return 1 - rate
 		if (str(exchange) == "Binance"):
 			return 0.999
 		elif (str(exchange) == "Bittrex"):
@@ -151,6 +294,24 @@ class Crypto:
 				return 0.998
 			else:
 				return 0.999
+		elif (str(exchange).startswith("Paper(")):
+			return 1 - exchange.fee(symbol, liquidity)
+
+	"""
+		Get the multiplicator of a fill made partly as maker and partly as taker.
+		exchange:	the wanted exchange.
+		mode:		buy or sell.
+		symbol:		the traded symbol.
+		filled:		the amount filled.
+		maker:		the part of filled that rested in the book.
+		returns:	the multiplicator weighted by the amount of each part.
+	"""
+	def get_fill_fees(self, exchange, mode, symbol, filled, maker=0):
+		taker = self.get_fees(exchange, mode, symbol)
+		if (not filled or not maker):
+			return taker
+		maker = min(maker, filled)
+		return (maker * self.get_fees(exchange, mode, symbol, 'maker') + (filled - maker) * taker) / filled
 
 	"""
 		Get an asset price.
@@ -165,11 +326,11 @@ class Crypto:
 			print("Mode should be average, ask or bid")
 			return None
 		try:
-			ticker = None
-			if (self.get_price_cache(exchange, asset1, asset2)):
-				ticker = self.get_price_cache(exchange, asset1, asset2)
-			else:
-				ticker = exchange.fetchTicker('{}/{}'.format(asset1, asset2))
+			ticker = self.get_price_cache(exchange, asset1, asset2)
+			if (not ticker):
+				symbol = '{}/{}'.format(asset1, asset2)
+				with self.metrics.timer('fetch_ticker', exchange, symbol):
+					ticker = exchange.fetchTicker(symbol)
 				self.cache_price(exchange, asset1, asset2, ticker)
 			if (mode == 'bid'):
 				return ticker['bid']
@@ -186,22 +347,80 @@ class Crypto:
 		asset1:		first asset.
 		asset2:		second asset.
 		mode:		can be bids or asks
-		returns:	the order book as a 2D array, None if something is wrong.
+		returns:	the book.BookSide of [price, size] levels sorted from the best
+					price, None if something is wrong.
 	"""
 	def get_order_book(self, exchange, asset1, asset2, mode="bids"):
 		if (mode != 'bids' and mode != 'asks'):
 			print('Get order book: mode should be bids or asks.')
 			return None
 		try:
-			order_book = self.get_order_book_cache(exchange, asset1, asset2)
+			order_book = self.get_order_book_stream(exchange, asset1, asset2)
 			if (not order_book):
-				order_book = exchange.fetchOrderBook('{}/{}'.format(asset1, asset2))
-				self.cache_order_book(exchange, asset1, asset2, order_book)
+				order_book = self.get_order_book_cache(exchange, asset1, asset2)
+			if (not order_book):
+				symbol = '{}/{}'.format(asset1, asset2)
+				with self.metrics.timer('fetch_order_book', exchange, symbol):
+					order_book = exchange.fetchOrderBook(symbol)
+				order_book = self.cache_order_book(exchange, asset1, asset2, order_book)
 			return order_book[mode]
 		except Exception as e:
 			self.log("Error while fetching order book for {}/{}: {}".format(asset1, asset2, str(e)))
 			return None
 
+	"""
+		Fetch the top of book of many symbols in one call and cache them as
+		tickers. Uses the bulk book ticker endpoint when the exchange has one,
+		all tickers otherwise.
+		exchange:	the wanted exchange.
+		symbols:	the list of wanted symbols, for example ['ETH/BTC'].
+		returns:	the fetched tickers keyed by symbol.
+	"""
+	def fetch_tickers(self, exchange, symbols):
+		try:
+			if (exchange.has.get('fetchBidsAsks')):
+				with self.metrics.timer('fetch_tickers', exchange):
+					tickers = exchange.fetchBidsAsks(symbols)
+			elif (exchange.has.get('fetchTickers')):
+				with self.metrics.timer('fetch_tickers', exchange):
+					tickers = exchange.fetchTickers()
+			else:
+				return {}
+		except Exception as e:
+			self.log("Error while fetching tickers: {}".format(str(e)))
+			return {}
+		fetched = {}
+		for symbol in symbols:
+			if (symbol in tickers):
+				asset1, asset2 = symbol.split('/')
+				self.cache_price(exchange, asset1, asset2, tickers[symbol])
+				fetched[symbol] = tickers[symbol]
+		return fetched
+
+	"""
+		Fetch the order books of many symbols in one call and cache them, if
+		the exchange allows it.
+		exchange:	the wanted exchange.
+		symbols:	the list of wanted symbols.
+		returns:	the number of symbols cached.
+	"""
+	def fetch_order_books(self, exchange, symbols):
+		if (not exchange.has.get('fetchOrderBooks')):
+			return 0
+		try:
+			with self.metrics.timer('fetch_order_books', exchange):
+				books = exchange.fetchOrderBooks(symbols)
+		except Exception as e:
+			self.log("Error while fetching order books: {}".format(str(e)))
+			return 0
+		n = 0
+		for symbol in symbols:
+			if (symbol in books):
+				asset1, asset2 = symbol.split('/')
+				self.cache_order_book(exchange, asset1, asset2, books[symbol])
+				n += 1
+		return n
+
 	"""
 		Check if at least one order is open for the given asset and exchange.
 		exchange:	the wanted exchange.
@@ -230,11 +449,13 @@ class Crypto:
 		returns:	True if success, False if something is wrong.
 	"""
 	def cancel_orders(self, exchange, asset1, asset2):
+		symbol = '{}/{}'.format(asset1, asset2)
 		for _ in range(5):
 			try:
-				orders = exchange.fetchOpenOrders('{}/{}'.format(asset1, asset2))
-				for order in orders:
-					exchange.cancelOrder(order['id'], '{}/{}'.format(asset1, asset2))
+				with self.metrics.timer('cancel_orders', exchange, symbol):
+					orders = exchange.fetchOpenOrders(symbol)
+					for order in orders:
+						exchange.cancelOrder(order['id'], symbol)
 				return True
 			except Exception as e:
 				self.log("Error while canceling orders for {}/{}: {}. Retrying.".format(asset1, asset2, str(e)))
@@ -242,44 +463,147 @@ class Crypto:
 		return False
 
 	"""
-		Estimate the profit for forward arbitrage on given asset.
+		Get the amount of ETH an arbitrage would start with: ESTIMATION_ETH if
+		set, ETH_PERCENTAGE of our ETH balance otherwise.
+		exchange:	the wanted exchange.
+		returns:	the amount of ETH, None if the balance cannot be fetched.
+	"""
+	def get_trade_size(self, exchange):
+		if (config.ESTIMATION_ETH):
+			return config.ESTIMATION_ETH
+		try:
+			return self.get_balance(exchange, 'ETH') * config.ETH_PERCENTAGE
+		except Exception:
+			return None
+
+	"""
+		Update the balance ledger with one of our fills. Market orders may not
+		return a fill, the ledger is then fixed by its next reconciliation.
+		exchange:	the exchange of the fill.
+		asset1:		first asset.
+		asset2:		second asset.
+		side:		buy or sell.
+		filled:		the amount of asset1 filled.
+		price:		the average price of the fill.
+		maker:		the part of filled that rested in the book, as reported by
+					the exchange. The rest paid the taker fee.
+	"""
+	def record_fill(self, exchange, asset1, asset2, side, filled, price, maker=0):
+		self.ledger.record_fill(exchange, asset1, asset2, side, filled, price, self.get_fill_fees(exchange, side, '{}/{}'.format(asset1, asset2), filled, maker))
+
+	"""
+		Cancel an order by id.
+		exchange:	the exchange of the order.
+		order_id:	the id of the order.
+		asset1:		first asset.
+		asset2:		second asset.
+		returns:	True if success, False if something is wrong.
+	"""
+	def cancel_order(self, exchange, order_id, asset1, asset2):
+		try:
+			exchange.cancelOrder(order_id, '{}/{}'.format(asset1, asset2))
+			return True
+		except Exception as e:
+			self.log("Error while canceling order {} for {}/{}: {}".format(order_id, asset1, asset2, str(e)))
+			return False
+
+	"""
+		Wait for a limit order to be filled, the order is resolved as soon as
+		the fill is known. If it is not filled after timeout it is canceled,
+		if it is partially filled we wait up to WAIT_TIMES_WHEN_FILLED times
+		longer, then cancel it and convert back what has been filled.
+		exchange:	the exchange of the order.
+		order:		the ccxt order.
+		asset1:		first asset.
+		asset2:		second asset.
+		timeout:	the delay to wait before canceling the order.
+		undo:		function converting back a partial fill.
+		returns:	True if the order has been filled, False if not.
+	"""
+	def wait_limit_order(self, exchange, order, asset1, asset2, timeout, undo):
+		symbol = '{}/{}'.format(asset1, asset2)
+		with self.metrics.timer('fill', exchange, symbol):
+			state = self.orders.wait(exchange, order['id'], symbol, timeout)
+			if (state['status'] == OrderTracker.OPEN and state['filled'] > 0):
+				self.log("Order for {} is in progress, waiting...".format(symbol))
+				state = self.orders.wait(exchange, order['id'], symbol, timeout * config.WAIT_TIMES_WHEN_FILLED)
+			if (state['status'] == OrderTracker.OPEN):
+				self.cancel_order(exchange, order['id'], asset1, asset2)
+				state = self.orders.wait(exchange, order['id'], symbol, 0)
+		self.metrics.count('orders_{}'.format(state['status']), 'fill', exchange, symbol)
+		self.orders.forget(order['id'])
+		self.record_fill(exchange, asset1, asset2, order['side'], state['filled'], order['price'], state.get('maker', 0))
+		if (state['status'] == OrderTracker.FILLED):
+			self.log("Limit order executed.")
+			return True
+		if (state['filled'] > 0):
+			self.log("Order for {} cannot be terminated, converting back.".format(symbol))
+			undo()
+			return False
+		self.log("Canceled limit order for {} after timeout.".format(symbol))
+		return False
+
+	"""
+		Estimate the profit for forward arbitrage on given asset, walking the
+		order books with the amount we would really trade. Every leg is placed
+		at the best price of the other side of the book, so it pays the taker fee.
 		exchange:	the wanted exchange.
 		asset:		the asset to try forward triarb.
-		returns:	the estimated percentage difference after triarb.
+		returns:	the estimated percentage difference after triarb, -100 if
+					the books are too thin for our amount.
 	"""
 	def estimate_arbitrage_forward(self, exchange, asset):
-		try:
-			alt_ETH = self.get_buy_limit_price(exchange, asset, 'ETH')
-			alt_BTC = self.get_sell_limit_price(exchange, asset, 'BTC')
-			if (not alt_BTC or not alt_ETH):
-				self.log("Less than 3 orders for {} on {}, skipping.".format(asset, str(exchange)))
+		with self.metrics.timer('estimate_forward', exchange, asset):
+			size = self.get_trade_size(exchange)
+			alt_ETH = self.get_order_book(exchange, asset, 'ETH', mode='asks')
+			alt_BTC = self.get_order_book(exchange, asset, 'BTC', mode='bids')
+			ETH_BTC = self.get_order_book(exchange, 'ETH', 'BTC', mode='asks')
+			if (not size or not alt_ETH or not alt_BTC or not ETH_BTC):
+				self.log("Missing order book for {} on {}, skipping.".format(asset, str(exchange)))
+				return -100
+			_, alt, spent = simulate_buy(alt_ETH, quote_amount=size)
+			alt = self.markets.round_amount(exchange, '{}/BTC'.format(asset), alt * self.get_fees(exchange, 'buy', '{}/ETH'.format(asset)))
+			if (self.markets.check(exchange, '{}/BTC'.format(asset), alt, alt_BTC[0][0])):
 				return -100
-			step1 = (1 / alt_ETH) * self.get_fees(exchange, 'buy')
-			step2 = (step1 * alt_BTC) * self.get_fees(exchange, 'sell')
-			step3 = (step2 / self.get_price(exchange, 'ETH', 'BTC', mode='ask')) * self.get_fees(exchange, 'buy')
-			return (step3 - 1) * 100
-		except ZeroDivisionError:
-			return -1
+			_, sold, BTC = simulate_sell(alt_BTC, alt)
+			BTC *= self.get_fees(exchange, 'sell', '{}/BTC'.format(asset))
+			_, ETH, spent_BTC = simulate_buy(ETH_BTC, quote_amount=BTC)
+			ETH *= self.get_fees(exchange, 'buy', 'ETH/BTC')
+			if (spent < size * 0.999999 or sold < alt * 0.999999 or spent_BTC < BTC * 0.999999):
+				self.log("Not enough depth for {:.6f} ETH on {} on {}, skipping.".format(size, asset, str(exchange)))
+				return -100
+			return (ETH / size - 1) * 100
 
 	"""
-		Estimate the profit for backward arbitrage on given asset.
+		Estimate the profit for backward arbitrage on given asset, walking the
+		order books with the amount we would really trade. Every leg is placed
+		at the best price of the other side of the book, so it pays the taker fee.
 		exchange:	the wanted exchange.
 		asset:		the asset to try backward triarb.
-		returns:	the estimated percentage difference after triarb.
+		returns:	the estimated percentage difference after triarb, -100 if
+					the books are too thin for our amount.
 	"""
 	def estimate_arbitrage_backward(self, exchange, asset):
-		try:
-			alt_BTC = self.get_buy_limit_price(exchange, asset, 'BTC')
-			alt_ETH = self.get_sell_limit_price(exchange, asset, 'ETH')
-			if (not alt_BTC or not alt_ETH):
-				self.log("Less than 3 orders for {} on {}, skipping.".format(asset, str(exchange)))
+		with self.metrics.timer('estimate_backward', exchange, asset):
+			size = self.get_trade_size(exchange)
+			ETH_BTC = self.get_order_book(exchange, 'ETH', 'BTC', mode='bids')
+			alt_BTC = self.get_order_book(exchange, asset, 'BTC', mode='asks')
+			alt_ETH = self.get_order_book(exchange, asset, 'ETH', mode='bids')
+			if (not size or not alt_ETH or not alt_BTC or not ETH_BTC):
+				self.log("Missing order book for {} on {}, skipping.".format(asset, str(exchange)))
+				return -100
+			_, sold_ETH, BTC = simulate_sell(ETH_BTC, size)
+			BTC *= self.get_fees(exchange, 'sell', 'ETH/BTC')
+			_, alt, spent = simulate_buy(alt_BTC, quote_amount=BTC)
+			alt = self.markets.round_amount(exchange, '{}/ETH'.format(asset), alt * self.get_fees(exchange, 'buy', '{}/BTC'.format(asset)))
+			if (self.markets.check(exchange, '{}/ETH'.format(asset), alt, alt_ETH[0][0])):
 				return -100
-			step1 = (self.get_price(exchange, 'ETH', 'BTC', mode='bid')) * self.get_fees(exchange, 'sell')
-			step2 = (step1 / alt_BTC) * self.get_fees(exchange, 'buy')
-			step3 = (step2 * alt_ETH) * self.get_fees(exchange, 'sell')
-			return (step3 - 1) * 100
-		except ZeroDivisionError:
-			return -1
+			_, sold, ETH = simulate_sell(alt_ETH, alt)
+			ETH *= self.get_fees(exchange, 'sell', '{}/ETH'.format(asset))
+			if (sold_ETH < size * 0.999999 or spent < BTC * 0.999999 or sold < alt * 0.999999):
+				self.log("Not enough depth for {:.6f} ETH on {} on {}, skipping.".format(size, asset, str(exchange)))
+				return -100
+			return (ETH / size - 1) * 100
 
 	"""
 		Create a buy order. 'amount' or 'amount_percentage' should be specified.
@@ -307,48 +631,39 @@ class Crypto:
 				asset2,
 				exchange
 			))
+			symbol = '{}/{}'.format(asset1, asset2)
+			amount = self.markets.round_amount(exchange, symbol, amount)
+			if (limit):
+				limit = self.markets.round_price(exchange, symbol, limit, 'buy')
+			reason = self.markets.check(exchange, symbol, amount, limit)
+			if (reason):
+				self.log("Cannot buy {}: {}.".format(symbol, reason))
+				return False
 			if (limit):
 				self.log("Limit @{}.".format(limit))
 			if (not limit):
 				self.log("Buying at market price.")
-				exchange.createMarketBuyOrder(
-					'{}/{}'.format(asset1, asset2),
-					amount
-				)
+				with self.metrics.timer('place_order', exchange, symbol):
+					order = exchange.createMarketBuyOrder(
+						'{}/{}'.format(asset1, asset2),
+						amount
+					)
+				self.record_fill(exchange, asset1, asset2, 'buy', order.get('filled'), order.get('average'))
 				return True
 			else:
-				exchange.createLimitBuyOrder(
-					'{}/{}'.format(asset1, asset2),
-					amount,
-					limit
-				)
+				with self.metrics.timer('place_order', exchange, symbol):
+					order = exchange.createLimitBuyOrder(
+						'{}/{}'.format(asset1, asset2),
+						amount,
+						limit
+					)
 				if (timeout):
-					time.sleep(timeout)
-					result = self.is_open_order(exchange, asset1, asset2)
-					if (result == Crypto.ORDER_NOT_FILLED):
-						if (self.cancel_orders(exchange, asset1, asset2)):
-							self.log("Canceled limit order for {}/{} after timeout.".format(asset1, asset2))
-						return False
-					elif (result == Crypto.ORDER_IN_PROGRESS):
-						n = 0
-						while (result == Crypto.ORDER_IN_PROGRESS):
-							n += 1
-							if (n >= config.WAIT_TIMES_WHEN_FILLED):
-								self.log("Order cannot be terminated, selling {} to {}.".format(asset1, asset2))
-								self.sell(exchange, asset1, asset2, amount_percentage=1)
-								return False
-							self.log("Order for {}/{} is in progress, waiting...".format(asset1, asset2))
-							time.sleep(timeout)
-							result = self.is_open_order(exchange, asset1, asset2)
-						self.log("Limit order executed.")
-						return True
-					else:
-						self.log("Limit order executed.")
-						return True
+					return self.wait_limit_order(exchange, order, asset1, asset2, timeout, lambda: self.sell(exchange, asset1, asset2, amount_percentage=1))
 				else:
 					return False
 		except Exception as e:
 			self.log("Error while buying: {}".format(str(e)))
+			self.ledger.request_reconcile()
 			return False
 
 	"""
@@ -376,48 +691,39 @@ class Crypto:
 				asset2,
 				exchange
 			))
+			symbol = '{}/{}'.format(asset1, asset2)
+			amount = self.markets.round_amount(exchange, symbol, amount)
+			if (limit):
+				limit = self.markets.round_price(exchange, symbol, limit, 'sell')
+			reason = self.markets.check(exchange, symbol, amount, limit)
+			if (reason):
+				self.log("Cannot sell {}: {}.".format(symbol, reason))
+				return False
 			if (limit):
 				self.log("Limit @{}.".format(limit))
 			if (not limit):
 				self.log("Selling at market price.")
-				exchange.createMarketSellOrder(
-					'{}/{}'.format(asset1, asset2),
-					amount
-				)
+				with self.metrics.timer('place_order', exchange, symbol):
+					order = exchange.createMarketSellOrder(
+						'{}/{}'.format(asset1, asset2),
+						amount
+					)
+				self.record_fill(exchange, asset1, asset2, 'sell', order.get('filled'), order.get('average'))
 				return True
 			else:
-				exchange.createLimitSellOrder(
-					'{}/{}'.format(asset1, asset2),
-					amount,
-					limit
-				)
+				with self.metrics.timer('place_order', exchange, symbol):
+					order = exchange.createLimitSellOrder(
+						'{}/{}'.format(asset1, asset2),
+						amount,
+						limit
+					)
 				if (timeout):
-					time.sleep(timeout)
-					result = self.is_open_order(exchange, asset1, asset2)
-					if (result == Crypto.ORDER_NOT_FILLED):
-						if (self.cancel_orders(exchange, asset1, asset2)):
-							self.log("Canceled limit order for {}/{} after timeout.".format(asset1, asset2))
-						return False
-					elif (result == Crypto.ORDER_IN_PROGRESS):
-						n = 0
-						while (result == Crypto.ORDER_IN_PROGRESS):
-							n += 1
-							if (n >= config.WAIT_TIMES_WHEN_FILLED):
-								self.log("Order cannot be terminated, buying {} with {}.".format(asset1, asset2))
-								self.buy(exchange, asset1, asset2, amount_percentage=1)
-								return False
-							self.log("Order for {}/{} is in progress, waiting...".format(asset1, asset2))
-							time.sleep(timeout)
-							result = self.is_open_order(exchange, asset1, asset2)
-						self.log("Limit order executed.")
-						return True
-					else:
-						self.log("Limit order executed.")
-						return True
+					return self.wait_limit_order(exchange, order, asset1, asset2, timeout, lambda: self.buy(exchange, asset1, asset2, amount_percentage=1))
 				else:
 					return False
 		except Exception as e:
 			self.log("Error while selling: {}".format(str(e)))
+			self.ledger.request_reconcile()
 			return False
 
 	"""
@@ -427,6 +733,7 @@ class Crypto:
 		asset:			the asset that have been arbitrate
 	"""
 	def summarize_arbitrage(self, exchange, balance_before, asset):
+		self.ledger.reconcile(exchange)
 		balance_after = self.get_balance(exchange, "ETH")
 		diff = balance_after - balance_before
 		self.save_gain(diff)
@@ -497,7 +804,6 @@ class Crypto:
 		bids = self.get_order_book(exchange, asset1, asset2, mode="asks")
 		if (not bids):
 			return None
-		bids.sort()
 		if (len(bids) < config.ORDERBOOK_INDEX_ESTIMATION):
 			return None
 		for bid in bids[config.ORDERBOOK_INDEX_ESTIMATION:]:
@@ -517,7 +823,6 @@ class Crypto:
 		asks = self.get_order_book(exchange, asset1, asset2, mode="bids")
 		if (not asks):
 			return None
-		asks.sort(reverse=True)
 		if (len(asks) < config.ORDERBOOK_INDEX_ESTIMATION):
 			return None
 		for ask in asks[config.ORDERBOOK_INDEX_ESTIMATION:]:
@@ -525,28 +830,18 @@ class Crypto:
 				return ask[0]
 
 	"""
-		Logs given string.
+		Logs given string. The line is only queued, it is written to logs.txt
+		and sent to Telegram by background threads.
 		text:	the string to log.
 		mode:	can be log or notification, if notification it will send a message to the Telegram bot.
 	"""
 	def log(self, text, mode="log"):
-		formatted_text = "[{}] {}".format(datetime.now().strftime("%d/%m/%Y %H:%M:%S"), text)
-		if (mode == "notification"):
-			self.bot.sendMessage(chat_id=secrets.TELEGRAM_CHAT, text=formatted_text)
-		if (mode == "notification" or mode == "log"):
-			with open('logs.txt', 'a+') as file:
-				file.write(formatted_text)
-				file.write("\n")
-
-	"""
-		Get the waiting time needed to bypass DDOS protection.
-		exchange:	the wanted exchange to limit.
-		returns:	None if no need to limit, a number of seconds to wait if there is.
-	"""
-	def get_waiting(self, exchange):
-		if (str(exchange) == "Bitfinex"):
-			return 2
-		return None
+		with self.metrics.timer('log'):
+			formatted_text = "[{}] {}".format(datetime.now().strftime("%d/%m/%Y %H:%M:%S"), text)
+			if (mode == "notification"):
+				self.notifier.send(formatted_text)
+			if (mode == "notification" or mode == "log"):
+				self.log_writer.write(formatted_text)
 
 	"""
 		Get last recorded balance, stored in balance.csv file.
@@ -579,7 +874,6 @@ class Crypto:
 	"""
 	def best_buy(self, exchange, asset1, asset2, amount_percentage):
 		orderbook = self.get_order_book(exchange, asset1, asset2, mode="asks")
-		orderbook.sort(key=itemgetter(0))
 		for price in orderbook[:config.MAX_ORDERBOOK_TRIES]:
 			self.log("Trying to buy {} with {} @{:.8f}.".format(asset1, asset2, price[0]))
 			result = self.buy(exchange, asset1, asset2, amount_percentage=amount_percentage, limit=price[0], timeout=config.WAIT_LIMIT_ORDER)
@@ -596,7 +890,6 @@ class Crypto:
 	"""
 	def best_sell(self, exchange, asset1, asset2, amount_percentage):
 		orderbook = self.get_order_book(exchange, asset1, asset2, mode="bids")
-		orderbook.sort(key=itemgetter(0), reverse=True)
 		for price in orderbook[:config.MAX_ORDERBOOK_TRIES]:
 			self.log("Trying to sell {} to {} @{:.8f}.".format(asset1, asset2, price[0]))
 			result = self.sell(exchange, asset1, asset2, amount_percentage=amount_percentage, limit=price[0], timeout=config.WAIT_LIMIT_ORDER)
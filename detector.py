@@ -0,0 +1,89 @@
+import threading
+import config
+
+"""
+	Event driven opportunity detection.
+	Instead of sweeping every alt, the detector is told which symbol changed
+	and only re-evaluates the triangles that use it: an ALT/ETH or ALT/BTC
+	update touches the ALT triangle, an ETH/BTC update touches all of them.
+	Updates that arrive while a triangle is waiting to be evaluated are
+	coalesced, so a burst of updates costs one evaluation.
+	For example:
+	detector = Detector(crypto, crypto.binance, alts, on_opportunity)
+	stream = DepthStream(crypto.binance, detector.symbols(), on_update=detector.on_update)
+	detector.start()
+"""
+class Detector:
+
+	def __init__(self, crypto, exchange, alts, on_opportunity):
+		self.crypto = crypto
+		self.exchange = exchange
+		self.alts = list(alts)
+		self.on_opportunity = on_opportunity
+		self.triangles = {'ETH/BTC': self.alts}
+		for alt in self.alts:
+			self.triangles['{}/ETH'.format(alt)] = [alt]
+			self.triangles['{}/BTC'.format(alt)] = [alt]
+		self.dirty = set()
+		self.condition = threading.Condition()
+		self.running = False
+		self.thread = None
+		self.evaluations = 0
+
+	"""
+		Get every symbol the triangles depend on.
+	"""
+	def symbols(self):
+		return list(self.triangles)
+
+	"""
+		Mark the triangles using the symbol as changed.
+		symbol:	the symbol that has been updated.
+	"""
+	def on_update(self, symbol):
+		alts = self.triangles.get(symbol)
+		if (not alts):
+			return
+		with self.condition:
+			self.dirty.update(alts)
+			self.condition.notify()
+
+	"""
+		Start evaluating changed triangles in a background thread.
+	"""
+	def start(self):
+		self.running = True
+		self.thread = threading.Thread(target=self.loop, daemon=True)
+		self.thread.start()
+
+	"""
+		Stop evaluating.
+	"""
+	def stop(self):
+		with self.condition:
+			self.running = False
+			self.condition.notify()
+
+	def loop(self):
+		while True:
+			with self.condition:
+				while (self.running and not self.dirty):
+					self.condition.wait()
+				if (not self.running):
+					return
+				alts = self.dirty
+				self.dirty = set()
+			for alt in alts:
+				self.evaluate(alt)
+
+	"""
+		Estimate both arbitrages on the alt, and report it if one of them is
+		above the threshold.
+		alt:	the alt to evaluate.
+	"""
+	def evaluate(self, alt):
+		self.evaluations += 1
+		delta_forward = self.crypto.estimate_arbitrage_forward(self.exchange, alt)
+		delta_backward = self.crypto.estimate_arbitrage_backward(self.exchange, alt)
+		if (max(delta_forward, delta_backward) > config.THRESHOLD):
+			self.on_opportunity(alt)
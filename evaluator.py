@@ -0,0 +1,174 @@
+import numpy as np
+
+"""
+	Vectorized triangle profit evaluator.
+	Keeps the best bid/ask of ALT/ETH and ALT/BTC for every alt, and the fee
+	multiplier of every leg, in aligned NumPy arrays. The forward and backward
+	profits of the whole universe are then computed in one pass.
+	Missing prices are NaN and never show up as opportunities.
+	For example:
+	evaluator = TriangleEvaluator(UniverseManager(crypto, crypto.binance).refresh())
+	evaluator.set_fees(0.999, 0.999)
+	evaluator.update('ETH/BTC', 0.05, 0.0501)
+	evaluator.update('LTC/ETH', 0.3, 0.301)
+	evaluator.update('LTC/BTC', 0.015, 0.0151)
+	evaluator.opportunities(config.THRESHOLD)
+"""
+class TriangleEvaluator:
+
+	def __init__(self, alts):
+		self.alts = list(alts)
+		self.index = {}
+		for i, alt in enumerate(self.alts):
+			self.index['{}/ETH'.format(alt)] = ('ETH', i)
+			self.index['{}/BTC'.format(alt)] = ('BTC', i)
+		n = len(self.alts)
+		self.alt_eth_bid = np.full(n, np.nan)
+		self.alt_eth_ask = np.full(n, np.nan)
+		self.alt_btc_bid = np.full(n, np.nan)
+		self.alt_btc_ask = np.full(n, np.nan)
+		self.eth_btc_bid = np.nan
+		self.eth_btc_ask = np.nan
+		self.alt_eth_buy_fee = np.ones(n)
+		self.alt_eth_sell_fee = np.ones(n)
+		self.alt_btc_buy_fee = np.ones(n)
+		self.alt_btc_sell_fee = np.ones(n)
+		self.eth_btc_buy_fee = 1.0
+		self.eth_btc_sell_fee = 1.0
+
+	"""
+		Get every symbol the triangles depend on.
+	"""
+	def symbols(self):
+		return ['ETH/BTC'] + list(self.index)
+
+	"""
+		Set the fee multipliers. If the fee is 0.1%, the multiplier is 0.999.
+		buy:	the buy multiplier, a number or an array aligned with alts.
+		sell:	the sell multiplier, a number or an array aligned with alts.
+	"""
+	def set_fees(self, buy, sell):
+		self.alt_eth_buy_fee[:] = buy
+		self.alt_btc_buy_fee[:] = buy
+		self.alt_eth_sell_fee[:] = sell
+		self.alt_btc_sell_fee[:] = sell
+		self.eth_btc_buy_fee = float(np.mean(buy))
+		self.eth_btc_sell_fee = float(np.mean(sell))
+
+	"""
+		Set the fee multipliers of one symbol.
+		symbol:		the market symbol, for example LTC/ETH.
+		buy:		the buy multiplier.
+		sell:		the sell multiplier.
+	"""
+	def set_symbol_fees(self, symbol, buy, sell):
+		if (symbol == 'ETH/BTC'):
+			self.eth_btc_buy_fee = buy
+			self.eth_btc_sell_fee = sell
+			return
+		if (symbol not in self.index):
+			return
+		quote, i = self.index[symbol]
+		if (quote == 'ETH'):
+			self.alt_eth_buy_fee[i] = buy
+			self.alt_eth_sell_fee[i] = sell
+		else:
+			self.alt_btc_buy_fee[i] = buy
+			self.alt_btc_sell_fee[i] = sell
+
+	"""
+		Set the best bid and ask of a symbol.
+		symbol:		the market symbol, for example LTC/ETH.
+		bid:		the best bid, None if unknown.
+		ask:		the best ask, None if unknown.
+		returns:	True if the symbol belongs to a triangle.
+	"""
+	def update(self, symbol, bid, ask):
+		bid = np.nan if bid is None else bid
+		ask = np.nan if ask is None else ask
+		if (symbol == 'ETH/BTC'):
+			self.eth_btc_bid = bid
+			self.eth_btc_ask = ask
+			return True
+		if (symbol not in self.index):
+			return False
+		quote, i = self.index[symbol]
+		if (quote == 'ETH'):
+			self.alt_eth_bid[i] = bid
+			self.alt_eth_ask[i] = ask
+		else:
+			self.alt_btc_bid[i] = bid
+			self.alt_btc_ask[i] = ask
+		return True
+
+	"""
+		Set the best bids and asks from ccxt tickers.
+		tickers:	a dict of ccxt tickers keyed by symbol.
+		symbols:	the symbols that were requested. Those missing from tickers
+					are reset to NaN, so an old price is never used again.
+	"""
+	def update_tickers(self, tickers, symbols=None):
+		for symbol in (symbols or []):
+			if (symbol not in tickers):
+				self.update(symbol, None, None)
+		for symbol, ticker in tickers.items():
+			self.update(symbol, ticker.get('bid'), ticker.get('ask'))
+
+	"""
+		Get the alts that miss at least one price.
+	"""
+	def missing(self):
+		if (np.isnan(self.eth_btc_bid) or np.isnan(self.eth_btc_ask)):
+			return list(self.alts)
+		prices = np.vstack((self.alt_eth_bid, self.alt_eth_ask, self.alt_btc_bid, self.alt_btc_ask))
+		return [self.alts[i] for i in np.flatnonzero(np.isnan(prices).any(axis=0))]
+
+	"""
+		Compute the estimated profits of every alt.
+		returns:	the forward and backward percentage arrays, aligned with alts.
+	"""
+	def evaluate(self):
+		with np.errstate(divide='ignore', invalid='ignore'):
+			forward = self.alt_eth_buy_fee / self.alt_eth_ask
+			forward *= self.alt_btc_bid * self.alt_btc_sell_fee
+			forward *= self.eth_btc_buy_fee / self.eth_btc_ask
+			backward = np.full(len(self.alts), self.eth_btc_bid * self.eth_btc_sell_fee)
+			backward *= self.alt_btc_buy_fee / self.alt_btc_ask
+			backward *= self.alt_eth_bid * self.alt_eth_sell_fee
+		return (forward - 1) * 100, (backward - 1) * 100
+
+	"""
+		Get the best estimated percentage of some alts, forward or backward.
+		alts:		the wanted alts, all of them if None.
+		returns:	a dict keyed by alt, without the alts missing a price.
+	"""
+	def best(self, alts=None):
+		forward, backward = self.evaluate()
+		profits = np.fmax(forward, backward)
+		best = {}
+		for alt in (self.alts if alts is None else alts):
+			i = self.alt_index(alt)
+			if (i is not None and not np.isnan(profits[i])):
+				best[alt] = float(profits[i])
+		return best
+
+	"""
+		Get the position of an alt in the arrays, None if unknown.
+	"""
+	def alt_index(self, alt):
+		entry = self.index.get('{}/ETH'.format(alt))
+		return entry[1] if entry else None
+
+	"""
+		Get the opportunities above the threshold, best first.
+		threshold:	the minimum estimated percentage.
+		returns:	a list of (alt, 'forward' or 'backward', percentage).
+	"""
+	def opportunities(self, threshold):
+		forward, backward = self.evaluate()
+		profits = np.concatenate((forward, backward))
+		with np.errstate(invalid='ignore'):
+			found = np.flatnonzero(profits > threshold)
+		found = found[np.argsort(-profits[found])]
+		n = len(self.alts)
+		return [(self.alts[i % n], 'forward' if i < n else 'backward', float(profits[i])) for i in found]
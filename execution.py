@@ -0,0 +1,179 @@
+import time
+import config
+from orders import OrderTracker
+
+"""
+	Pipelined triangle execution.
+	The first leg is a limit order at the best price. Every time a part of it
+	is filled, what we received is sent right away to the second leg as a
+	market order, and what the second leg returns goes to the third leg. So the
+	last fill comes shortly after the first one instead of after three
+	complete legs. The inventory of each asset is tracked along the way, and
+	what is left when the first leg ends is converted back to ETH in one
+	clean-up step. An amount the exchange would refuse is kept in the
+	inventory instead of being sent. Order placements and the waits for the
+	fills of the first leg are timed in the metrics of the Crypto instance.
+	For example:
+	TriangleExecutor(crypto, crypto.binance).run('LTC', 'forward')
+"""
+class TriangleExecutor:
+
+	def __init__(self, crypto, exchange):
+		self.crypto = crypto
+		self.exchange = exchange
+		self.inventory = {}
+
+	"""
+		Get the three legs of a triangle, each one is (asset1, asset2, side).
+		asset:		the alt of the triangle.
+		direction:	forward (ETH -> ALT -> BTC -> ETH) or backward
+					(ETH -> BTC -> ALT -> ETH).
+	"""
+	@staticmethod
+	def legs(asset, direction):
+		if (direction == 'forward'):
+			return [(asset, 'ETH', 'buy'), (asset, 'BTC', 'sell'), ('ETH', 'BTC', 'buy')]
+		return [('ETH', 'BTC', 'sell'), (asset, 'BTC', 'buy'), (asset, 'ETH', 'sell')]
+
+	"""
+		Get the asset a leg spends and the asset it returns.
+	"""
+	@staticmethod
+	def assets(leg):
+		asset1, asset2, side = leg
+		if (side == 'buy'):
+			return asset2, asset1
+		return asset1, asset2
+
+	"""
+		Record a fill in the inventory.
+		leg:		the leg of the fill.
+		filled:		the base amount filled.
+		price:		the average price of the fill.
+		maker:		the part of filled that rested in the book.
+	"""
+	def record(self, leg, filled, price, maker=0):
+		spent, received = TriangleExecutor.assets(leg)
+		side = leg[2]
+		fee = self.crypto.get_fill_fees(self.exchange, side, '{}/{}'.format(leg[0], leg[1]), filled, maker)
+		self.crypto.record_fill(self.exchange, leg[0], leg[1], side, filled, price, maker)
+		if (side == 'buy'):
+			self.inventory[spent] = self.inventory.get(spent, 0) - filled * price
+			self.inventory[received] = self.inventory.get(received, 0) + filled * fee
+		else:
+			self.inventory[spent] = self.inventory.get(spent, 0) - filled
+			self.inventory[received] = self.inventory.get(received, 0) + filled * price * fee
+
+	"""
+		Send the available inventory of the asset a leg spends as a market
+		order, then pass the result to the next leg.
+		legs:	the legs of the triangle.
+		i:		the index of the leg.
+	"""
+	def forward(self, legs, i):
+		if (i >= len(legs)):
+			return
+		leg = legs[i]
+		asset1, asset2, side = leg
+		spent, _ = TriangleExecutor.assets(leg)
+		available = self.inventory.get(spent, 0)
+		if (available <= 0):
+			return
+		symbol = '{}/{}'.format(asset1, asset2)
+		try:
+			price = self.crypto.get_price(self.exchange, asset1, asset2, mode='ask' if side == 'buy' else 'bid')
+			amount = self.crypto.markets.round_amount(self.exchange, symbol, available / price if side == 'buy' else available)
+			if (self.crypto.markets.check(self.exchange, symbol, amount, price)):
+				return
+			with self.crypto.metrics.timer('place_order', self.exchange, symbol):
+				if (side == 'buy'):
+					order = self.exchange.createMarketBuyOrder(symbol, amount)
+				else:
+					order = self.exchange.createMarketSellOrder(symbol, amount)
+		except Exception as e:
+			self.crypto.log("Error while sending {} to {}: {}".format(spent, symbol, str(e)))
+			return
+		filled = order.get('filled') or amount
+		price = order.get('average') or order.get('price') or self.crypto.get_price(self.exchange, asset1, asset2, mode='ask' if side == 'buy' else 'bid')
+		self.record(leg, filled, price)
+		self.crypto.log("Leg {} {} {:.8f} {} @{:.8f}.".format(i + 1, side, filled, symbol, price))
+		self.forward(legs, i + 1)
+
+	"""
+		Convert every asset left in the inventory back to ETH. An asset is
+		only cleared once its order went through, what cannot be converted
+		back is notified.
+		legs:	the legs of the triangle.
+	"""
+	def unwind(self, legs):
+		for asset, amount in list(self.inventory.items()):
+			if (asset == 'ETH' or amount <= 0):
+				continue
+			self.crypto.log("Converting back {:.8f} {} to ETH.".format(amount, asset))
+			if (asset == 'BTC'):
+				done = self.crypto.buy(self.exchange, 'ETH', 'BTC', amount=amount / self.crypto.get_price(self.exchange, 'ETH', 'BTC', mode='ask'))
+			else:
+				done = self.crypto.sell(self.exchange, asset, 'ETH', amount=amount)
+			if (done):
+				self.inventory[asset] = 0
+			else:
+				self.crypto.log("❌ Cannot convert back {:.8f} {} to ETH on {}.".format(amount, asset, self.exchange), mode="notification")
+
+	"""
+		Execute an arbitrage.
+		asset:		the alt of the triangle.
+		direction:	forward or backward.
+		returns:	True if the first leg has been completely filled.
+	"""
+	def run(self, asset, direction):
+		legs = TriangleExecutor.legs(asset, direction)
+		self.crypto.log("🔥 Pipelined arbitrage on {}: {} {}".format(self.exchange, direction, asset))
+		balance_before = self.crypto.get_balance(self.exchange, 'ETH')
+		size = balance_before * config.ETH_PERCENTAGE
+		asset1, asset2, side = legs[0]
+		symbol = '{}/{}'.format(asset1, asset2)
+		book = self.crypto.get_order_book(self.exchange, asset1, asset2, mode='asks' if side == 'buy' else 'bids')
+		if (not book):
+			self.crypto.log("❌ No order book for {}, canceling arbitrage.".format(symbol), mode="notification")
+			return False
+		price = self.crypto.markets.round_price(self.exchange, symbol, book[0][0], side)
+		amount = self.crypto.markets.round_amount(self.exchange, symbol, size / price if side == 'buy' else size)
+		reason = self.crypto.markets.check(self.exchange, symbol, amount, price)
+		if (reason):
+			self.crypto.log("❌ Cannot place first leg on {}: {}.".format(symbol, reason))
+			return False
+		try:
+			with self.crypto.metrics.timer('place_order', self.exchange, symbol):
+				if (side == 'buy'):
+					order = self.exchange.createLimitBuyOrder(symbol, amount, price)
+				else:
+					order = self.exchange.createLimitSellOrder(symbol, amount, price)
+		except Exception as e:
+			self.crypto.log("❌ Error while placing first leg on {}: {}".format(symbol, str(e)), mode="notification")
+			return False
+		seen = 0
+		seen_maker = 0
+		deadline = time.time() + config.PIPELINE_TIMEOUT
+		state = {'status': OrderTracker.OPEN, 'filled': 0, 'maker': 0}
+		while (state['status'] == OrderTracker.OPEN and time.time() < deadline):
+			with self.crypto.metrics.timer('fill', self.exchange, symbol):
+				state = self.crypto.orders.wait(self.exchange, order['id'], symbol, deadline - time.time(), filled=seen)
+			if (state['filled'] > seen):
+				self.record(legs[0], state['filled'] - seen, price, state['maker'] - seen_maker)
+				seen = state['filled']
+				seen_maker = state['maker']
+				self.forward(legs, 1)
+		if (state['status'] == OrderTracker.OPEN):
+			self.crypto.cancel_order(self.exchange, order['id'], asset1, asset2)
+			with self.crypto.metrics.timer('fill', self.exchange, symbol):
+				state = self.crypto.orders.wait(self.exchange, order['id'], symbol, 0)
+			if (state['filled'] > seen):
+				self.record(legs[0], state['filled'] - seen, price, state['maker'] - seen_maker)
+				seen = state['filled']
+				seen_maker = state['maker']
+		self.crypto.metrics.count('orders_{}'.format(state['status']), 'fill', self.exchange, symbol)
+		self.crypto.orders.forget(order['id'])
+		self.forward(legs, 1)
+		self.unwind(legs)
+		self.crypto.summarize_arbitrage(self.exchange, balance_before, asset)
+		return state['status'] == OrderTracker.FILLED
@@ -0,0 +1,167 @@
+"""
+	Local stand-in for the exchange depth streams.
+	It replays a recorded session over a websocket with the Binance combined
+	stream protocol, and serves order book snapshots over http, so DepthStream
+	can be run and tested without touching the exchange.
+	A recording is a text file with one JSON object per line, either:
+	{"type": "snapshot", "symbol": "LTC/ETH", "book": {"nonce": 1, "bids": [...], "asks": [...]}}
+	or a combined stream message:
+	{"stream": "ltceth@depth@100ms", "data": {"e": "depthUpdate", "E": 1, "s": "LTCETH", "U": 2, "u": 2, "b": [...], "a": [...]}}
+	Snapshots served over http are built from the replayed updates.
+	python3 feed_server.py session.jsonl --port 9443 --speed 10
+	stream = DepthStream(exchange, symbols, url='ws://localhost:9443/stream',
+		snapshot=feed_server.snapshot_fetcher('http://localhost:9444'))
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import websockets
+from stream import LocalBook
+
+"""
+	Replays a recording to every connected client.
+	path:		the recording file.
+	speed:		replay speed factor, 0 replays as fast as possible.
+	loop:		restart the recording when it ends.
+	drop_every:	drop one update out of drop_every, to test gap recovery.
+"""
+class FeedServer:
+
+	def __init__(self, path, speed=1, loop=False, drop_every=None):
+		self.path = path
+		self.speed = speed
+		self.loop = loop
+		self.drop_every = drop_every
+		self.books = {}
+		self.ids = {}
+		self.clients = set()
+
+	"""
+		Read the recording.
+		returns:	the list of recorded messages.
+	"""
+	def read(self):
+		with open(self.path, 'r') as file:
+			return [json.loads(line) for line in file if line.strip()]
+
+	"""
+		Get the current snapshot of a symbol.
+		symbol:		the wanted symbol, for example LTC/ETH or LTCETH.
+		returns:	the order book in the ccxt format, None if unknown.
+	"""
+	def snapshot(self, symbol):
+		symbol = self.ids.get(symbol, symbol)
+		if (symbol not in self.books):
+			return None
+		return self.books[symbol].to_ccxt()
+
+	async def handler(self, websocket, path=None):
+		self.clients.add(websocket)
+		try:
+			await websocket.wait_closed()
+		finally:
+			self.clients.discard(websocket)
+
+	async def replay(self):
+		while True:
+			n = 0
+			last_time = None
+			for message in self.read():
+				if (message.get('type') == 'snapshot'):
+					symbol = message['symbol']
+					self.ids[symbol.replace('/', '')] = symbol
+					self.books[symbol] = LocalBook()
+					self.books[symbol].load_snapshot(message['book'])
+					continue
+				event = message['data']
+				if (self.speed and last_time is not None):
+					await asyncio.sleep(max(0, event['E'] - last_time) / 1000 / self.speed)
+				last_time = event['E']
+				symbol = self.ids.get(event['s'])
+				if (symbol):
+					self.books[symbol].apply(event)
+				n += 1
+				if (self.drop_every and n % self.drop_every == 0):
+					continue
+				data = json.dumps(message)
+				for client in list(self.clients):
+					try:
+						await client.send(data)
+					except websockets.ConnectionClosed:
+						self.clients.discard(client)
+				if (not self.speed):
+					await asyncio.sleep(0)
+			if (not self.loop):
+				break
+
+	async def serve(self, host, port):
+		async with websockets.serve(self.handler, host, port):
+			await self.replay()
+
+"""
+	Serves the snapshots of a FeedServer as Binance depth responses.
+"""
+def snapshot_handler(server):
+	class SnapshotHandler(BaseHTTPRequestHandler):
+		def do_GET(self):
+			query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+			book = server.snapshot(query.get('symbol', [''])[0])
+			if (book is None):
+				self.send_response(404)
+				self.end_headers()
+				return
+			limit = int(query.get('limit', [1000])[0])
+			body = json.dumps({
+				'lastUpdateId': book['nonce'],
+				'bids': [[str(price), str(size)] for price, size in book['bids'][:limit]],
+				'asks': [[str(price), str(size)] for price, size in book['asks'][:limit]],
+			}).encode()
+			self.send_response(200)
+			self.send_header('Content-Type', 'application/json')
+			self.end_headers()
+			self.wfile.write(body)
+
+		def log_message(self, format, *args):
+			pass
+	return SnapshotHandler
+
+"""
+	Build a snapshot function for DepthStream that queries a feed server.
+	url:		the http url of the feed server.
+	returns:	function(symbol) returning a ccxt order book with a nonce.
+"""
+def snapshot_fetcher(url):
+	def fetch(symbol):
+		query = urllib.parse.urlencode({'symbol': symbol.replace('/', '')})
+		with urllib.request.urlopen('{}/depth?{}'.format(url, query)) as response:
+			data = json.loads(response.read())
+		return {
+			'nonce': data['lastUpdateId'],
+			'bids': [[float(price), float(size)] for price, size in data['bids']],
+			'asks': [[float(price), float(size)] for price, size in data['asks']],
+			'timestamp': int(time.time() * 1000),
+		}
+	return fetch
+
+"""
+	Main
+"""
+if (__name__ == "__main__"):
+	parser = argparse.ArgumentParser(description="Replay a recorded depth session.")
+	parser.add_argument('recording')
+	parser.add_argument('--host', default='localhost')
+	parser.add_argument('--port', type=int, default=9443)
+	parser.add_argument('--speed', type=float, default=1)
+	parser.add_argument('--loop', action='store_true')
+	parser.add_argument('--drop-every', type=int, default=None)
+	args = parser.parse_args()
+	server = FeedServer(args.recording, speed=args.speed, loop=args.loop, drop_every=args.drop_every)
+	http = ThreadingHTTPServer((args.host, args.port + 1), snapshot_handler(server))
+	threading.Thread(target=http.serve_forever, daemon=True).start()
+	asyncio.run(server.serve(args.host, args.port))
@@ -0,0 +1,98 @@
+import threading
+import time
+import config
+
+"""
+	Per-symbol fee schedule.
+	The maker and taker rates of every symbol are fetched from the exchange
+	with fetchTradingFees, so they include our VIP tier. When the exchange
+	cannot give them, the rates of the market metadata are used. Rates are
+	kept in a dict for FEES_REFRESH_INTERVAL seconds, then refreshed in the
+	background while the old ones are still served. The first time, one
+	thread fetches them and the others wait for it, so a pool starting up
+	sends a single request.
+	For example:
+	schedule = FeeSchedule(crypto.markets)
+	schedule.rate(crypto.binance, 'LTC/ETH', 'maker')
+"""
+class FeeSchedule:
+
+	def __init__(self, markets, log=None):
+		self.markets = markets
+		self.log = log or (lambda text: None)
+		self.lock = threading.Lock()
+		self.rates = {}
+		self.loaded = {}
+		self.refreshing = set()
+		self.ready = {}
+
+	"""
+		Fetch the rates of an exchange.
+		exchange:	the wanted exchange.
+	"""
+	def load(self, exchange):
+		rates = {}
+		try:
+			if (exchange.has.get('fetchTradingFees')):
+				for symbol, fee in exchange.fetchTradingFees().items():
+					if (isinstance(fee, dict) and fee.get('maker') is not None and fee.get('taker') is not None):
+						rates[symbol] = (fee['maker'], fee['taker'])
+		except Exception as e:
+			self.log("Error while fetching trading fees on {}: {}".format(exchange, str(e)))
+		if (not rates):
+			for symbol, market in self.markets.all(exchange).items():
+				if (market['maker'] is not None and market['taker'] is not None):
+					rates[symbol] = (market['maker'], market['taker'])
+		discount = config.FEE_DISCOUNT.get(exchange.id, 0)
+		rates = {symbol: (maker * (1 - discount), taker * (1 - discount)) for symbol, (maker, taker) in rates.items()}
+		with self.lock:
+			self.rates[exchange.id] = rates
+			self.loaded[exchange.id] = time.time()
+			self.refreshing.discard(exchange.id)
+
+	def refresh(self, exchange):
+		with self.lock:
+			if (exchange.id in self.refreshing):
+				return
+			self.refreshing.add(exchange.id)
+		threading.Thread(target=self.load, args=(exchange,), daemon=True).start()
+
+	"""
+		Load the rates of an exchange the first time they are needed. The
+		first thread loads them, the others wait until it is done.
+	"""
+	def first_load(self, exchange):
+		with self.lock:
+			ready = self.ready.get(exchange.id)
+			loading = ready is None
+			if (loading):
+				ready = self.ready[exchange.id] = threading.Event()
+				self.refreshing.add(exchange.id)
+		if (not loading):
+			ready.wait()
+			return
+		try:
+			self.load(exchange)
+		finally:
+			with self.lock:
+				if (exchange.id not in self.rates):
+					del self.ready[exchange.id]
+				self.refreshing.discard(exchange.id)
+			ready.set()
+
+	"""
+		Get the fee rate of a symbol. If the fee is 0.1%, the rate is 0.001.
+		exchange:	the wanted exchange.
+		symbol:		the wanted symbol.
+		liquidity:	maker if the fill rested in the book, taker if it took the book.
+		returns:	the rate, None if unknown.
+	"""
+	def rate(self, exchange, symbol, liquidity):
+		if (exchange.id not in self.rates):
+			self.first_load(exchange)
+		elif (time.time() - self.loaded[exchange.id] > config.FEES_REFRESH_INTERVAL):
+			self.refresh(exchange)
+		rates = self.rates.get(exchange.id, {}).get(symbol)
+		if (not rates):
+			return None
+		return rates[0] if liquidity == 'maker' else rates[1]
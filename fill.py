@@ -0,0 +1,59 @@
+from book import BookSide
+
+"""
+	Fill simulation.
+	Walks the levels of an order book side to know how much of an order would
+	be executed right now and at which average price (VWAP). Book sides are
+	lists of [price, size] sorted from the best price, as returned by ccxt, or
+	book.BookSide which answers with a binary search on its cumulative depth.
+	For example, to know how much LTC 1 ETH buys:
+	vwap, filled, spent = simulate_buy(crypto.get_order_book(exchange, 'LTC', 'ETH', mode='asks'), quote_amount=1)
+"""
+
+"""
+	Simulate a market buy on the asks.
+	asks:			the asks, best (lowest) first.
+	quote_amount:	the amount of quote asset to spend.
+	base_amount:	the amount of base asset to buy, if quote_amount is None.
+	returns:		the VWAP, the base amount bought and the quote amount spent.
+					The VWAP is None if nothing can be bought.
+"""
+def simulate_buy(asks, quote_amount=None, base_amount=None):
+	if (isinstance(asks, BookSide)):
+		return asks.fill(base_amount=base_amount, quote_amount=quote_amount)
+	filled = 0
+	spent = 0
+	for price, size in asks:
+		if (quote_amount is not None):
+			take = min(size, (quote_amount - spent) / price)
+		else:
+			take = min(size, base_amount - filled)
+		if (take <= 0):
+			break
+		filled += take
+		spent += take * price
+	if (filled == 0):
+		return None, 0, 0
+	return spent / filled, filled, spent
+
+"""
+	Simulate a market sell on the bids.
+	bids:			the bids, best (highest) first.
+	base_amount:	the amount of base asset to sell.
+	returns:		the VWAP, the base amount sold and the quote amount received.
+					The VWAP is None if nothing can be sold.
+"""
+def simulate_sell(bids, base_amount):
+	if (isinstance(bids, BookSide)):
+		return bids.fill(base_amount=base_amount)
+	filled = 0
+	received = 0
+	for price, size in bids:
+		take = min(size, base_amount - filled)
+		if (take <= 0):
+			break
+		filled += take
+		received += take * price
+	if (filled == 0):
+		return None, 0, 0
+	return received / filled, filled, received
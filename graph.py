@@ -0,0 +1,163 @@
+import math
+import numpy as np
+import config
+
+"""
+	Graph based arbitrage detection.
+	Every currency is a node, every market gives two edges: quote -> base when
+	we buy at the ask, base -> quote when we sell at the bid. An edge weight is
+	-log(rate * fee), so a cycle whose weights sum under 0 makes profit.
+	The cycles of length 3 to max_length through the start currencies are
+	enumerated once, each of them from the first start currency it goes
+	through, so a cycle is not found again from another of its currencies.
+	Each edge knows the cycles that use it, so when a price changes only the
+	sums of those cycles are updated.
+	For example:
+	markets = crypto.binance.load_markets()
+	graph = ArbitrageGraph(markets, ArbitrageGraph.quotes(markets))
+	graph.update('LTC/ETH', 0.3, 0.301)
+	graph.opportunities(config.THRESHOLD)
+"""
+class ArbitrageGraph:
+
+	# Weight of an edge without price, large enough to never be profitable
+	MISSING = 1e6
+
+	"""
+		markets:	the ccxt markets, keyed by symbol.
+		start:		the currencies cycles start from.
+		max_length:	the maximum number of edges in a cycle.
+		fee:		function(symbol, side) returning the fee multiplier.
+	"""
+	def __init__(self, markets, start, max_length=None, fee=None):
+		self.fee = fee or (lambda symbol, side: 0.999)
+		self.max_length = max_length or config.GRAPH_MAX_CYCLE_LENGTH
+		self.nodes = {}
+		self.edges = []
+		self.edge_index = {}
+		self.neighbours = {}
+		for symbol, market in markets.items():
+			if (not market.get('active', True)):
+				continue
+			base = market['base']
+			quote = market['quote']
+			self.add_edge(quote, base, symbol, 'buy')
+			self.add_edge(base, quote, symbol, 'sell')
+		self.weights = np.full(len(self.edges), ArbitrageGraph.MISSING)
+		self.cycles = []
+		done = set()
+		for currency in start:
+			if (currency in self.nodes and currency not in done):
+				self.find_cycles(currency, done)
+				done.add(currency)
+		self.cycle_edges = np.full((len(self.cycles), self.max_length), -1, dtype=np.int64)
+		self.edge_cycles = [[] for _ in self.edges]
+		for i, cycle in enumerate(self.cycles):
+			self.cycle_edges[i, :len(cycle)] = cycle
+			for edge in cycle:
+				self.edge_cycles[edge].append(i)
+		self.edge_cycles = [np.array(cycles, dtype=np.int64) for cycles in self.edge_cycles]
+		self.sums = np.zeros(len(self.cycles))
+		self.updates = 0
+		self.refresh()
+
+	"""
+		Get every quote currency of the markets, the start currencies of the
+		cycles through the whole graph.
+	"""
+	@staticmethod
+	def quotes(markets):
+		return sorted({market['quote'] for market in markets.values() if market.get('active', True)})
+
+	def add_edge(self, source, target, symbol, side):
+		for node in (source, target):
+			if (node not in self.nodes):
+				self.nodes[node] = len(self.nodes)
+				self.neighbours[node] = []
+		self.edge_index[(symbol, side)] = len(self.edges)
+		self.neighbours[source].append(len(self.edges))
+		self.edges.append((source, target, symbol, side))
+
+	"""
+		Enumerate the simple cycles of length 3 to max_length from a currency.
+		done:	the start currencies already enumerated, the cycles through
+				them have been found.
+	"""
+	def find_cycles(self, start, done=()):
+		stack = [(start, [], {start})]
+		while stack:
+			node, path, visited = stack.pop()
+			for edge in self.neighbours[node]:
+				target = self.edges[edge][1]
+				if (target == start and len(path) >= 2):
+					self.cycles.append(path + [edge])
+				elif (target not in visited and target not in done and len(path) + 1 < self.max_length):
+					stack.append((target, path + [edge], visited | {target}))
+
+	"""
+		Recompute every cycle sum from the edge weights. Incremental updates
+		accumulate rounding errors, so this runs every GRAPH_REFRESH_UPDATES.
+	"""
+	def refresh(self):
+		if (len(self.cycles) == 0):
+			return
+		padded = np.append(self.weights, 0)
+		self.sums = padded[self.cycle_edges].sum(axis=1)
+
+	"""
+		Set the weight of an edge and update the cycles using it.
+	"""
+	def set_weight(self, edge, weight):
+		delta = weight - self.weights[edge]
+		if (delta == 0):
+			return
+		self.weights[edge] = weight
+		self.sums[self.edge_cycles[edge]] += delta
+
+	"""
+		Update the prices of a market.
+		symbol:		the market symbol.
+		bid:		the best bid, None if unknown.
+		ask:		the best ask, None if unknown.
+	"""
+	def update(self, symbol, bid, ask):
+		buy = self.edge_index.get((symbol, 'buy'))
+		if (buy is None):
+			return
+		sell = self.edge_index[(symbol, 'sell')]
+		if (ask):
+			self.set_weight(buy, -math.log(self.fee(symbol, 'buy') / ask))
+		else:
+			self.set_weight(buy, ArbitrageGraph.MISSING)
+		if (bid):
+			self.set_weight(sell, -math.log(bid * self.fee(symbol, 'sell')))
+		else:
+			self.set_weight(sell, ArbitrageGraph.MISSING)
+		self.updates += 1
+		if (self.updates % config.GRAPH_REFRESH_UPDATES == 0):
+			self.refresh()
+
+	"""
+		Describe a cycle.
+		returns:	the list of (symbol, side) legs and the list of currencies.
+	"""
+	def describe(self, cycle):
+		edges = [self.edges[edge] for edge in cycle if edge >= 0]
+		legs = [(edge[2], edge[3]) for edge in edges]
+		path = [edges[0][0]] + [edge[1] for edge in edges]
+		return legs, path
+
+	"""
+		Get the profitable cycles, best first.
+		threshold:	the minimum estimated percentage.
+		returns:	a list of (percentage, currencies, legs).
+	"""
+	def opportunities(self, threshold):
+		limit = -math.log(1 + threshold / 100)
+		found = np.flatnonzero(self.sums < limit)
+		found = found[np.argsort(self.sums[found])]
+		result = []
+		for i in found:
+			legs, path = self.describe(self.cycles[i])
+			result.append(((math.exp(-self.sums[i]) - 1) * 100, path, legs))
+		return result
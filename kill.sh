@@ -1,2 +1,2 @@
 #!/bin/sh
-killall python3
+pkill -TERM -f "python3 run.py"
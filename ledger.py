@@ -0,0 +1,103 @@
+import threading
+import time
+import config
+
+"""
+	In-memory balance ledger.
+	The free balances of an exchange are fetched once, then updated locally
+	from our own fills, so sizing an order does not need a round-trip. A
+	background thread reconciles the ledger with the exchange every
+	LEDGER_RECONCILE_INTERVAL seconds, or sooner when asked to, for example
+	after an order error.
+	For example:
+	ledger = BalanceLedger()
+	ledger.get(crypto.binance, 'ETH')
+	ledger.record_fill(crypto.binance, 'LTC', 'ETH', 'buy', 1, 0.3, 0.999)
+"""
+class BalanceLedger:
+
+	def __init__(self, log=None):
+		self.log = log or (lambda text: None)
+		self.lock = threading.Lock()
+		self.balances = {}
+		self.exchanges = {}
+		self.reconciled = {}
+		self.wake = threading.Event()
+		self.thread = threading.Thread(target=self.loop, name="ledger", daemon=True)
+		self.thread.start()
+
+	"""
+		Fetch the balances from the exchange and replace the local ones.
+		Logs the assets that drifted by more than LEDGER_DRIFT_TOLERANCE.
+		exchange:	the wanted exchange.
+	"""
+	def reconcile(self, exchange):
+		balance = exchange.fetchBalance()
+		free = {asset: value for asset, value in (balance.get('free') or {}).items() if value is not None}
+		with self.lock:
+			local = self.balances.get(exchange.id)
+			self.balances[exchange.id] = free
+			self.exchanges[exchange.id] = exchange
+			self.reconciled[exchange.id] = time.time()
+		if (local is None):
+			return
+		for asset in set(local) | set(free):
+			drift = free.get(asset, 0) - local.get(asset, 0)
+			if (abs(drift) > config.LEDGER_DRIFT_TOLERANCE * max(abs(free.get(asset, 0)), 1e-12)):
+				self.log("Ledger drift on {} for {}: {:.8f}".format(exchange, asset, drift))
+
+	"""
+		Get the free balance of an asset. The ledger is seeded on first use.
+		exchange:	the wanted exchange.
+		asset:		the wanted asset.
+	"""
+	def get(self, exchange, asset):
+		with self.lock:
+			balances = self.balances.get(exchange.id)
+			if (balances is not None):
+				return balances.get(asset, 0)
+		self.reconcile(exchange)
+		with self.lock:
+			return self.balances[exchange.id].get(asset, 0)
+
+	"""
+		Update the balances with a fill.
+		exchange:	the exchange of the fill.
+		asset1:		first asset.
+		asset2:		second asset.
+		side:		buy or sell.
+		filled:		the amount of asset1 filled.
+		price:		the average price of the fill.
+		fee:		the fee multiplier applied to what we receive.
+	"""
+	def record_fill(self, exchange, asset1, asset2, side, filled, price, fee):
+		if (not filled or not price):
+			return
+		with self.lock:
+			balances = self.balances.get(exchange.id)
+			if (balances is None):
+				return
+			if (side == 'buy'):
+				balances[asset1] = balances.get(asset1, 0) + filled * fee
+				balances[asset2] = balances.get(asset2, 0) - filled * price
+			else:
+				balances[asset1] = balances.get(asset1, 0) - filled
+				balances[asset2] = balances.get(asset2, 0) + filled * price * fee
+
+	"""
+		Ask the background thread to reconcile every exchange now.
+	"""
+	def request_reconcile(self):
+		self.wake.set()
+
+	def loop(self):
+		while True:
+			self.wake.wait(config.LEDGER_RECONCILE_INTERVAL)
+			self.wake.clear()
+			with self.lock:
+				exchanges = list(self.exchanges.values())
+			for exchange in exchanges:
+				try:
+					self.reconcile(exchange)
+				except Exception as e:
+					self.log("Error while reconciling balances on {}: {}".format(exchange, str(e)))
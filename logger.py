@@ -0,0 +1,138 @@
+import atexit
+import queue
+import threading
+import time
+import config
+
+"""
+	Background logging.
+	Callers only put lines in a bounded queue. A single writer thread keeps the
+	log file open and writes the lines in batches. If the queue is full, lines
+	are dropped and counted instead of blocking the caller.
+	For example:
+	writer = LogWriter('logs.txt')
+	writer.write("[17/10/2026 12:00:00] Hello world")
+"""
+class LogWriter:
+
+	def __init__(self, path, size=None):
+		self.path = path
+		self.queue = queue.Queue(maxsize=size or config.LOG_QUEUE_SIZE)
+		self.dropped = 0
+		self.thread = threading.Thread(target=self.loop, name="log-writer", daemon=True)
+		self.thread.start()
+		atexit.register(self.close)
+
+	"""
+		Queue a line to be written.
+		line:	the line to write, without new line.
+	"""
+	def write(self, line):
+		try:
+			self.queue.put_nowait(line)
+		except queue.Full:
+			self.dropped += 1
+
+	def loop(self):
+		with open(self.path, 'a+') as file:
+			while True:
+				lines = [self.queue.get()]
+				while len(lines) < config.LOG_BATCH_SIZE:
+					try:
+						lines.append(self.queue.get_nowait())
+					except queue.Empty:
+						break
+				stop = None in lines
+				lines = [line for line in lines if line is not None]
+				if (self.dropped):
+					lines.append("[{} log lines dropped]".format(self.dropped))
+					self.dropped = 0
+				if (lines):
+					file.write("\n".join(lines))
+					file.write("\n")
+					file.flush()
+				if (stop):
+					return
+
+	"""
+		Write the queued lines and stop the writer.
+	"""
+	def close(self):
+		if (self.thread.is_alive()):
+			self.queue.put(None)
+			self.thread.join(timeout=5)
+
+"""
+	Background Telegram notifications.
+	Messages are queued and sent by a single thread. The messages queued while
+	a message was being sent are coalesced in one, and a failed send is retried
+	with an increasing delay.
+	For example:
+	notifier = Notifier(telegram.Bot(token=secrets.TELEGRAM), secrets.TELEGRAM_CHAT)
+	notifier.send("Found opportunity")
+"""
+class Notifier:
+
+	# Telegram refuses longer messages
+	MAX_LENGTH = 4096
+
+	def __init__(self, bot, chat_id, size=None):
+		self.bot = bot
+		self.chat_id = chat_id
+		self.queue = queue.Queue(maxsize=size or config.LOG_QUEUE_SIZE)
+		self.dropped = 0
+		self.thread = threading.Thread(target=self.loop, name="notifier", daemon=True)
+		self.thread.start()
+
+	"""
+		Queue a message to be sent.
+	"""
+	def send(self, text):
+		try:
+			self.queue.put_nowait(text)
+		except queue.Full:
+			self.dropped += 1
+
+	def loop(self):
+		while True:
+			messages = [self.queue.get()]
+			while True:
+				try:
+					messages.append(self.queue.get_nowait())
+				except queue.Empty:
+					break
+			stop = None in messages
+			messages = [message for message in messages if message is not None]
+			text = ""
+			for message in messages:
+				if (text and len(text) + len(message) + 1 > Notifier.MAX_LENGTH):
+					self.deliver(text)
+					text = ""
+				text = "{}\n{}".format(text, message) if text else message[:Notifier.MAX_LENGTH]
+			if (text):
+				self.deliver(text)
+			if (stop):
+				return
+
+	"""
+		Send the queued messages and stop the notifier.
+	"""
+	def close(self):
+		if (self.thread.is_alive()):
+			self.queue.put(None)
+			self.thread.join(timeout=30)
+
+	"""
+		Send a message, retrying with an increasing delay.
+		returns:	True if the message has been sent.
+	"""
+	def deliver(self, text):
+		delay = 1
+		for _ in range(config.NOTIFICATION_RETRIES):
+			try:
+				self.bot.sendMessage(chat_id=self.chat_id, text=text)
+				return True
+			except Exception:
+				time.sleep(delay)
+				delay *= 2
+		return False
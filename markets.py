@@ -0,0 +1,188 @@
+import json
+import math
+import os
+import time
+import config
+
+"""
+	Market metadata registry.
+	Markets are loaded once per exchange and cached on disk for
+	MARKETS_REFRESH_INTERVAL seconds, so a restart does not need to load them
+	again. For every symbol we keep the tick size, the step size, the minimum
+	amount, the minimum notional and the fee tier, to round orders before
+	sending them and to skip the ones the exchange would refuse. With
+	significant digits precision (bitfinex) the step depends on the value, so
+	we keep the number of digits instead.
+	For example:
+	registry = MarketRegistry()
+	registry.load(crypto.binance)
+	registry.round_amount(crypto.binance, 'LTC/ETH', 1.23456789)
+"""
+class MarketRegistry:
+
+	# ccxt precision modes
+	DECIMAL_PLACES = 2
+	SIGNIFICANT_DIGITS = 3
+	TICK_SIZE = 4
+
+	def __init__(self, directory=None):
+		self.directory = directory or config.MARKETS_CACHE_DIRECTORY
+		self.markets = {}
+		self.loaded = {}
+
+	"""
+		Get the path of the disk cache of an exchange.
+	"""
+	def path(self, exchange):
+		return os.path.join(self.directory, 'markets_{}.json'.format(exchange.id))
+
+	"""
+		Load the markets of an exchange, from the disk cache if it is recent
+		enough, from the exchange otherwise. The markets are given to the ccxt
+		exchange so it does not load them again.
+		exchange:	the wanted exchange.
+		returns:	the metadata of every symbol.
+	"""
+	def load(self, exchange):
+		path = self.path(exchange)
+		markets = None
+		if (os.path.isfile(path) and time.time() - os.path.getmtime(path) < config.MARKETS_REFRESH_INTERVAL):
+			with open(path, 'r') as file:
+				markets = json.load(file)
+			exchange.set_markets(markets)
+		else:
+			markets = exchange.load_markets(True)
+			with open(path, 'w') as file:
+				json.dump(markets, file)
+		mode = getattr(exchange, 'precisionMode', MarketRegistry.DECIMAL_PLACES)
+		self.markets[exchange.id] = {symbol: MarketRegistry.metadata(market, mode) for symbol, market in markets.items()}
+		self.loaded[exchange.id] = time.time()
+		return self.markets[exchange.id]
+
+	"""
+		Extract what we need from a ccxt market.
+		market:		the ccxt market.
+		mode:		the ccxt precision mode of the exchange.
+	"""
+	@staticmethod
+	def metadata(market, mode):
+		precision = market.get('precision') or {}
+		limits = market.get('limits') or {}
+		digits = mode == MarketRegistry.SIGNIFICANT_DIGITS
+		return {
+			'active': market.get('active', True) is not False,
+			'tick_size': None if digits else MarketRegistry.step(precision.get('price'), mode),
+			'step_size': None if digits else MarketRegistry.step(precision.get('amount'), mode),
+			'price_digits': MarketRegistry.digits(precision.get('price')) if digits else None,
+			'amount_digits': MarketRegistry.digits(precision.get('amount')) if digits else None,
+			'min_amount': (limits.get('amount') or {}).get('min') or 0,
+			'min_notional': (limits.get('cost') or {}).get('min') or 0,
+			'maker': market.get('maker'),
+			'taker': market.get('taker'),
+		}
+
+	"""
+		Convert a ccxt precision to a step.
+	"""
+	@staticmethod
+	def step(precision, mode):
+		if (precision is None):
+			return None
+		if (mode == MarketRegistry.TICK_SIZE):
+			return float(precision)
+		return 10 ** -int(precision)
+
+	"""
+		Convert a ccxt precision to a number of significant digits.
+	"""
+	@staticmethod
+	def digits(precision):
+		return None if precision is None else int(precision)
+
+	"""
+		Get the step of a value of a symbol.
+		key:		price or amount.
+		value:		the value to round, the step of significant digits depends on it.
+		returns:	the step, None if the value is not rounded.
+	"""
+	@staticmethod
+	def step_of(market, key, value):
+		digits = market.get('{}_digits'.format(key))
+		if (digits is None):
+			return market['tick_size' if key == 'price' else 'step_size']
+		if (value <= 0):
+			return None
+		return 10 ** (math.floor(math.log10(value)) - digits + 1)
+
+	"""
+		Get the metadata of every symbol, loading the markets if needed or too old.
+		returns:	a dict keyed by symbol.
+	"""
+	def all(self, exchange):
+		if (exchange.id not in self.markets or time.time() - self.loaded[exchange.id] > config.MARKETS_REFRESH_INTERVAL):
+			self.load(exchange)
+		return self.markets[exchange.id]
+
+	"""
+		Get the metadata of a symbol.
+		returns:	a dict, None if the symbol does not exist.
+	"""
+	def get(self, exchange, symbol):
+		return self.all(exchange).get(symbol)
+
+	"""
+		Round an amount down to the step size of the symbol.
+	"""
+	def round_amount(self, exchange, symbol, amount):
+		market = self.get(exchange, symbol)
+		step = MarketRegistry.step_of(market, 'amount', amount) if market else None
+		if (not step):
+			return amount
+		return round(math.floor(amount / step + 1e-9) * step, 12)
+
+	"""
+		Round a price to the tick size of the symbol, down for a buy and up for
+		a sell so the order is never worse than asked.
+	"""
+	def round_price(self, exchange, symbol, price, side):
+		market = self.get(exchange, symbol)
+		tick = MarketRegistry.step_of(market, 'price', price) if market else None
+		if (not tick):
+			return price
+		if (side == 'buy'):
+			return round(math.floor(price / tick + 1e-9) * tick, 12)
+		return round(math.ceil(price / tick - 1e-9) * tick, 12)
+
+	"""
+		Check if the exchange would accept an order.
+		price:		the limit price, None for a market order.
+		returns:	None if the order is fine, the reason otherwise.
+	"""
+	def check(self, exchange, symbol, amount, price):
+		market = self.get(exchange, symbol)
+		if (not market):
+			return "{} does not exist".format(symbol)
+		if (not market['active']):
+			return "{} is not active".format(symbol)
+		if (amount <= 0):
+			return "amount {} rounds to 0".format(amount)
+		if (price is not None and price <= 0):
+			return "price {} rounds to 0".format(price)
+		if (amount < market['min_amount']):
+			return "amount {} under minimum {}".format(amount, market['min_amount'])
+		if (price and amount * price < market['min_notional']):
+			return "notional {} under minimum {}".format(amount * price, market['min_notional'])
+		return None
+
+	"""
+		Keep the alts whose ALT/ETH and ALT/BTC markets exist and are active.
+		exchange:	the wanted exchange.
+		alts:		the alts to filter.
+	"""
+	def tradable(self, exchange, alts):
+		result = []
+		for alt in alts:
+			markets = [self.get(exchange, '{}/{}'.format(alt, quote)) for quote in ('ETH', 'BTC')]
+			if (all(market and market['active'] for market in markets)):
+				result.append(alt)
+		return result
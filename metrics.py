@@ -0,0 +1,301 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+
+"""
+	Latency histogram with HDR-style buckets: every power of two of
+	microseconds is split in SUB_BUCKETS linear buckets, so the relative error
+	of a value is below 1 / SUB_BUCKETS whatever its magnitude, and recording
+	is a few integer operations.
+	For example:
+	histogram = Histogram()
+	histogram.record(0.0123)
+	histogram.percentile(99)
+"""
+class Histogram:
+
+	SUB_BUCKETS = 16
+	SHIFT = 4
+
+	def __init__(self):
+		self.counts = []
+		self.count = 0
+		self.sum = 0.0
+		self.max = 0.0
+
+	"""
+		Get the bucket of a value in microseconds.
+	"""
+	@staticmethod
+	def index(micros):
+		if (micros < Histogram.SUB_BUCKETS):
+			return micros
+		magnitude = micros.bit_length() - Histogram.SHIFT - 1
+		return Histogram.SUB_BUCKETS * (magnitude + 1) + (micros >> magnitude) - Histogram.SUB_BUCKETS
+
+	"""
+		Get the highest value in seconds of a bucket.
+	"""
+	@staticmethod
+	def upper(index):
+		if (index < Histogram.SUB_BUCKETS):
+			return (index + 1) / 1e6
+		magnitude = index // Histogram.SUB_BUCKETS - 1
+		mantissa = Histogram.SUB_BUCKETS + index % Histogram.SUB_BUCKETS
+		return ((mantissa + 1) << magnitude) / 1e6
+
+	"""
+		Record a latency.
+		seconds:	the latency in seconds.
+	"""
+	def record(self, seconds):
+		index = Histogram.index(max(int(seconds * 1e6), 0))
+		if (index >= len(self.counts)):
+			self.counts.extend([0] * (index + 1 - len(self.counts)))
+		self.counts[index] += 1
+		self.count += 1
+		self.sum += seconds
+		if (seconds > self.max):
+			self.max = seconds
+
+	"""
+		Add the records of another histogram to this one.
+	"""
+	def merge(self, other):
+		if (len(other.counts) > len(self.counts)):
+			self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+		for index, count in enumerate(other.counts):
+			self.counts[index] += count
+		self.count += other.count
+		self.sum += other.sum
+		self.max = max(self.max, other.max)
+
+	"""
+		Get a percentile of the recorded latencies.
+		percent:	the wanted percentile, for example 99.
+		returns:	the latency in seconds, 0 if nothing has been recorded.
+	"""
+	def percentile(self, percent):
+		if (self.count == 0):
+			return 0.0
+		rank = self.count * percent / 100
+		seen = 0
+		for index, count in enumerate(self.counts):
+			seen += count
+			if (seen >= rank and count):
+				return min(Histogram.upper(index), self.max)
+		return self.max
+
+	"""
+		Get the cumulative counts of the latencies below some bounds, for the
+		buckets of a Prometheus histogram.
+		bounds:		the sorted upper bounds in seconds.
+		returns:	the list of counts, one per bound.
+	"""
+	def cumulative(self, bounds):
+		counts = [0] * len(bounds)
+		for index, count in enumerate(self.counts):
+			if (count):
+				upper = Histogram.upper(index)
+				for i, bound in enumerate(bounds):
+					if (upper <= bound):
+						counts[i] += count
+		return counts
+
+"""
+	Time a block of code into a histogram of the registry. Failures are
+	counted as errors of the stage.
+"""
+class Timer:
+
+	def __init__(self, metrics, stage, exchange, symbol):
+		self.metrics = metrics
+		self.key = (stage, exchange, symbol)
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, error, *args):
+		self.metrics.observe(self.key, time.perf_counter() - self.start)
+		if (error is not None):
+			self.metrics.count('errors', *self.key)
+		return False
+
+"""
+	Latency histograms and counters of the hot paths, per stage, exchange and
+	symbol. They are exported in the Prometheus text format on
+	METRICS_PORT and summarized in the logs every METRICS_SUMMARY_INTERVAL
+	seconds.
+	For example:
+	metrics = Metrics()
+	with metrics.timer('fetch_order_book', crypto.binance, 'LTC/ETH'):
+		crypto.binance.fetchOrderBook('LTC/ETH')
+	print(metrics.summary())
+"""
+class Metrics:
+
+	# Upper bounds in seconds of the exported buckets
+	BOUNDS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.histograms = {}
+		self.counters = {}
+		self.server = None
+		self.stopped = threading.Event()
+		self.reporter = None
+
+	"""
+		Get the label of an exchange.
+	"""
+	@staticmethod
+	def label(exchange):
+		if (exchange is None or isinstance(exchange, str)):
+			return exchange or ''
+		return getattr(exchange, 'id', str(exchange))
+
+	"""
+		Time a block of code.
+		stage:		the name of the stage, for example fetch_order_book.
+		exchange:	the exchange, its id or None.
+		symbol:		the symbol or None.
+	"""
+	def timer(self, stage, exchange=None, symbol=None):
+		return Timer(self, stage, Metrics.label(exchange), symbol or '')
+
+	"""
+		Record a latency.
+		key:		the (stage, exchange id, symbol) of the latency.
+		seconds:	the latency in seconds.
+	"""
+	def observe(self, key, seconds):
+		with self.lock:
+			histogram = self.histograms.get(key)
+			if (histogram is None):
+				histogram = self.histograms[key] = Histogram()
+			histogram.record(seconds)
+
+	"""
+		Increment a counter.
+		name:	the name of the counter, for example cache_hits.
+		stage:	the stage it belongs to.
+	"""
+	def count(self, name, stage, exchange=None, symbol=None, n=1):
+		key = (name, stage, Metrics.label(exchange), symbol or '')
+		with self.lock:
+			self.counters[key] = self.counters.get(key, 0) + n
+
+	"""
+		Get the histograms of every stage and exchange, merged over the symbols.
+	"""
+	def by_stage(self):
+		merged = {}
+		with self.lock:
+			for (stage, exchange, _), histogram in self.histograms.items():
+				merged.setdefault((stage, exchange), Histogram()).merge(histogram)
+		return merged
+
+	"""
+		Get a summary of the latencies of every stage and exchange.
+		returns:	a string of one line per stage and exchange.
+	"""
+	def summary(self):
+		errors = {}
+		with self.lock:
+			for (name, stage, exchange, _), value in self.counters.items():
+				if (name == 'errors'):
+					errors[(stage, exchange)] = errors.get((stage, exchange), 0) + value
+		lines = ["{:18} {:10} {:>8} {:>6} {:>9} {:>9} {:>9} {:>9}".format("stage", "exchange", "count", "errors", "p50 ms", "p90 ms", "p99 ms", "max ms")]
+		for (stage, exchange), histogram in sorted(self.by_stage().items()):
+			lines.append("{:18} {:10} {:8d} {:6d} {:9.2f} {:9.2f} {:9.2f} {:9.2f}".format(
+				stage,
+				exchange or '-',
+				histogram.count,
+				errors.get((stage, exchange), 0),
+				histogram.percentile(50) * 1000,
+				histogram.percentile(90) * 1000,
+				histogram.percentile(99) * 1000,
+				histogram.max * 1000
+			))
+		return "\n".join(lines)
+
+	"""
+		Get the labels of a metric.
+		extra:	more labels, starting with a comma.
+	"""
+	@staticmethod
+	def labels(stage, exchange, symbol, extra=''):
+		return 'stage="{}",exchange="{}",symbol="{}"{}'.format(stage, exchange, symbol, extra)
+
+	"""
+		Get the metrics in the Prometheus text format.
+	"""
+	def export(self):
+		with self.lock:
+			histograms = {key: (histogram.cumulative(Metrics.BOUNDS), histogram.count, histogram.sum) for key, histogram in self.histograms.items()}
+			counters = dict(self.counters)
+		lines = [
+			"# HELP triarb_stage_seconds Latency of the stages of the bot.",
+			"# TYPE triarb_stage_seconds histogram",
+		]
+		for (stage, exchange, symbol), (buckets, count, total) in sorted(histograms.items()):
+			for bound, value in zip(Metrics.BOUNDS, buckets):
+				lines.append('triarb_stage_seconds_bucket{{{}}} {}'.format(Metrics.labels(stage, exchange, symbol, ',le="{}"'.format(bound)), value))
+			lines.append('triarb_stage_seconds_bucket{{{}}} {}'.format(Metrics.labels(stage, exchange, symbol, ',le="+Inf"'), count))
+			lines.append('triarb_stage_seconds_sum{{{}}} {}'.format(Metrics.labels(stage, exchange, symbol), total))
+			lines.append('triarb_stage_seconds_count{{{}}} {}'.format(Metrics.labels(stage, exchange, symbol), count))
+		names = sorted(set(key[0] for key in counters))
+		for name in names:
+			lines.append("# TYPE triarb_{}_total counter".format(name))
+			for (counter, stage, exchange, symbol), value in sorted(counters.items()):
+				if (counter == name):
+					lines.append('triarb_{}_total{{{}}} {}'.format(name, Metrics.labels(stage, exchange, symbol), value))
+		return "\n".join(lines) + "\n"
+
+	"""
+		Serve the metrics in the Prometheus text format on /metrics.
+		port:	the local port to listen on.
+	"""
+	def serve(self, port):
+		metrics = self
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				if (self.path.split('?')[0] not in ('/', '/metrics')):
+					self.send_error(404)
+					return
+				body = metrics.export().encode()
+				self.send_response(200)
+				self.send_header('Content-Type', 'text/plain; version=0.0.4')
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, *args):
+				pass
+		self.server = ThreadingHTTPServer((config.METRICS_HOST, port), Handler)
+		self.server.daemon_threads = True
+		threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True).start()
+
+	"""
+		Log the summary periodically.
+		log:		the log function.
+		interval:	the seconds between two summaries.
+	"""
+	def report(self, log, interval):
+		def loop():
+			while (not self.stopped.wait(interval)):
+				log("Latencies:\n{}".format(self.summary()))
+		self.reporter = threading.Thread(target=loop, name="metrics-reporter", daemon=True)
+		self.reporter.start()
+
+	"""
+		Stop the server and the periodic summary.
+	"""
+	def close(self):
+		self.stopped.set()
+		if (self.server):
+			self.server.shutdown()
+			self.server.server_close()
+			self.server = None
@@ -0,0 +1,255 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+import websocket
+import config
+
+"""
+	Order tracking.
+	Orders are tracked by id. On Binance, the user data stream pushes an
+	execution report for every order change, so a fill is known the moment it
+	happens. The trades of an order tell how much of it rested in the book
+	and paid the maker fee.
+	Only the orders we track are kept. The last ORDER_EARLY_REPORTS reports
+	of untracked orders are kept aside, since the report of a fill can come
+	before the response of the order, the other ones are ignored. A resolved
+	order nobody forgot is dropped after ORDER_STATE_TTL seconds. Orders are also polled with fetchOrder, often at first then less
+	and less, which is the only source on the other exchanges and a fallback
+	when the stream is down.
+	For example:
+	order = exchange.createLimitBuyOrder('LTC/ETH', 1, 0.3)
+	state = crypto.orders.wait(exchange, order['id'], 'LTC/ETH', 1)
+	if (state['status'] == OrderTracker.FILLED): ...
+"""
+class OrderTracker:
+
+	OPEN = 'open'
+	FILLED = 'filled'
+	CANCELED = 'canceled'
+
+	# Binance order status to tracker status
+	STATUSES = {
+		'NEW': 'open',
+		'PARTIALLY_FILLED': 'open',
+		'FILLED': 'filled',
+		'CANCELED': 'canceled',
+		'REJECTED': 'canceled',
+		'EXPIRED': 'canceled',
+		'open': 'open',
+		'closed': 'filled',
+		'canceled': 'canceled',
+		'expired': 'canceled',
+		'rejected': 'canceled',
+	}
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.states = {}
+		self.early = OrderedDict()
+		self.conditions = {}
+		self.streams = {}
+
+	"""
+		Listen to the user data stream of the exchange, if it has one.
+		exchange:	the wanted exchange.
+		returns:	True if a stream has been started.
+	"""
+	def listen(self, exchange):
+		if (exchange.id != 'binance' or exchange.id in self.streams):
+			return False
+		stream = UserStream(exchange, self.on_report)
+		self.streams[exchange.id] = stream
+		stream.start()
+		return True
+
+	"""
+		Stop listening to the user data streams.
+	"""
+	def stop(self):
+		for stream in self.streams.values():
+			stream.stop()
+		self.streams = {}
+
+	"""
+		Start tracking an order, wait does it for the orders it waits for.
+		Drops the resolved orders older than ORDER_STATE_TTL.
+		order_id:	the id of the order.
+	"""
+	def track(self, order_id):
+		now = time.time()
+		with self.lock:
+			for key in [key for key, state in self.states.items() if state['status'] != OrderTracker.OPEN and now - state['updated'] > config.ORDER_STATE_TTL]:
+				del self.states[key]
+			if (order_id in self.states):
+				return
+			state = self.states[order_id] = {'status': OrderTracker.OPEN, 'filled': 0, 'maker': 0, 'trades': {}, 'updated': now}
+			for status, filled, trades in self.early.pop(order_id, []):
+				OrderTracker.apply(state, status, filled, trades)
+
+	"""
+		Apply a report to the state of an order. Called with the lock held.
+	"""
+	@staticmethod
+	def apply(state, status, filled, trades):
+		state['status'] = status
+		state['filled'] = max(state['filled'], filled)
+		for trade_id, amount, maker in trades:
+			state['trades'][trade_id] = amount if maker else 0
+		state['maker'] = sum(state['trades'].values())
+		state['updated'] = time.time()
+
+	"""
+		Record the new state of a tracked order and wake up whoever waits for it.
+		order_id:	the id of the order.
+		status:		OPEN, FILLED or CANCELED.
+		filled:		the amount filled so far.
+		trades:		the known trades of the order, as (trade id, amount, maker).
+	"""
+	def update(self, order_id, status, filled, trades=()):
+		with self.lock:
+			state = self.states.get(order_id)
+			if (state is None):
+				self.early.setdefault(order_id, []).append((status, filled, trades))
+				self.early.move_to_end(order_id)
+				while (len(self.early) > config.ORDER_EARLY_REPORTS):
+					self.early.popitem(last=False)
+				return
+			OrderTracker.apply(state, status, filled, trades)
+			condition = self.conditions.get(order_id)
+		if (condition):
+			with condition:
+				condition.notify_all()
+
+	def on_report(self, report):
+		if (report.get('e') != 'executionReport'):
+			return
+		status = OrderTracker.STATUSES.get(report['X'], OrderTracker.OPEN)
+		trades = [(str(report['t']), float(report['l']), report.get('m', False))] if report.get('x') == 'TRADE' else ()
+		self.update(str(report['i']), status, float(report['z']), trades)
+
+	"""
+		Get the known state of an order.
+		returns:	a dict with status, filled and maker (the part of filled
+					that rested in the book), None if unknown.
+	"""
+	def get(self, order_id):
+		with self.lock:
+			state = self.states.get(order_id)
+			return {key: state[key] for key in ('status', 'filled', 'maker')} if state else None
+
+	"""
+		Fetch the order state from the exchange.
+	"""
+	def poll(self, exchange, order_id, symbol):
+		try:
+			order = exchange.fetchOrder(order_id, symbol)
+		except Exception:
+			return
+		trades = [(str(trade.get('id')), trade.get('amount') or 0, trade.get('takerOrMaker') == 'maker') for trade in order.get('trades') or []]
+		self.update(order_id, OrderTracker.STATUSES.get(order['status'], OrderTracker.OPEN), order['filled'] or 0, trades)
+
+	"""
+		Wait until an order is filled or canceled, or until the timeout. The
+		order is tracked if it is not already.
+		The order is polled every ORDER_POLL_MIN seconds at first, the interval
+		doubles up to ORDER_POLL_MAX. When a user data stream is listening,
+		polling starts at ORDER_POLL_MAX since the stream is faster.
+		exchange:	the exchange of the order.
+		order_id:	the id of the order.
+		symbol:		the symbol of the order.
+		timeout:	the maximum number of seconds to wait.
+		filled:		if set, also return as soon as more than this amount is filled.
+		returns:	the state of the order, a dict with status, filled and maker.
+	"""
+	def wait(self, exchange, order_id, symbol, timeout, filled=None):
+		deadline = time.time() + timeout
+		stream = self.streams.get(exchange.id)
+		interval = config.ORDER_POLL_MAX if (stream and stream.connected) else config.ORDER_POLL_MIN
+		condition = threading.Condition()
+		self.track(order_id)
+		with self.lock:
+			self.conditions[order_id] = condition
+		try:
+			while True:
+				state = self.get(order_id)
+				if (self.resolved(state, filled)):
+					return state
+				remaining = deadline - time.time()
+				if (remaining <= 0):
+					break
+				with condition:
+					condition.wait(min(interval, remaining))
+				state = self.get(order_id)
+				if (self.resolved(state, filled)):
+					return state
+				self.poll(exchange, order_id, symbol)
+				interval = min(interval * 2, config.ORDER_POLL_MAX)
+			self.poll(exchange, order_id, symbol)
+			return self.get(order_id) or {'status': OrderTracker.OPEN, 'filled': 0, 'maker': 0}
+		finally:
+			with self.lock:
+				self.conditions.pop(order_id, None)
+
+	def resolved(self, state, filled):
+		if (not state):
+			return False
+		return state['status'] != OrderTracker.OPEN or (filled is not None and state['filled'] > filled)
+
+	"""
+		Forget a resolved order.
+	"""
+	def forget(self, order_id):
+		with self.lock:
+			self.states.pop(order_id, None)
+
+"""
+	Binance user data stream, calls on_report with every event.
+"""
+class UserStream:
+
+	def __init__(self, exchange, on_report):
+		self.exchange = exchange
+		self.on_report = on_report
+		self.listen_key = None
+		self.socket = None
+		self.connected = False
+		self.running = False
+
+	def start(self):
+		self.running = True
+		threading.Thread(target=self.listen, name="user-stream", daemon=True).start()
+		threading.Thread(target=self.keep_alive, name="user-stream-keep-alive", daemon=True).start()
+
+	def stop(self):
+		self.running = False
+		if (self.socket):
+			self.socket.close()
+
+	def listen(self):
+		while self.running:
+			try:
+				self.listen_key = self.exchange.publicPostUserDataStream()['listenKey']
+				self.socket = websocket.WebSocketApp(
+					'{}/{}'.format(config.USER_STREAM_URL, self.listen_key),
+					on_open=lambda socket: setattr(self, 'connected', True),
+					on_message=lambda socket, message: self.on_report(json.loads(message))
+				)
+				self.socket.run_forever()
+			except Exception:
+				pass
+			self.connected = False
+			if (self.running):
+				time.sleep(config.STREAM_RECONNECT_DELAY)
+
+	"""
+		A listen key expires after 60 minutes without keep alive.
+	"""
+	def keep_alive(self):
+		while self.running:
+			time.sleep(config.USER_STREAM_KEEP_ALIVE)
+			if (self.listen_key):
+				try:
+					self.exchange.publicPutUserDataStream({'listenKey': self.listen_key})
+				except Exception:
+					pass
@@ -0,0 +1,349 @@
+import random
+import threading
+import time
+import ccxt
+import config
+
+"""
+	Paper trading exchange.
+	Market data comes from the public API of a real exchange (the source),
+	orders go to a local matching engine with price-time priority, so the
+	whole execution path can run under real timing without risking capital.
+	Every private call waits PAPER_LATENCY seconds plus up to
+	PAPER_LATENCY_JITTER, like a round-trip to the exchange.
+	An order pays the taker fee for what it takes from the book when it is
+	placed and the maker fee for what fills it while it rests, every fill is
+	listed in the trades of the order with its takerOrMaker.
+	How resting orders are filled depends on the fill mode:
+	- instant: a limit order is filled at once at its price.
+	- cross: a resting order is filled when the book of the source crosses it.
+	- queue: as cross, and an order also waits behind the size that was at its
+	  price when it was placed. Every time that size decreases, the queue moves
+	  forward, then the decrease fills our order.
+	Orders of the same price are filled in the order they were placed.
+	For example:
+	exchange = PaperExchange(ccxt.binance({'enableRateLimit': True}))
+	exchange.createLimitBuyOrder('LTC/ETH', 1, 0.3)
+	exchange.fetchOpenOrders('LTC/ETH')
+"""
+class PaperExchange:
+
+	def __init__(self, source, balances=None, latency=None, jitter=None, fill_mode=None, seed=None):
+		self.source = source
+		self.id = 'paper'
+		self.latency = config.PAPER_LATENCY if latency is None else latency
+		self.jitter = config.PAPER_LATENCY_JITTER if jitter is None else jitter
+		self.fill_mode = fill_mode or config.PAPER_FILL_MODE
+		self.random = random.Random(seed)
+		self.lock = threading.Lock()
+		self.balances = dict(config.PAPER_BALANCES if balances is None else balances)
+		self.reserved = {}
+		self.orders = {}
+		self.resting = {}
+		self.books = {}
+		self.fetched = {}
+		self.taken = {}
+		self.sequence = 0
+		self.has = dict(getattr(source, 'has', {}), fetchTradingFees=False)
+
+	"""
+		Named after the source, for example Paper(Binance), so a paper run is
+		told apart from a live one in the logs and the config.
+	"""
+	def __str__(self):
+		return "Paper({})".format(str(self.source))
+
+	"""
+		Public methods and attributes come from the source exchange.
+	"""
+	def __getattr__(self, name):
+		return getattr(self.source, name)
+
+	def wait(self):
+		if (self.latency or self.jitter):
+			time.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+	"""
+		Get the fee rate of a symbol from the source markets.
+		liquidity:	maker or taker.
+	"""
+	def fee(self, symbol, liquidity):
+		market = (getattr(self.source, 'markets', None) or {}).get(symbol) or {}
+		rate = market.get('maker' if liquidity == 'maker' else 'taker')
+		return config.PAPER_DEFAULT_FEE if rate is None else rate
+
+	"""
+		Get the book of a symbol, fetched from the source if it is older than
+		PAPER_BOOK_MAX_AGE. A fresh book moves the resting orders.
+	"""
+	def book(self, symbol):
+		if (time.time() - self.fetched.get(symbol, 0) > config.PAPER_BOOK_MAX_AGE):
+			self.feed(symbol, self.source.fetchOrderBook(symbol))
+		return self.books[symbol]
+
+	"""
+		Give a new book of the source to the matching engine.
+		symbol:	the symbol of the book.
+		book:	a ccxt order book.
+	"""
+	def feed(self, symbol, book):
+		with self.lock:
+			previous = self.books.get(symbol)
+			self.books[symbol] = {
+				'bids': [list(level[:2]) for level in book['bids']],
+				'asks': [list(level[:2]) for level in book['asks']],
+			}
+			self.fetched[symbol] = time.time()
+			taken = self.taken.get(symbol, {})
+			for key in list(taken):
+				if (PaperExchange.size_at(self.books[symbol][key[0]], key[1]) < taken[key]):
+					del taken[key]
+			if (previous is not None):
+				self.match(symbol, previous)
+
+	"""
+		Get the size of a book side at a price.
+	"""
+	@staticmethod
+	def size_at(levels, price):
+		for level_price, size in levels:
+			if (level_price == price):
+				return size
+		return 0
+
+	"""
+		Take liquidity of a book side, up to a limit price. The size we took
+		stays taken while the level is still shown by the source, so a book that
+		did not change can not fill us twice. Called with the lock held.
+		key:		asks or bids.
+		price:		the limit price, None for no limit.
+		returns:	the list of (price, size) taken.
+	"""
+	def take(self, symbol, key, amount, price=None):
+		taken = self.taken.setdefault(symbol, {})
+		fills = []
+		for level_price, size in self.books[symbol][key]:
+			if (amount <= 0 or (price and (level_price > price if key == 'asks' else level_price < price))):
+				break
+			size = min(amount, size - taken.get((key, level_price), 0))
+			if (size > 0):
+				taken[(key, level_price)] = taken.get((key, level_price), 0) + size
+				fills.append((level_price, size))
+				amount -= size
+		return fills
+
+	"""
+		Tell if a price is inside the levels of a book side, so a level missing
+		there has been taken or canceled, not only left out of the depth.
+	"""
+	@staticmethod
+	def within(levels, price, side):
+		if (not levels):
+			return False
+		return price >= levels[-1][0] if side == 'buy' else price <= levels[-1][0]
+
+	"""
+		Get the resting orders of a symbol by priority: best price first, then
+		oldest first.
+	"""
+	def by_priority(self, symbol, side):
+		orders = [order for order in self.resting.get(symbol, []) if order['side'] == side]
+		return sorted(orders, key=lambda order: (-order['price'] if side == 'buy' else order['price'], order['sequence']))
+
+	"""
+		Fill the resting orders of a symbol with the new book. Called with the
+		lock held.
+		previous:	the book before the update.
+	"""
+	def match(self, symbol, previous):
+		book = self.books[symbol]
+		for side in ('buy', 'sell'):
+			own = 'bids' if side == 'buy' else 'asks'
+			traded = {}
+			for order in self.by_priority(symbol, side):
+				remaining = order['amount'] - order['filled']
+				if (self.fill_mode == 'queue' and PaperExchange.within(book[own], order['price'], side)):
+					before = PaperExchange.size_at(previous[own], order['price'])
+					after = PaperExchange.size_at(book[own], order['price'])
+					decrease = max(before - after, 0)
+					moved = min(order['queue'], decrease)
+					order['queue'] -= moved
+					filled = min(remaining, max(decrease - moved - traded.get(order['price'], 0), 0))
+					if (order['queue'] <= 0 and filled > 0):
+						traded[order['price']] = traded.get(order['price'], 0) + filled
+						self.fill(order, filled, order['price'], 'maker')
+						remaining -= filled
+				if (remaining > 0 and self.fill_mode != 'instant'):
+					filled = sum(size for _, size in self.take(symbol, 'asks' if side == 'buy' else 'bids', remaining, order['price']))
+					if (filled > 0):
+						self.fill(order, filled, order['price'], 'maker')
+
+	"""
+		Record a fill of an order and update the balances. Called with the lock
+		held.
+		liquidity:	maker if the order was resting, taker if it took the book.
+	"""
+	def fill(self, order, amount, price, liquidity):
+		base, quote = order['symbol'].split('/')
+		rate = self.fee(order['symbol'], liquidity)
+		order['trades'].append({'id': '{}-{}'.format(order['id'], len(order['trades']) + 1), 'price': price, 'amount': amount, 'takerOrMaker': liquidity})
+		order['cost'] += amount * price
+		order['filled'] += amount
+		order['remaining'] = order['amount'] - order['filled']
+		order['average'] = order['cost'] / order['filled']
+		if (order['side'] == 'buy'):
+			self.release(order, amount * (order['price'] or price))
+			self.balances[quote] = self.balances.get(quote, 0) - amount * price
+			self.balances[base] = self.balances.get(base, 0) + amount * (1 - rate)
+			order['fee']['currency'] = base
+			order['fee']['cost'] += amount * rate
+		else:
+			self.release(order, amount)
+			self.balances[base] = self.balances.get(base, 0) - amount
+			self.balances[quote] = self.balances.get(quote, 0) + amount * price * (1 - rate)
+			order['fee']['currency'] = quote
+			order['fee']['cost'] += amount * price * rate
+		if (order['remaining'] <= order['amount'] * 1e-9):
+			self.close(order, 'closed')
+
+	"""
+		Give back funds locked by an order.
+		amount:		the amount to give back, all that is left if None.
+	"""
+	def release(self, order, amount=None):
+		amount = order['locked'] if amount is None else min(amount, order['locked'])
+		order['locked'] -= amount
+		self.reserved[order['asset']] = max(self.reserved.get(order['asset'], 0) - amount, 0)
+
+	"""
+		Take an order off the book. Called with the lock held.
+	"""
+	def close(self, order, status):
+		order['status'] = status
+		resting = self.resting.get(order['symbol'], [])
+		if (order in resting):
+			resting.remove(order)
+		self.release(order)
+
+	"""
+		Place an order: it takes the book up to its limit price, then what is
+		left rests on the book.
+		price:		the limit price, None for a market order.
+	"""
+	def place(self, symbol, side, amount, price=None):
+		self.wait()
+		book = self.book(symbol)
+		base, quote = symbol.split('/')
+		with self.lock:
+			levels = book['asks'] if side == 'buy' else book['bids']
+			if (side == 'buy'):
+				cost = amount * (price or (levels[-1][0] if levels else 0))
+				asset = quote
+			else:
+				cost = amount
+				asset = base
+			if (cost > self.balances.get(asset, 0) - self.reserved.get(asset, 0) + 1e-12):
+				raise ccxt.InsufficientFunds("paper: not enough {} for {} {} {}".format(asset, side, amount, symbol))
+			self.sequence += 1
+			order = {
+				'id': str(self.sequence),
+				'sequence': self.sequence,
+				'timestamp': int(time.time() * 1000),
+				'symbol': symbol,
+				'type': 'limit' if price else 'market',
+				'side': side,
+				'price': price,
+				'amount': amount,
+				'filled': 0,
+				'remaining': amount,
+				'cost': 0,
+				'average': None,
+				'status': 'open',
+				'fee': {'currency': None, 'cost': 0},
+				'trades': [],
+				'queue': 0,
+				'asset': asset,
+				'locked': cost,
+			}
+			self.orders[order['id']] = order
+			self.reserved[asset] = self.reserved.get(asset, 0) + cost
+			if (price and self.fill_mode == 'instant'):
+				crosses = levels and (price >= levels[0][0] if side == 'buy' else price <= levels[0][0])
+				self.fill(order, amount, price, 'taker' if crosses else 'maker')
+				return self.view(order)
+			for level_price, size in self.take(symbol, 'asks' if side == 'buy' else 'bids', amount, price):
+				self.fill(order, size, level_price, 'taker')
+			if (order['status'] == 'open'):
+				if (price):
+					own = book['bids'] if side == 'buy' else book['asks']
+					order['queue'] = PaperExchange.size_at(own, price)
+					self.resting.setdefault(symbol, []).append(order)
+				else:
+					self.close(order, 'canceled')
+			return self.view(order)
+
+	"""
+		Get a copy of an order, as ccxt returns it.
+	"""
+	def view(self, order):
+		view = {key: value for key, value in order.items() if key not in ('sequence', 'queue', 'asset', 'locked')}
+		view['fee'] = dict(order['fee'])
+		view['trades'] = list(order['trades'])
+		return view
+
+	def createLimitBuyOrder(self, symbol, amount, price):
+		return self.place(symbol, 'buy', amount, price)
+
+	def createLimitSellOrder(self, symbol, amount, price):
+		return self.place(symbol, 'sell', amount, price)
+
+	def createMarketBuyOrder(self, symbol, amount):
+		return self.place(symbol, 'buy', amount)
+
+	def createMarketSellOrder(self, symbol, amount):
+		return self.place(symbol, 'sell', amount)
+
+	def fetchOrder(self, order_id, symbol=None):
+		self.wait()
+		order = self.orders.get(order_id)
+		if (not order):
+			raise ccxt.OrderNotFound("paper: unknown order {}".format(order_id))
+		if (order['status'] == 'open'):
+			self.book(order['symbol'])
+		with self.lock:
+			return self.view(order)
+
+	def fetchOpenOrders(self, symbol=None, since=None, limit=None, params={}):
+		self.wait()
+		if (symbol and self.resting.get(symbol)):
+			self.book(symbol)
+		with self.lock:
+			return [self.view(order) for order in self.orders.values() if order['status'] == 'open' and (symbol is None or order['symbol'] == symbol)]
+
+	def cancelOrder(self, order_id, symbol=None, params={}):
+		self.wait()
+		with self.lock:
+			order = self.orders.get(order_id)
+			if (not order):
+				raise ccxt.OrderNotFound("paper: unknown order {}".format(order_id))
+			if (order['status'] == 'open'):
+				self.close(order, 'canceled')
+			return self.view(order)
+
+	def fetchBalance(self, params={}):
+		self.wait()
+		with self.lock:
+			assets = set(self.balances) | set(self.reserved)
+			total = {asset: self.balances.get(asset, 0) for asset in assets}
+			used = {asset: self.reserved.get(asset, 0) for asset in assets}
+			free = {asset: total[asset] - used[asset] for asset in assets}
+		return {'free': free, 'used': used, 'total': total}
+
+	"""
+		Books fetched by the bot also move the resting orders.
+	"""
+	def fetchOrderBook(self, symbol, limit=None, params={}):
+		self.wait()
+		book = self.source.fetchOrderBook(symbol, limit)
+		self.feed(symbol, book)
+		return book
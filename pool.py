@@ -0,0 +1,94 @@
+import queue
+import threading
+import time
+import traceback
+
+"""
+	Long-lived worker pool.
+	Workers are started once and take items from a shared queue, so a free
+	worker picks up the next item right away. Each worker records how long it
+	has been busy and idle. An item that raises is counted and logged with its
+	traceback.
+	For example:
+	pool = WorkerPool(4, lambda alt: process_asset(crypto, exchange, alt), log=crypto.log)
+	pool.submit('LTC')
+	pool.join()
+	print(pool.summary())
+"""
+class WorkerPool:
+
+	def __init__(self, size, target, name="worker", log=None):
+		self.target = target
+		self.log = log or (lambda text: None)
+		self.queue = queue.Queue()
+		self.lock = threading.Lock()
+		self.started = time.time()
+		self.stats = [{'tasks': 0, 'busy': 0.0, 'errors': 0} for _ in range(size)]
+		self.threads = []
+		for i in range(size):
+			thread = threading.Thread(target=self.work, args=(i,), name="{}-{}".format(name, i), daemon=True)
+			thread.start()
+			self.threads.append(thread)
+
+	def work(self, i):
+		while True:
+			item = self.queue.get()
+			if (item is None):
+				self.queue.task_done()
+				return
+			start = time.time()
+			try:
+				self.target(item)
+			except Exception:
+				with self.lock:
+					self.stats[i]['errors'] += 1
+				self.log("Error while processing {} on {}:\n{}".format(item, threading.current_thread().name, traceback.format_exc().rstrip()))
+			finally:
+				with self.lock:
+					self.stats[i]['tasks'] += 1
+					self.stats[i]['busy'] += time.time() - start
+				self.queue.task_done()
+
+	"""
+		Queue an item for the next free worker.
+	"""
+	def submit(self, item):
+		self.queue.put(item)
+
+	"""
+		Wait until every queued item has been processed.
+	"""
+	def join(self):
+		self.queue.join()
+
+	"""
+		Stop the workers once the queued items are processed.
+	"""
+	def stop(self):
+		for _ in self.threads:
+			self.queue.put(None)
+		for thread in self.threads:
+			thread.join()
+
+	"""
+		Get the metrics of every worker.
+		returns:	a list of dicts with tasks, errors, busy seconds and
+					utilization (busy time / time since the pool started).
+	"""
+	def utilization(self):
+		elapsed = max(time.time() - self.started, 1e-9)
+		with self.lock:
+			return [dict(stats, utilization=stats['busy'] / elapsed) for stats in self.stats]
+
+	"""
+		Get a one line summary of the pool metrics.
+	"""
+	def summary(self):
+		workers = self.utilization()
+		return "{} workers, {} tasks, {} errors, {} queued, utilization {}".format(
+			len(workers),
+			sum(worker['tasks'] for worker in workers),
+			sum(worker['errors'] for worker in workers),
+			self.queue.qsize(),
+			" ".join("{:.0%}".format(worker['utilization']) for worker in workers)
+		)
@@ -0,0 +1,262 @@
+import asyncio
+import atexit
+import fcntl
+import os
+import tempfile
+import threading
+import time
+import ccxt
+import config
+
+"""
+	State of a token bucket: the tokens left, the time they were counted, the
+	time we are blocked until and the refill factor. The state of an exchange
+	is shared by every limiter of the process.
+"""
+class LocalState:
+
+	def __init__(self, capacity):
+		self.lock = threading.Lock()
+		self.values = [capacity, time.time(), 0.0, 1.0]
+
+	def __enter__(self):
+		self.lock.acquire()
+		return self.values
+
+	def __exit__(self, *args):
+		self.lock.release()
+
+"""
+	Same state in shared memory, so the processes of run.sh share the budget
+	of an exchange. A file lock protects it between processes.
+"""
+class SharedState:
+
+	SIZE = 4 * 8
+
+	def __init__(self, name, capacity):
+		from multiprocessing import shared_memory
+		self.lock = threading.Lock()
+		self.file = open(os.path.join(tempfile.gettempdir(), '{}.lock'.format(name)), 'a')
+		fcntl.flock(self.file, fcntl.LOCK_EX)
+		try:
+			try:
+				self.memory = shared_memory.SharedMemory(name=name, create=True, size=SharedState.SIZE)
+				self.values = self.memory.buf.cast('d')
+				self.values[0] = capacity
+				self.values[1] = time.time()
+				self.values[2] = 0.0
+				self.values[3] = 1.0
+			except FileExistsError:
+				self.memory = shared_memory.SharedMemory(name=name)
+				self.values = self.memory.buf.cast('d')
+		finally:
+			fcntl.flock(self.file, fcntl.LOCK_UN)
+		atexit.register(self.close)
+
+	def close(self):
+		self.values.release()
+		self.memory.close()
+
+	def __enter__(self):
+		self.lock.acquire()
+		fcntl.flock(self.file, fcntl.LOCK_EX)
+		return self.values
+
+	def __exit__(self, *args):
+		fcntl.flock(self.file, fcntl.LOCK_UN)
+		self.lock.release()
+
+"""
+	Adaptive token bucket rate limiter.
+	Every request takes the weight of its endpoint from a bucket that refills
+	at the budget of the exchange (RATE_LIMITS). The bucket follows the weight
+	the exchange says we used in its headers, so requests made by other clients
+	are counted too. On a 429 or 418 we stop until the Retry-After delay is
+	over and halve the refill rate, which then grows back slowly on success.
+	The limiter replaces the ccxt one: it is installed on the fetch2 method of
+	the client, synchronous or asynchronous.
+	For example:
+	RateLimiter(crypto.binance, crypto.log).install()
+"""
+class RateLimiter:
+
+	states = {}
+	states_lock = threading.Lock()
+
+	# Weights of the Binance endpoints, the others weigh 1
+	BINANCE_WEIGHTS = {
+		'ticker/bookTicker': (2, 4),
+		'ticker/price': (2, 4),
+		'ticker/24hr': (2, 80),
+		'openOrders': (6, 80),
+		'exchangeInfo': 20,
+		'account': 20,
+		'myTrades': 20,
+		'allOrders': 20,
+		'userDataStream': 2,
+	}
+	# Headers giving the weight used in the current window
+	WEIGHT_HEADERS = ('x-mbx-used-weight-1m', 'x-mbx-used-weight')
+
+	def __init__(self, exchange, log=None):
+		self.exchange = exchange
+		self.log = log or (lambda text: None)
+		self.capacity, self.period = config.RATE_LIMITS.get(exchange.id, (60, 60))
+		self.capacity *= config.RATE_LIMIT_MARGIN
+		self.state = RateLimiter.get_state(exchange.id, self.capacity)
+
+	"""
+		Get the state of an exchange, created on first use.
+	"""
+	@staticmethod
+	def get_state(exchange_id, capacity):
+		with RateLimiter.states_lock:
+			if (exchange_id not in RateLimiter.states):
+				if (config.RATE_LIMIT_SHARED):
+					RateLimiter.states[exchange_id] = SharedState('triarb_{}'.format(exchange_id), capacity)
+				else:
+					RateLimiter.states[exchange_id] = LocalState(capacity)
+			return RateLimiter.states[exchange_id]
+
+	"""
+		Get the weight of a request.
+		path:		the ccxt path of the endpoint, for example depth.
+		method:		the HTTP method.
+		params:		the request parameters.
+	"""
+	def weight(self, path, method='GET', params=None):
+		params = params or {}
+		if (self.exchange.id != 'binance'):
+			return 1
+		if (path == 'depth'):
+			limit = int(params.get('limit', 100))
+			if (limit <= 100):
+				return 5
+			if (limit <= 500):
+				return 25
+			if (limit <= 1000):
+				return 50
+			return 250
+		if (path == 'order'):
+			return 4 if method == 'GET' else 1
+		weight = RateLimiter.BINANCE_WEIGHTS.get(path, 1)
+		if (isinstance(weight, tuple)):
+			return weight[0] if ('symbol' in params) else weight[1]
+		return weight
+
+	"""
+		Take tokens from the bucket if there are enough.
+		weight:		the weight of the request.
+		returns:	0 if the tokens have been taken, the seconds to wait otherwise.
+	"""
+	def reserve(self, weight):
+		weight = min(weight, self.capacity)
+		with self.state as values:
+			now = time.time()
+			rate = self.capacity / self.period * values[3]
+			tokens = min(self.capacity, values[0] + (now - values[1]) * rate)
+			values[1] = now
+			if (now >= values[2] and tokens >= weight):
+				values[0] = tokens - weight
+				return 0
+			values[0] = tokens
+			return max(values[2] - now, (weight - tokens) / rate, 0.001)
+
+	"""
+		Wait until a request of given weight can be sent.
+	"""
+	def acquire(self, weight=1):
+		wait = self.reserve(weight)
+		while (wait > 0):
+			time.sleep(wait)
+			wait = self.reserve(weight)
+
+	async def acquire_async(self, weight=1):
+		wait = self.reserve(weight)
+		while (wait > 0):
+			await asyncio.sleep(wait)
+			wait = self.reserve(weight)
+
+	"""
+		Get a header whatever its case.
+	"""
+	@staticmethod
+	def header(headers, name):
+		for key, value in (headers or {}).items():
+			if (key.lower() == name):
+				return value
+		return None
+
+	"""
+		Align the bucket on the weight the exchange says we used, and let the
+		refill rate grow back after a ban.
+		headers:	the headers of the last response.
+	"""
+	def observe(self, headers):
+		used = None
+		for name in RateLimiter.WEIGHT_HEADERS:
+			used = RateLimiter.header(headers, name)
+			if (used is not None):
+				break
+		with self.state as values:
+			values[3] = min(1.0, values[3] + config.RATE_LIMIT_RECOVERY)
+			if (used is not None):
+				values[0] = self.capacity - float(used)
+				values[1] = time.time()
+
+	"""
+		Stop sending requests after a 429 or a 418, until the Retry-After
+		delay is over, and halve the refill rate.
+		headers:	the headers of the refused response.
+	"""
+	def penalize(self, headers):
+		retry = RateLimiter.header(headers, 'retry-after')
+		delay = float(retry) if retry is not None else config.RATE_LIMIT_BACKOFF
+		with self.state as values:
+			values[2] = max(values[2], time.time() + delay)
+			values[3] = max(values[3] / 2, 0.05)
+			values[0] = 0
+		self.log("Rate limited on {}, waiting {}s".format(self.exchange, delay))
+
+	"""
+		Get the path, method and params of a fetch2 call.
+	"""
+	@staticmethod
+	def request(args, kwargs):
+		path = args[0] if len(args) > 0 else kwargs.get('path')
+		method = args[2] if len(args) > 2 else kwargs.get('method', 'GET')
+		params = args[3] if len(args) > 3 else kwargs.get('params', {})
+		return path, method, params
+
+	"""
+		Replace the ccxt rate limiter of the client by this one.
+		returns:	the limiter.
+	"""
+	def install(self):
+		fetch2 = self.exchange.fetch2
+		self.exchange.enableRateLimit = False
+		if (asyncio.iscoroutinefunction(fetch2)):
+			async def limited(*args, **kwargs):
+				path, method, params = RateLimiter.request(args, kwargs)
+				await self.acquire_async(self.weight(path, method, params))
+				try:
+					result = await fetch2(*args, **kwargs)
+				except ccxt.DDoSProtection:
+					self.penalize(self.exchange.last_response_headers)
+					raise
+				self.observe(self.exchange.last_response_headers)
+				return result
+		else:
+			def limited(*args, **kwargs):
+				path, method, params = RateLimiter.request(args, kwargs)
+				self.acquire(self.weight(path, method, params))
+				try:
+					result = fetch2(*args, **kwargs)
+				except ccxt.DDoSProtection:
+					self.penalize(self.exchange.last_response_headers)
+					raise
+				self.observe(self.exchange.last_response_headers)
+				return result
+		self.exchange.fetch2 = limited
+		return self
@@ -0,0 +1,257 @@
+import json
+import os
+import queue
+import threading
+import time
+import numpy as np
+import config
+
+# One fixed size record, 32 bytes
+RECORD = np.dtype([
+	('timestamp', '<f8'),
+	('symbol', '<u4'),
+	('side', 'u1'),
+	('kind', 'u1'),
+	('padding', '<u2'),
+	('price', '<f8'),
+	('size', '<f8'),
+])
+BID = 0
+ASK = 1
+# A level of a complete book, the previous levels of the symbol are replaced
+SNAPSHOT = 0
+# A level that changed, a size of 0 removes it
+UPDATE = 1
+# The top of book of a ticker
+TICKER = 2
+# Records of the symbol were dropped here, its book is unknown until the next snapshot
+GAP = 3
+
+"""
+	Order book recorder.
+	Every book and ticker the bot sees is appended to a binary file of fixed
+	size records (timestamp, symbol id, side, kind, price, size), one file per
+	exchange and per UTC day. The symbol ids of a day are kept in a small JSON
+	index next to it. Records are queued and written by a background thread so
+	recording does not slow down the scan. When the queue is full, the records
+	are dropped, counted and logged, and a GAP record is written before the
+	next record of the symbol, so a replay does not rebuild its book from
+	incomplete updates.
+	For example:
+	recorder = BookRecorder('books', log=crypto.log, metrics=crypto.metrics)
+	recorder.record_book(crypto.binance, 'LTC/ETH', book)
+"""
+class BookRecorder:
+
+	def __init__(self, directory=None, size=None, log=None, metrics=None):
+		self.directory = directory or config.RECORDER_DIRECTORY
+		self.queue = queue.Queue(maxsize=size or config.RECORDER_QUEUE_SIZE)
+		self.log = log or (lambda text: None)
+		self.metrics = metrics
+		self.lock = threading.Lock()
+		self.dropped = 0
+		self.gaps = set()
+		self.indexes = {}
+		self.thread = threading.Thread(target=self.loop, name="book-recorder", daemon=True)
+		self.thread.start()
+
+	"""
+		Queue records of one symbol.
+		exchange:	the exchange of the records.
+		symbol:		the symbol of the records.
+		side:		an array of BID or ASK.
+		kind:		SNAPSHOT, UPDATE or TICKER.
+		prices:		an array of prices.
+		sizes:		an array of sizes.
+	"""
+	def record(self, exchange, symbol, side, kind, prices, sizes):
+		key = (exchange.id, symbol)
+		try:
+			if (key in self.gaps):
+				self.queue.put_nowait((exchange.id, symbol, time.time(), np.array([BID], 'u1'), GAP, np.zeros(1), np.zeros(1)))
+				with self.lock:
+					self.gaps.discard(key)
+			self.queue.put_nowait((exchange.id, symbol, time.time(), side, kind, prices, sizes))
+		except queue.Full:
+			with self.lock:
+				self.dropped += 1
+				new = key not in self.gaps
+				self.gaps.add(key)
+			if (self.metrics):
+				self.metrics.count('dropped', 'recorder', exchange, symbol)
+			if (new):
+				self.log("Recorder queue full, dropping records of {} on {} ({} dropped so far)".format(symbol, exchange, self.dropped))
+
+	"""
+		Check if records of a symbol have been dropped since its last recorded
+		record, its next record should then be a complete book.
+	"""
+	def lost(self, exchange, symbol):
+		return (exchange.id, symbol) in self.gaps
+
+	"""
+		Record a complete book.
+		book:		a book.Book.
+	"""
+	def record_book(self, exchange, symbol, book):
+		bids = book.bids[:config.RECORDER_DEPTH] if config.RECORDER_DEPTH else book.bids
+		asks = book.asks[:config.RECORDER_DEPTH] if config.RECORDER_DEPTH else book.asks
+		side = np.concatenate((np.full(len(bids), BID, 'u1'), np.full(len(asks), ASK, 'u1')))
+		self.record(exchange, symbol, side, SNAPSHOT, np.concatenate((bids.prices, asks.prices)), np.concatenate((bids.sizes, asks.sizes)))
+
+	"""
+		Record the levels that changed.
+		bids:		a list of [price, size] bid levels.
+		asks:		a list of [price, size] ask levels.
+	"""
+	def record_levels(self, exchange, symbol, bids, asks):
+		levels = np.array([level[:2] for level in bids] + [level[:2] for level in asks], dtype=float).reshape(-1, 2)
+		side = np.concatenate((np.full(len(bids), BID, 'u1'), np.full(len(asks), ASK, 'u1')))
+		self.record(exchange, symbol, side, UPDATE, levels[:, 0], levels[:, 1])
+
+	"""
+		Record the top of book of a ccxt ticker.
+	"""
+	def record_ticker(self, exchange, symbol, ticker):
+		if (ticker.get('bid') is None or ticker.get('ask') is None):
+			return
+		prices = np.array([ticker['bid'], ticker['ask']], dtype=float)
+		sizes = np.array([ticker.get('bidVolume') or 0, ticker.get('askVolume') or 0], dtype=float)
+		self.record(exchange, symbol, np.array([BID, ASK], 'u1'), TICKER, prices, sizes)
+
+	"""
+		Get the path of a day file of an exchange, without extension.
+	"""
+	def path(self, exchange_id, day):
+		return os.path.join(self.directory, exchange_id, day)
+
+	"""
+		Get the id of a symbol in the index of a day, adding it if needed.
+		returns:	the id and True if the index changed.
+	"""
+	def symbol_id(self, exchange_id, day, symbol):
+		key = (exchange_id, day)
+		if (key not in self.indexes):
+			self.indexes[key] = BookReader.load_index(self.path(exchange_id, day))
+		index = self.indexes[key]
+		if (symbol in index):
+			return index[symbol], False
+		index[symbol] = len(index)
+		return index[symbol], True
+
+	def loop(self):
+		files = {}
+		while True:
+			items = [self.queue.get()]
+			while len(items) < config.RECORDER_BATCH_SIZE:
+				try:
+					items.append(self.queue.get_nowait())
+				except queue.Empty:
+					break
+			stop = None in items
+			changed = set()
+			chunks = {}
+			for item in items:
+				if (item is None):
+					continue
+				exchange_id, symbol, timestamp, side, kind, prices, sizes = item
+				day = time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+				symbol_id, new = self.symbol_id(exchange_id, day, symbol)
+				if (new):
+					changed.add((exchange_id, day))
+				records = np.zeros(len(prices), RECORD)
+				records['timestamp'] = timestamp
+				records['symbol'] = symbol_id
+				records['side'] = side
+				records['kind'] = kind
+				records['price'] = prices
+				records['size'] = sizes
+				chunks.setdefault((exchange_id, day), []).append(records)
+			for exchange_id, day in changed:
+				path = self.path(exchange_id, day)
+				os.makedirs(os.path.dirname(path), exist_ok=True)
+				with open(path + '.tmp', 'w') as file:
+					json.dump(self.indexes[(exchange_id, day)], file)
+				os.replace(path + '.tmp', path + '.json')
+			for key, records in chunks.items():
+				if (key not in files):
+					for old in [k for k in files if k[0] == key[0]]:
+						files.pop(old).close()
+					os.makedirs(os.path.dirname(self.path(*key)), exist_ok=True)
+					files[key] = open(self.path(*key) + '.bin', 'ab')
+				files[key].write(np.concatenate(records).tobytes())
+				files[key].flush()
+			if (stop):
+				for file in files.values():
+					file.close()
+				return
+
+	"""
+		Write the queued records and stop the recorder.
+	"""
+	def close(self):
+		if (self.thread.is_alive()):
+			self.queue.put(None)
+			self.thread.join(timeout=5)
+
+"""
+	Reader of the recorded books.
+	A day file is memory-mapped as a NumPy array of records, so it can be
+	filtered and aggregated without reading it in Python objects.
+	For example:
+	reader = BookReader('books')
+	for day in reader.days('binance'):
+		records = reader.records('binance', day, 'LTC/ETH')
+		print(day, len(records), records['price'].mean())
+"""
+class BookReader:
+
+	def __init__(self, directory=None):
+		self.directory = directory or config.RECORDER_DIRECTORY
+
+	"""
+		Load the symbol index of a day.
+		path:		the path of the day file, without extension.
+		returns:	a dict of symbol ids keyed by symbol.
+	"""
+	@staticmethod
+	def load_index(path):
+		if (not os.path.isfile(path + '.json')):
+			return {}
+		with open(path + '.json', 'r') as file:
+			return json.load(file)
+
+	"""
+		Get the recorded days of an exchange, oldest first.
+	"""
+	def days(self, exchange_id):
+		directory = os.path.join(self.directory, exchange_id)
+		if (not os.path.isdir(directory)):
+			return []
+		return sorted(name[:-4] for name in os.listdir(directory) if name.endswith('.bin'))
+
+	"""
+		Get the symbol index of a day.
+	"""
+	def symbols(self, exchange_id, day):
+		return BookReader.load_index(os.path.join(self.directory, exchange_id, day))
+
+	"""
+		Map the records of a day.
+		exchange_id:	the ccxt id of the exchange.
+		day:			the day, for example 2018-05-21.
+		symbol:			only keep the records of this symbol if given.
+		returns:		a NumPy array of RECORD.
+	"""
+	def records(self, exchange_id, day, symbol=None):
+		path = os.path.join(self.directory, exchange_id, day)
+		size = os.path.getsize(path + '.bin') // RECORD.itemsize
+		if (size == 0):
+			return np.zeros(0, RECORD)
+		records = np.memmap(path + '.bin', dtype=RECORD, mode='r', shape=(size,))
+		if (symbol is None):
+			return records
+		index = self.symbols(exchange_id, day)
+		if (symbol not in index):
+			return np.zeros(0, RECORD)
+		return records[records['symbol'] == index[symbol]]
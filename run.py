@@ -1,79 +1,283 @@
 """
 	Main logic of the bot.
-	It's an endless loop that scans opportunity for given exchange and executes
+	It's an endless loop that scans opportunity for given exchanges and executes
 	triarb if found.
-	It's multi-threaded.
+	It's multi-threaded. Every exchange runs in the same process with its own
+	scheduler, the logs, caches and notifier are shared. SIGINT and SIGTERM
+	stop the loops once the running arbitrages are done.
+	With --stream, the loop is replaced by a detector that only re-evaluates
+	the triangles whose order books changed.
 	The run function is on the parent thread. The process_asset if run on
-	children threads.
+	a pool of long-lived worker threads.
 """
 
 from crypto import Crypto
-import currencies
+from stream import DepthStream
+from detector import Detector
+from evaluator import TriangleEvaluator
+from graph import ArbitrageGraph
+from async_scan import AsyncScanner
+from pool import WorkerPool
+from execution import TriangleExecutor
+from universe import UniverseManager
+from scheduler import PriorityScheduler
+from paper import PaperExchange
+import argparse
+import asyncio
+import signal
 import threading
-import sys
 import time
 import config
 
 """
-	Check if an asset makes profit, if yes we execute the arbitrage
+	Check if an asset makes profit, if yes we execute the arbitrage.
+	The estimations are recorded in the universe to rank the alts, and in the
+	scheduler to plan the next scan.
 """
-def process_asset(crypto, exchange, alt):
+def process_asset(crypto, exchange, alt, universe=None, scheduler=None):
 	delta_forward = crypto.estimate_arbitrage_forward(exchange, alt)
 	delta_backward = crypto.estimate_arbitrage_backward(exchange, alt)
+	if (universe):
+		universe.record(alt, max(delta_forward, delta_backward))
+	if (scheduler):
+		scheduler.record(alt, max(delta_forward, delta_backward))
 	crypto.log("{:10} / {:5}: {:8.4f}% / {:8.4f}%".format(str(exchange), alt, delta_forward, delta_backward))
 	if (delta_forward > config.THRESHOLD):
 		crypto.log("Found opportunity for {:5} @{:.4f} on {}".format(alt, delta_forward, str(exchange)), mode="notification")
-		crypto.run_arbitrage_forward(exchange, alt)
+		if (config.PIPELINED_EXECUTION):
+			TriangleExecutor(crypto, exchange).run(alt, 'forward')
+		else:
+			crypto.run_arbitrage_forward(exchange, alt)
 	elif (delta_backward > config.THRESHOLD):
 		crypto.log("Found opportunity for {:5} @{:.4f} on {}".format(alt, delta_backward, str(exchange)), mode="notification")
-		crypto.run_arbitrage_backward(exchange, alt)
-
-"""
-	Loop over currencies.
-"""
-def run(crypto, exchange, thread_number):
-	alts = None
-	if (str(exchange) == "Binance"):
-		alts = currencies.binance_alternatives
-	elif (str(exchange) == "Bittrex"):
-		alts = currencies.bittrex_alternatives
-	elif (str(exchange) == "Bitfinex"):
-		alts = currencies.bitfinex_alternatives
-	while True:
-		for i in range(0, len(alts), thread_number):
-			alts_batch = alts[i:i+thread_number]
-			threads = []
-			for asset in alts_batch:
-				if (crypto.get_waiting(exchange)):
-					time.sleep(crypto.get_waiting(exchange))
-				threads.append(threading.Thread(target=process_asset, args=(crypto, exchange, asset)))
-				threads[-1].start()
-			for thread in threads:
-				thread.join()
-			crypto.flush_cache()
+		if (config.PIPELINED_EXECUTION):
+			TriangleExecutor(crypto, exchange).run(alt, 'backward')
+		else:
+			crypto.run_arbitrage_backward(exchange, alt)
+
+"""
+	Fetch the top of book of the alts of this cycle in bulk, evaluate every
+	triangle at once and keep only the alts that can still beat the threshold,
+	best first. Deeper levels are always worse than the top of book, so the
+	others cannot be profitable. Alts without a price this cycle, for example
+	because the bulk fetch failed, are kept, they will be fetched one by one by
+	process_asset.
+"""
+def prefetch(crypto, exchange, evaluator, alts):
+	symbols = ['ETH/BTC'] + ['{}/{}'.format(alt, quote) for alt in alts for quote in ('ETH', 'BTC')]
+	evaluator.update_tickers(crypto.fetch_tickers(exchange, symbols), symbols)
+	crypto.fetch_order_books(exchange, symbols)
+	alts = set(alts)
+	candidates = []
+	for alt, direction, delta in evaluator.opportunities(config.THRESHOLD):
+		if (alt in alts and alt not in candidates):
+			candidates.append(alt)
+	for alt in evaluator.missing():
+		if (alt in alts and alt not in candidates):
+			candidates.append(alt)
+	return candidates
+
+"""
+	Get the alts we scan on given exchange: every triangle of its markets that
+	is liquid enough, best ranked first.
+"""
+def get_alts(crypto, exchange):
+	return UniverseManager(crypto, exchange).refresh()
+
+"""
+	Build the evaluator of the universe with the fees of every symbol. They
+	are the taker fees the estimations charge on every leg, so the top of book
+	evaluation stays an upper bound of the estimations.
+"""
+def get_evaluator(crypto, exchange, alts):
+	evaluator = TriangleEvaluator(alts)
+	for symbol in evaluator.symbols():
+		evaluator.set_symbol_fees(symbol, crypto.get_fees(exchange, 'buy', symbol, 'taker'), crypto.get_fees(exchange, 'sell', symbol, 'taker'))
+	return evaluator
+
+"""
+	Loop over currencies. Each cycle scans the alts the scheduler says are
+	due, most urgent first, up to SCHEDULER_BUDGET of them. The alts skipped
+	by the prefetch are rescheduled with their top of book estimation. The
+	evaluator is rebuilt when the universe is refreshed.
+	stop:	an optional threading.Event that ends the loop.
+"""
+def run(crypto, exchange, thread_number, stop=None):
+	stop = stop or threading.Event()
+	universe = UniverseManager(crypto, exchange)
+	scheduler = PriorityScheduler()
+	evaluator = None
+	pool = WorkerPool(thread_number, lambda asset: process_asset(crypto, exchange, asset, universe, scheduler), name=str(exchange), log=crypto.log)
+	last_summary = time.time()
+	while (not stop.is_set()):
+		if (evaluator is None or universe.expired()):
+			universe.refresh()
+			evaluator = get_evaluator(crypto, exchange, universe.alts)
+			scheduler.sync(universe.alts, universe.max_intervals())
+		alts = scheduler.next(config.SCHEDULER_BUDGET)
+		if (not alts):
+			stop.wait(min(scheduler.wait(), config.SCHEDULER_MIN_INTERVAL))
+			continue
+		candidates = prefetch(crypto, exchange, evaluator, alts)
+		for alt, delta in evaluator.best(alts).items():
+			if (alt not in candidates):
+				scheduler.record(alt, delta)
+		for asset in candidates:
+			pool.submit(asset)
+		pool.join()
+		if (time.time() - last_summary > config.POOL_SUMMARY_INTERVAL):
+			crypto.log("Pool on {}: {}".format(str(exchange), pool.summary()))
+			crypto.log("Most urgent alts on {}:\n{}".format(str(exchange), scheduler.describe()))
+			last_summary = time.time()
+	pool.stop()
+
+"""
+	Listen to the depth streams and only re-evaluate the triangles whose
+	books changed. An alt is processed by one thread at a time.
+"""
+def run_stream(crypto, exchange, stop=None):
+	stop = stop or threading.Event()
+	busy = set()
+	lock = threading.Lock()
+
+	def process(alt):
+		try:
+			process_asset(crypto, exchange, alt)
+		finally:
+			with lock:
+				busy.discard(alt)
+
+	def on_opportunity(alt):
+		with lock:
+			if (alt in busy):
+				return
+			busy.add(alt)
+		threading.Thread(target=process, args=(alt,)).start()
+
+	detector = Detector(crypto, exchange, get_alts(crypto, exchange), on_opportunity)
+	depth_stream = DepthStream(exchange, detector.symbols(), on_update=detector.on_update, recorder=crypto.recorder)
+	crypto.attach_stream(exchange, depth_stream)
+	detector.start()
+	depth_stream.start()
+	while (not stop.wait(60)):
+		crypto.log("{} triangles evaluated on {}".format(detector.evaluations, str(exchange)))
+	depth_stream.stop()
+	detector.stop()
+
+"""
+	Get the alt of a cycle we can execute, a triangle through ETH and BTC,
+	whatever currency the cycle starts from.
+	returns:	the alt, None for the other cycles.
+"""
+def triangle_alt(path):
+	currencies = set(path)
+	if (len(path) != 4 or not {'ETH', 'BTC'} < currencies):
+		return None
+	return (currencies - {'ETH', 'BTC'}).pop()
+
+"""
+	Look for profitable cycles of 3 or 4 trades through every market of the
+	exchange, from every quote currency, every GRAPH_SCAN_INTERVAL seconds.
+	The ETH/ALT/BTC triangles are processed on the worker pool, one at a time
+	per alt, the other cycles are only logged when they appear since we
+	cannot execute them yet.
+"""
+def run_graph(crypto, exchange, thread_number, stop=None):
+	stop = stop or threading.Event()
+	markets = exchange.load_markets()
+	graph = ArbitrageGraph(markets, ArbitrageGraph.quotes(markets), fee=lambda symbol, side: crypto.get_fees(exchange, side, symbol))
+	crypto.log("Graph of {} has {} edges and {} cycles".format(str(exchange), len(graph.edges), len(graph.cycles)))
+	symbols = list(markets)
+	busy = set()
+	lock = threading.Lock()
+
+	def process(alt):
+		try:
+			process_asset(crypto, exchange, alt)
+		finally:
+			with lock:
+				busy.discard(alt)
+
+	pool = WorkerPool(thread_number, process, name=str(exchange), log=crypto.log)
+	seen = set()
+	while (not stop.is_set()):
+		for symbol, ticker in crypto.fetch_tickers(exchange, symbols).items():
+			graph.update(symbol, ticker.get('bid'), ticker.get('ask'))
+		found = set()
+		for delta, path, legs in graph.opportunities(config.THRESHOLD):
+			found.add(tuple(path))
+			if (tuple(path) not in seen):
+				crypto.log("Cycle {} on {}: {:8.4f}%".format(" -> ".join(path), str(exchange), delta))
+			alt = triangle_alt(path)
+			with lock:
+				if (not alt or alt in busy):
+					continue
+				busy.add(alt)
+			pool.submit(alt)
+		seen = found
+		stop.wait(config.GRAPH_SCAN_INTERVAL)
+	pool.stop()
+
+"""
+	Get how many worker threads process the alts of an exchange. A paper
+	exchange has the pool size of the exchange it trades on.
+"""
+def pool_size(exchange):
+	if (isinstance(exchange, PaperExchange)):
+		exchange = exchange.source
+	return config.POOL_SIZE.get(str(exchange), 4)
+
+"""
+	Scan with asyncio, every alt in flight at the same time.
+"""
+async def run_async(crypto, exchange, stop=None):
+	scanner = AsyncScanner(crypto, exchange, get_alts(crypto, exchange), lambda alt: process_asset(crypto, exchange, alt))
+	await scanner.run(stop)
+
+"""
+	Run every exchange on one event loop until SIGINT or SIGTERM. The
+	asynchronous scans run on the loop itself, the threaded ones in the
+	executor of the loop.
+"""
+async def run_all(crypto, exchanges, args):
+	loop = asyncio.get_running_loop()
+	stop = threading.Event()
+	for sig in (signal.SIGINT, signal.SIGTERM):
+		loop.add_signal_handler(sig, stop.set)
+	tasks = []
+	for exchange in exchanges:
+		crypto.log("Starting to listen the {} markets".format(str(exchange)))
+		crypto.orders.listen(exchange)
+		if (args.graph):
+			tasks.append(loop.run_in_executor(None, run_graph, crypto, exchange, pool_size(exchange), stop))
+		elif (args.stream):
+			tasks.append(loop.run_in_executor(None, run_stream, crypto, exchange, stop))
+		elif (args.use_async):
+			tasks.append(run_async(crypto, exchange, stop))
+		else:
+			tasks.append(loop.run_in_executor(None, run, crypto, exchange, pool_size(exchange), stop))
+	results = await asyncio.gather(*tasks, return_exceptions=True)
+	for exchange, result in zip(exchanges, results):
+		if (isinstance(result, Exception)):
+			crypto.log("{} stopped with an error: {}".format(str(exchange), str(result)), mode="notification")
+	crypto.log("Stopped")
 
 """
 	Main
 """
 if (__name__ == "__main__"):
-	if (len(sys.argv) != 2):
-		print("python3 run.py <exchange>")
-		exit()
-	exchange_str = sys.argv[1]
-	exchanges = ["binance", "bittrex", "bitfinex"]
-	if (not exchange_str in exchanges):
-		print("{} is not a valid exchange. Options:".format(exchange_str))
-		for exchange in exchanges:
-			print("- {}".format(exchange))
-		exit()
-	crypto = Crypto()
-	exchange = None
-	if (exchange_str == "binance"):
-		exchange = crypto.binance
-	if (exchange_str == "bittrex"):
-		exchange = crypto.bittrex
-	if (exchange_str == "bitfinex"):
-		exchange = crypto.bitfinex
-	crypto.log("Starting to listen the {} markets".format(exchange_str))
-	thread_number = 4
-	run(crypto, exchange, thread_number)
+	exchanges = list(Crypto.CLIENTS) + ['paper']
+	parser = argparse.ArgumentParser(description="Wait for opportunities and execute arbitrage if found.")
+	parser.add_argument('exchanges', nargs='*', metavar='exchange', help="the exchanges to run among {}, every configured one by default".format(", ".join(exchanges)))
+	parser.add_argument('--stream', action='store_true', help="maintain order books from the depth streams (binance only)")
+	parser.add_argument('--async', dest='use_async', action='store_true', help="scan with asyncio and pooled connections")
+	parser.add_argument('--graph', action='store_true', help="look for cycles through every market instead of ETH/ALT/BTC triangles")
+	args = parser.parse_args()
+	for name in args.exchanges:
+		if (name not in exchanges):
+			parser.error("unknown exchange {}".format(name))
+	crypto = Crypto(args.exchanges or None)
+	try:
+		asyncio.run(run_all(crypto, [crypto.get_exchange(name) for name in (args.exchanges or Crypto.configured())], args))
+	finally:
+		crypto.close()
@@ -1,4 +1,2 @@
 #!/bin/sh
-python3 run.py binance &
-python3 run.py bittrex &
-python3 run.py bitfinex &
+python3 run.py &
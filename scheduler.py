@@ -0,0 +1,149 @@
+import heapq
+import threading
+import time
+import config
+
+"""
+	Priority scheduler of the scanned alts.
+	Every alt has a deadline in a heap: the alts are scanned in deadline order,
+	so the scan budget of a cycle goes to the most urgent ones. After each
+	estimation, the next deadline is computed from how far the recent estimate
+	is from the threshold, minus its volatility: an alt near the threshold or
+	moving a lot is scanned again after SCHEDULER_MIN_INTERVAL seconds, a quiet
+	alt far from it after its maximum interval. The maximum interval is the
+	minimum refresh rate every alt is guaranteed.
+	For example:
+	scheduler = PriorityScheduler()
+	scheduler.sync(['LTC', 'XRP'])
+	alts = scheduler.next(20)
+	scheduler.record('LTC', -0.4)
+	print(scheduler.describe())
+"""
+class PriorityScheduler:
+
+	def __init__(self, max_interval=None):
+		self.max_interval = max_interval or config.SCHEDULER_MAX_INTERVAL
+		self.lock = threading.Lock()
+		self.heap = []
+		self.entries = {}
+
+	"""
+		Set the scheduled alts. New alts are due now, removed ones are dropped,
+		the others keep their state.
+		alts:			the alts to schedule.
+		max_intervals:	an optional dict of maximum intervals by alt.
+	"""
+	def sync(self, alts, max_intervals=None):
+		max_intervals = max_intervals or {}
+		with self.lock:
+			for alt in set(self.entries) - set(alts):
+				del self.entries[alt]
+			for alt in alts:
+				entry = self.entries.get(alt)
+				if (entry is None):
+					entry = {'estimate': None, 'volatility': 0.0, 'scanned': 0.0, 'deadline': 0.0, 'scans': 0}
+					self.entries[alt] = entry
+					self.push(alt, 0.0)
+				entry['max_interval'] = max_intervals.get(alt, self.max_interval)
+
+	def push(self, alt, deadline):
+		self.entries[alt]['deadline'] = deadline
+		heapq.heappush(self.heap, (deadline, alt))
+
+	"""
+		Get the alts that are due, most urgent first. They are rescheduled at
+		their maximum interval until their estimation is recorded, so an alt
+		whose estimation fails is still refreshed.
+		budget:		the maximum number of alts.
+		returns:	a list of alts, empty if none is due.
+	"""
+	def next(self, budget):
+		now = time.time()
+		alts = []
+		with self.lock:
+			while (self.heap and len(alts) < budget and self.heap[0][0] <= now):
+				deadline, alt = heapq.heappop(self.heap)
+				entry = self.entries.get(alt)
+				if (entry is None or entry['deadline'] != deadline):
+					continue
+				alts.append(alt)
+				self.push(alt, now + entry['max_interval'])
+		return alts
+
+	"""
+		Get how many seconds until the next alt is due.
+	"""
+	def wait(self):
+		with self.lock:
+			while (self.heap):
+				deadline, alt = self.heap[0]
+				entry = self.entries.get(alt)
+				if (entry is not None and entry['deadline'] == deadline):
+					return max(deadline - time.time(), 0)
+				heapq.heappop(self.heap)
+		return self.max_interval
+
+	"""
+		Get the interval until the next scan of an alt.
+	"""
+	def interval(self, entry):
+		if (entry['estimate'] is None):
+			return 0
+		gap = config.THRESHOLD - entry['estimate'] - config.SCHEDULER_VOLATILITY_WEIGHT * entry['volatility']
+		ratio = min(max(gap / config.SCHEDULER_GAP_SCALE, 0), 1)
+		return config.SCHEDULER_MIN_INTERVAL + (entry['max_interval'] - config.SCHEDULER_MIN_INTERVAL) * ratio
+
+	"""
+		Record an estimation and reschedule the alt.
+		alt:	the estimated alt.
+		delta:	the best estimated percentage.
+	"""
+	def record(self, alt, delta):
+		now = time.time()
+		alpha = config.SCHEDULER_SMOOTHING
+		with self.lock:
+			entry = self.entries.get(alt)
+			if (entry is None):
+				return
+			if (entry['estimate'] is None):
+				entry['estimate'] = delta
+			else:
+				entry['volatility'] = (1 - alpha) * entry['volatility'] + alpha * abs(delta - entry['estimate'])
+				entry['estimate'] = (1 - alpha) * entry['estimate'] + alpha * delta
+			entry['scanned'] = now
+			entry['scans'] += 1
+			self.push(alt, now + self.interval(entry))
+
+	"""
+		Get the priority state, for debugging.
+		returns:	a list of dicts, most urgent first.
+	"""
+	def state(self):
+		now = time.time()
+		with self.lock:
+			rows = [{
+				'alt': alt,
+				'estimate': entry['estimate'],
+				'volatility': entry['volatility'],
+				'age': now - entry['scanned'] if entry['scanned'] else None,
+				'due': entry['deadline'] - now,
+				'scans': entry['scans'],
+			} for alt, entry in self.entries.items()]
+		return sorted(rows, key=lambda row: row['due'])
+
+	"""
+		Get the priority state of the most urgent alts as text.
+		count:	how many alts to describe.
+	"""
+	def describe(self, count=10):
+		lines = []
+		for row in self.state()[:count]:
+			lines.append("{:5} estimate {} volatility {:.4f} age {} due in {:.1f}s, {} scans".format(
+				row['alt'],
+				"{:8.4f}%".format(row['estimate']) if row['estimate'] is not None else "     new",
+				row['volatility'],
+				"{:.1f}s".format(row['age']) if row['age'] is not None else "never",
+				row['due'],
+				row['scans']
+			))
+		return "\n".join(lines)
@@ -0,0 +1,263 @@
+import json
+import threading
+import time
+from bisect import bisect_left, insort
+import websocket
+from book import Book, BookSide
+import config
+
+"""
+	Streaming market data.
+	A DepthStream subscribes to the depth diff streams of a list of symbols and
+	keeps a LocalBook for each of them. Books are synced with a REST snapshot,
+	then updated from the stream. When an update id is missing, the book is
+	resynced from a new snapshot.
+	The stream speaks the Binance combined stream protocol, feed_server.py can
+	replay a recorded session with the same protocol.
+	For example:
+	stream = DepthStream(crypto.binance, ['LTC/ETH', 'LTC/BTC', 'ETH/BTC'])
+	stream.start()
+	crypto.attach_stream(crypto.binance, stream)
+"""
+
+"""
+	Order book of one symbol, maintained from a snapshot and diff updates.
+	Price levels are kept sorted on insertion so reading the book never sorts.
+"""
+class LocalBook:
+
+	APPLIED = 0
+	STALE = 1
+	GAP = 2
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.bids = {}
+		self.asks = {}
+		self.bid_prices = []
+		self.ask_prices = []
+		self.last_update_id = None
+
+	"""
+		Replace the book content with a snapshot.
+		book:	a ccxt order book, its nonce is the last update id.
+	"""
+	def load_snapshot(self, book):
+		with self.lock:
+			self.bids = {}
+			self.asks = {}
+			self.bid_prices = []
+			self.ask_prices = []
+			for price, size in book['bids']:
+				self.set_level('bids', float(price), float(size))
+			for price, size in book['asks']:
+				self.set_level('asks', float(price), float(size))
+			self.last_update_id = book['nonce']
+
+	"""
+		Set the size of a price level, a size of 0 removes the level.
+		Bid prices are stored negated so both lists are ascending.
+		Caller must hold the lock.
+	"""
+	def set_level(self, side, price, size):
+		levels = self.bids if side == 'bids' else self.asks
+		prices = self.bid_prices if side == 'bids' else self.ask_prices
+		key = -price if side == 'bids' else price
+		if (size == 0):
+			if (price in levels):
+				del levels[price]
+				del prices[bisect_left(prices, key)]
+			return
+		if (price not in levels):
+			insort(prices, key)
+		levels[price] = size
+
+	"""
+		Apply a depth diff event.
+		event:		a Binance depthUpdate event.
+		returns:	APPLIED, STALE if the event is older than the book, GAP if
+					some events are missing and the book must be resynced.
+	"""
+	def apply(self, event):
+		with self.lock:
+			if (self.last_update_id is None):
+				return LocalBook.GAP
+			if (event['u'] <= self.last_update_id):
+				return LocalBook.STALE
+			if (event['U'] > self.last_update_id + 1):
+				return LocalBook.GAP
+			for price, size in event['b']:
+				self.set_level('bids', float(price), float(size))
+			for price, size in event['a']:
+				self.set_level('asks', float(price), float(size))
+			self.last_update_id = event['u']
+			return LocalBook.APPLIED
+
+	"""
+		Get an immutable copy of the book, already sorted.
+		returns:	a book.Book.
+	"""
+	def to_book(self):
+		with self.lock:
+			return Book(
+				BookSide([-key for key in self.bid_prices], [self.bids[-key] for key in self.bid_prices], descending=True, presorted=True),
+				BookSide(self.ask_prices, [self.asks[key] for key in self.ask_prices], presorted=True),
+				nonce=self.last_update_id
+			)
+
+	"""
+		Get the book in the ccxt format.
+		depth:		the maximum number of levels per side, all if None.
+		returns:	a dict with sorted bids and asks.
+	"""
+	def to_ccxt(self, depth=None):
+		with self.lock:
+			bids = [[-key, self.bids[-key]] for key in self.bid_prices[:depth]]
+			asks = [[key, self.asks[key]] for key in self.ask_prices[:depth]]
+			return {'bids': bids, 'asks': asks, 'nonce': self.last_update_id}
+
+"""
+	Depth diff stream client for a list of symbols.
+	exchange:	the ccxt exchange, used to map symbols and fetch snapshots.
+	symbols:	the list of wanted symbols.
+	url:		the combined stream base url.
+	snapshot:	function(symbol) returning a ccxt order book with a nonce,
+				exchange.fetchOrderBook by default.
+	on_update:	function(symbol) called after each applied update.
+	recorder:	an optional recorder.BookRecorder for the snapshots and updates.
+"""
+class DepthStream:
+
+	def __init__(self, exchange, symbols, url=None, snapshot=None, on_update=None, recorder=None):
+		self.exchange = exchange
+		self.symbols = list(symbols)
+		self.url = url or config.STREAM_URL
+		self.snapshot = snapshot or (lambda symbol: exchange.fetchOrderBook(symbol, config.STREAM_SNAPSHOT_DEPTH))
+		self.on_update = on_update
+		self.recorder = recorder
+		self.books = {}
+		self.pending = {}
+		self.syncing = set()
+		self.ids = {}
+		self.lock = threading.Lock()
+		self.socket = None
+		self.running = False
+		self.thread = None
+		for symbol in self.symbols:
+			self.ids[symbol.replace('/', '').upper()] = symbol
+			self.books[symbol] = LocalBook()
+			self.pending[symbol] = []
+
+	"""
+		Build the combined stream url for all symbols.
+	"""
+	def stream_url(self):
+		streams = ['{}@depth@100ms'.format(symbol.replace('/', '').lower()) for symbol in self.symbols]
+		return '{}?streams={}'.format(self.url, '/'.join(streams))
+
+	"""
+		Start listening in a background thread, reconnecting if the connection drops.
+	"""
+	def start(self):
+		self.running = True
+		self.thread = threading.Thread(target=self.listen, daemon=True)
+		self.thread.start()
+
+	"""
+		Stop listening.
+	"""
+	def stop(self):
+		self.running = False
+		if (self.socket):
+			self.socket.close()
+
+	def listen(self):
+		while self.running:
+			self.socket = websocket.WebSocketApp(self.stream_url(), on_message=self.on_message)
+			self.socket.run_forever()
+			if (self.running):
+				with self.lock:
+					for symbol in self.symbols:
+						self.books[symbol].last_update_id = None
+				time.sleep(config.STREAM_RECONNECT_DELAY)
+
+	def on_message(self, socket, message):
+		message = json.loads(message)
+		event = message.get('data', message)
+		symbol = self.ids.get(event.get('s'))
+		if (not symbol):
+			return
+		self.handle(symbol, event)
+
+	"""
+		Apply an event to the book of the symbol, buffering it while the book
+		is being synced.
+		symbol:	the symbol of the event.
+		event:	a Binance depthUpdate event.
+	"""
+	def handle(self, symbol, event):
+		with self.lock:
+			if (symbol in self.syncing):
+				self.pending[symbol].append(event)
+				return
+			result = self.books[symbol].apply(event)
+			if (result == LocalBook.GAP):
+				self.syncing.add(symbol)
+				self.pending[symbol] = [event]
+				threading.Thread(target=self.resync, args=(symbol,), daemon=True).start()
+				return
+		if (result == LocalBook.APPLIED and self.recorder):
+			if (self.recorder.lost(self.exchange, symbol)):
+				self.recorder.record_book(self.exchange, symbol, self.books[symbol].to_book())
+			else:
+				self.recorder.record_levels(self.exchange, symbol, event.get('b', []), event.get('a', []))
+		if (result == LocalBook.APPLIED and self.on_update):
+			self.on_update(symbol)
+
+	"""
+		Load a snapshot for the symbol, then replay the buffered events. If the
+		buffered events do not follow the snapshot, we try again with the
+		events from the gap on.
+		symbol:	the symbol to resync.
+	"""
+	def resync(self, symbol):
+		while self.running:
+			try:
+				book = self.snapshot(symbol)
+			except Exception:
+				time.sleep(config.STREAM_RECONNECT_DELAY)
+				continue
+			with self.lock:
+				self.books[symbol].load_snapshot(book)
+				events = self.pending[symbol]
+				self.pending[symbol] = []
+				synced = True
+				for i, event in enumerate(events):
+					if (self.books[symbol].apply(event) == LocalBook.GAP):
+						synced = False
+						self.pending[symbol] = events[i:]
+						break
+				if (synced):
+					self.syncing.discard(symbol)
+					if (self.recorder):
+						self.recorder.record_book(self.exchange, symbol, self.books[symbol].to_book())
+					break
+		if (self.on_update):
+			self.on_update(symbol)
+
+	"""
+		Check if the book of the symbol is synced with the stream.
+	"""
+	def is_synced(self, symbol):
+		with self.lock:
+			return symbol in self.books and symbol not in self.syncing and self.books[symbol].last_update_id is not None
+
+	"""
+		Get the local order book of the symbol.
+		symbol:		the wanted symbol.
+		returns:	the order book as a book.Book, None if not synced.
+	"""
+	def get_order_book(self, symbol):
+		if (not self.is_synced(symbol)):
+			return None
+		return self.books[symbol].to_book()
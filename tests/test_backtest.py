@@ -0,0 +1,108 @@
+import os
+import threading
+import numpy as np
+import pytest
+
+ccxt = pytest.importorskip('ccxt')
+import config
+from book import Book
+from recorder import BookRecorder, BookReader, BID, ASK, SNAPSHOT, UPDATE, TICKER, GAP
+from backtest import Replay, ReplayBooks, ReplayExchange, ReplayCrypto
+
+class Exchange:
+	id = 'binance'
+
+"""
+	Build the sides, prices and sizes arrays of some (side, price, size) levels.
+"""
+def records(*levels):
+	sides = np.array([side for side, price, size in levels], dtype=np.uint8)
+	prices = np.array([price for side, price, size in levels], dtype=np.float64)
+	sizes = np.array([size for side, price, size in levels], dtype=np.float64)
+	return sides, prices, sizes
+
+"""
+	The recorded books are rebuilt by the replay, updates included.
+"""
+def test_replay_recorded_books(tmp_path):
+	recorder = BookRecorder(str(tmp_path))
+	recorder.record_book(Exchange(), 'LTC/ETH', Book.from_ccxt({'bids': [[0.3, 1], [0.29, 2]], 'asks': [[0.31, 3]]}))
+	recorder.record_levels(Exchange(), 'LTC/ETH', [[0.3, 0], [0.295, 5]], [[0.305, 1]])
+	recorder.record_ticker(Exchange(), 'ETH/BTC', {'bid': 0.05, 'ask': 0.0501})
+	recorder.close()
+	reader = BookReader(str(tmp_path))
+	replay = Replay(reader, 'binance', reader.days('binance'))
+	symbols = []
+	symbol = replay.step()
+	while (symbol is not None):
+		symbols.append(symbol)
+		symbol = replay.step()
+	assert symbols == ['LTC/ETH', 'LTC/ETH', 'ETH/BTC']
+	book = replay.books.get_order_book('LTC/ETH')
+	assert list(book.bids) == [(0.295, 5), (0.29, 2)]
+	assert list(book.asks) == [(0.305, 1), (0.31, 3)]
+	ticker = replay.books.get_order_book('ETH/BTC')
+	assert ticker.bids[0][0] == 0.05 and ticker.asks[0][0] == 0.0501
+
+"""
+	After a gap the book is unknown, its updates are ignored until the next
+	snapshot.
+"""
+def test_gap_until_snapshot():
+	books = ReplayBooks()
+	books.apply('LTC/ETH', SNAPSHOT, *records((BID, 0.3, 1), (ASK, 0.31, 3)))
+	books.apply('LTC/ETH', GAP, *records())
+	assert books.get_order_book('LTC/ETH') is None
+	books.apply('LTC/ETH', UPDATE, *records((BID, 0.29, 2)))
+	assert books.get_order_book('LTC/ETH') is None
+	books.apply('LTC/ETH', SNAPSHOT, *records((BID, 0.28, 1), (ASK, 0.32, 3)))
+	books.apply('LTC/ETH', UPDATE, *records((BID, 0.29, 2)))
+	assert list(books.get_order_book('LTC/ETH').bids) == [(0.29, 2), (0.28, 1)]
+
+"""
+	A symbol with only tickers recovers from a gap with its next ticker.
+"""
+def test_gap_until_ticker():
+	books = ReplayBooks()
+	books.apply('ETH/BTC', TICKER, *records((BID, 0.05, 0), (ASK, 0.0501, 0)))
+	books.apply('ETH/BTC', GAP, *records())
+	assert books.get_order_book('ETH/BTC') is None
+	books.apply('ETH/BTC', TICKER, *records((BID, 0.051, 0), (ASK, 0.0511, 0)))
+	assert books.get_order_book('ETH/BTC').bids[0][0] == 0.051
+
+"""
+	What fills a limit order at placement pays the taker fee, what fills it
+	while it rests pays the maker fee.
+"""
+def test_limit_order_liquidity():
+	replay = Replay(BookReader('/nonexistent'), 'binance', [])
+	replay.books.apply('LTC/ETH', SNAPSHOT, *records((BID, 0.29, 1), (ASK, 0.3, 1), (ASK, 0.31, 3)))
+	exchange = ReplayExchange('binance', replay, {'ETH': 10})
+	fills = []
+	exchange.fee = lambda side, symbol, liquidity: fills.append(liquidity) or 1
+	order = exchange.createLimitBuyOrder('LTC/ETH', 3, 0.3)
+	assert order['filled'] == 1 and order['status'] == 'open'
+	replay.books.apply('LTC/ETH', UPDATE, *records((ASK, 0.3, 5)))
+	exchange.match(order)
+	assert order['status'] == 'closed'
+	assert fills == ['taker', 'maker']
+	assert exchange.balances['LTC'] == 3
+	assert exchange.balances['ETH'] == pytest.approx(10 - 0.9)
+
+"""
+	A replay logs nothing, records nothing and starts no thread, and reads
+	its balances from the simulated exchange.
+"""
+def test_replay_crypto_side_effect_free(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	monkeypatch.setattr(config, 'RECORDER_ENABLED', True)
+	replay = Replay(BookReader(str(tmp_path)), 'binance', [])
+	exchange = ReplayExchange('binance', replay, {'ETH': 2})
+	threads = threading.active_count()
+	crypto = ReplayCrypto(exchange, replay)
+	crypto.log("nothing")
+	assert threading.active_count() == threads
+	assert os.listdir(str(tmp_path)) == []
+	assert crypto.get_balance(exchange, 'ETH') == 2
+	exchange.balances['ETH'] = 3
+	assert crypto.get_balance(exchange, 'ETH') == 3
@@ -0,0 +1,65 @@
+import pytest
+from book import Book, BookSide
+from fill import simulate_buy, simulate_sell
+
+ASKS = [[0.32, 4], [0.3, 1], [0.31, 2]]
+BIDS = [[0.28, 2], [0.29, 1], [0.27, 4]]
+
+def book():
+	return Book.from_ccxt({'bids': BIDS, 'asks': ASKS})
+
+"""
+	Each side is sorted from the best price and read like ccxt levels.
+"""
+def test_sorted_sides():
+	orders = book()
+	assert orders['asks'][0] == (0.3, 1)
+	assert orders['bids'][0] == (0.29, 1)
+	assert list(orders['asks']) == [(0.3, 1), (0.31, 2), (0.32, 4)]
+	assert len(orders['bids'][:2]) == 2
+	with pytest.raises(ValueError):
+		orders['asks'].prices[0] = 1
+
+"""
+	The depth is the size at the given price or better.
+"""
+def test_depth():
+	orders = book()
+	assert orders['asks'].depth(0.31) == 3
+	assert orders['asks'].depth(0.29) == 0
+	assert orders['asks'].depth(1) == 7
+	assert orders['bids'].depth(0.28) == 3
+	assert orders['bids'].depth(0.3) == 0
+
+"""
+	The level index is the first level at the price or worse.
+"""
+def test_level_index():
+	orders = book()
+	assert orders['asks'].level_index(0.31) == 1
+	assert orders['asks'].level_index(0.305) == 1
+	assert orders['asks'].level_index(0.4) == 3
+	assert orders['bids'].level_index(0.28) == 1
+	assert orders['bids'].level_index(0.285) == 1
+	assert orders['bids'].level_index(0.3) == 0
+
+"""
+	The binary search gives the same fills as walking the levels.
+"""
+@pytest.mark.parametrize('amount', [0.5, 1, 2.5, 7, 10])
+def test_fill_matches_walk(amount):
+	orders = book()
+	asks = sorted(ASKS)
+	bids = sorted(BIDS, reverse=True)
+	assert orders['asks'].fill(base_amount=amount) == pytest.approx(simulate_buy(asks, base_amount=amount))
+	assert orders['asks'].fill(quote_amount=amount / 4) == pytest.approx(simulate_buy(asks, quote_amount=amount / 4))
+	assert orders['bids'].fill(base_amount=amount) == pytest.approx(simulate_sell(bids, amount))
+	assert simulate_buy(orders['asks'], base_amount=amount) == orders['asks'].fill(base_amount=amount)
+
+"""
+	Nothing can be filled on an empty side.
+"""
+def test_empty_side():
+	side = BookSide.from_levels([])
+	assert side.fill(base_amount=1) == (None, 0, 0)
+	assert side.depth(1) == 0
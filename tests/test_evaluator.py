@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import config
+from evaluator import TriangleEvaluator
+
+PRICES = {
+	'ETH/BTC': (0.05, 0.0501),
+	'LTC/ETH': (0.3, 0.301),
+	'LTC/BTC': (0.0152, 0.0153),
+	'XRP/ETH': (0.001, 0.00101),
+	'XRP/BTC': (0.0000495, 0.0000496),
+}
+
+"""
+	An evaluator of LTC, XRP and ADA with the prices above, ADA has none.
+"""
+def evaluator(prices=PRICES):
+	triangles = TriangleEvaluator(['LTC', 'XRP', 'ADA'])
+	triangles.set_fees(0.999, 0.999)
+	for symbol, (bid, ask) in prices.items():
+		triangles.update(symbol, bid, ask)
+	return triangles
+
+"""
+	The profits are those of the three legs at the best prices, with fees.
+"""
+def test_profits():
+	forward, backward = evaluator().evaluate()
+	fee = 0.999 ** 3
+	assert forward[0] == pytest.approx((1 / 0.301 * 0.0152 / 0.0501 * fee - 1) * 100)
+	assert backward[1] == pytest.approx((0.05 / 0.0000496 * 0.001 * fee - 1) * 100)
+	assert np.isnan(forward[2]) and np.isnan(backward[2])
+
+"""
+	Alts missing a price are listed and never show up as opportunities.
+"""
+def test_missing_prices():
+	triangles = evaluator()
+	assert triangles.missing() == ['ADA']
+	assert set(triangles.best()) == {'LTC', 'XRP'}
+	assert all(alt != 'ADA' for alt, _, _ in triangles.opportunities(-100))
+	triangles.update_tickers({}, ['LTC/BTC'])
+	assert triangles.missing() == ['LTC', 'ADA']
+	triangles.update('ETH/BTC', None, None)
+	assert triangles.missing() == ['LTC', 'XRP', 'ADA']
+
+"""
+	Opportunities are above the threshold, best first.
+"""
+def test_opportunities():
+	triangles = evaluator()
+	best = triangles.best()
+	opportunities = triangles.opportunities(-100)
+	assert [delta for _, _, delta in opportunities] == sorted((delta for _, _, delta in opportunities), reverse=True)
+	assert opportunities[0][2] == pytest.approx(max(best.values()))
+	assert triangles.opportunities(max(best.values())) == []
+
+"""
+	A fee set on one symbol only changes its triangle.
+"""
+def test_symbol_fees():
+	triangles = evaluator()
+	before = triangles.best()
+	triangles.set_symbol_fees('LTC/ETH', 0.99, 0.99)
+	after = triangles.best()
+	assert after['LTC'] < before['LTC']
+	assert after['XRP'] == before['XRP']
+
+"""
+	On books deep enough for the trade, the evaluator gives the estimate of
+	Crypto, which walks the books.
+"""
+def test_matches_scalar_estimate(tmp_path, monkeypatch):
+	pytest.importorskip('ccxt')
+	from book import Book
+	from recorder import BookRecorder, BookReader
+	from backtest import Replay, ReplayExchange, ReplayCrypto
+	monkeypatch.setattr(config, 'ESTIMATION_ETH', 1)
+	monkeypatch.setattr(config, 'MARKETS_CACHE_DIRECTORY', str(tmp_path / 'markets'))
+	recorder = BookRecorder(str(tmp_path / 'books'))
+	class Exchange:
+		id = 'binance'
+	for symbol, (bid, ask) in PRICES.items():
+		recorder.record_book(Exchange(), symbol, Book.from_ccxt({'bids': [[bid, 1e9]], 'asks': [[ask, 1e9]]}))
+	recorder.close()
+	reader = BookReader(str(tmp_path / 'books'))
+	replay = Replay(reader, 'binance', reader.days('binance'))
+	while (replay.step()):
+		pass
+	exchange = ReplayExchange('binance', replay, {'ETH': 10})
+	crypto = ReplayCrypto(exchange, replay)
+	forward, backward = evaluator().evaluate()
+	for i, alt in enumerate(['LTC', 'XRP']):
+		assert crypto.estimate_arbitrage_forward(exchange, alt) == pytest.approx(forward[i], abs=1e-9)
+		assert crypto.estimate_arbitrage_backward(exchange, alt) == pytest.approx(backward[i], abs=1e-9)
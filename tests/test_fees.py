@@ -0,0 +1,56 @@
+import threading
+import time
+from fees import FeeSchedule
+
+class Markets:
+	def all(self, exchange):
+		return {'LTC/ETH': {'maker': 0.001, 'taker': 0.002}}
+
+class Exchange:
+	id = 'binance'
+	has = {'fetchTradingFees': True}
+
+	def __init__(self, delay=0):
+		self.delay = delay
+		self.calls = 0
+
+	def fetchTradingFees(self):
+		self.calls += 1
+		time.sleep(self.delay)
+		return {'LTC/ETH': {'maker': 0.0009, 'taker': 0.0011}}
+
+"""
+	The maker rate is used for a fill that rested in the book, the taker rate
+	otherwise.
+"""
+def test_rate_by_liquidity():
+	schedule = FeeSchedule(Markets())
+	exchange = Exchange()
+	assert schedule.rate(exchange, 'LTC/ETH', 'maker') == 0.0009
+	assert schedule.rate(exchange, 'LTC/ETH', 'taker') == 0.0011
+	assert schedule.rate(exchange, 'XRP/ETH', 'taker') is None
+
+"""
+	Threads missing the rates at startup wait for a single fetch.
+"""
+def test_first_load_fetches_once():
+	schedule = FeeSchedule(Markets())
+	exchange = Exchange(delay=0.2)
+	rates = []
+	threads = [threading.Thread(target=lambda: rates.append(schedule.rate(exchange, 'LTC/ETH', 'taker'))) for _ in range(8)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	assert exchange.calls == 1
+	assert rates == [0.0011] * 8
+
+"""
+	The rates of the markets are used when the exchange cannot give them.
+"""
+def test_falls_back_to_markets():
+	schedule = FeeSchedule(Markets())
+	exchange = Exchange()
+	exchange.has = {}
+	assert schedule.rate(exchange, 'LTC/ETH', 'maker') == 0.001
+	assert exchange.calls == 0
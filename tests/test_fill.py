@@ -0,0 +1,41 @@
+import pytest
+from fill import simulate_buy, simulate_sell
+
+ASKS = [[0.3, 1], [0.31, 2], [0.32, 4]]
+BIDS = [[0.29, 1], [0.28, 2], [0.27, 4]]
+
+"""
+	A buy for a quote amount walks the asks and returns their VWAP.
+"""
+def test_buy_quote_amount():
+	vwap, filled, spent = simulate_buy(ASKS, quote_amount=0.61)
+	assert filled == pytest.approx(2)
+	assert spent == pytest.approx(0.61)
+	assert vwap == pytest.approx(0.305)
+
+"""
+	A buy for a base amount stops in the middle of a level.
+"""
+def test_buy_base_amount():
+	vwap, filled, spent = simulate_buy(ASKS, base_amount=4)
+	assert filled == pytest.approx(4)
+	assert spent == pytest.approx(0.3 + 0.62 + 0.32)
+	assert vwap == pytest.approx(1.24 / 4)
+
+"""
+	A sell walks the bids, a larger order than the book is filled partially.
+"""
+def test_sell():
+	vwap, filled, received = simulate_sell(BIDS, 2)
+	assert filled == pytest.approx(2)
+	assert vwap == pytest.approx(0.285)
+	vwap, filled, received = simulate_sell(BIDS, 10)
+	assert filled == pytest.approx(7)
+	assert received == pytest.approx(0.29 + 0.56 + 1.08)
+
+"""
+	Nothing can be filled on an empty side.
+"""
+def test_empty_side():
+	assert simulate_buy([], quote_amount=1) == (None, 0, 0)
+	assert simulate_sell([], 1) == (None, 0, 0)
@@ -0,0 +1,54 @@
+import pytest
+from graph import ArbitrageGraph
+
+MARKETS = {
+	'ETH/BTC': {'base': 'ETH', 'quote': 'BTC'},
+	'LTC/ETH': {'base': 'LTC', 'quote': 'ETH'},
+	'LTC/BTC': {'base': 'LTC', 'quote': 'BTC'},
+	'BTC/USDT': {'base': 'BTC', 'quote': 'USDT'},
+	'BNB/USDT': {'base': 'BNB', 'quote': 'USDT'},
+	'BNB/BTC': {'base': 'BNB', 'quote': 'BTC'},
+}
+
+def graph(max_length=3):
+	return ArbitrageGraph(MARKETS, ArbitrageGraph.quotes(MARKETS), max_length=max_length, fee=lambda symbol, side: 1)
+
+"""
+	Every triangle is found once, whatever currency it is enumerated from.
+"""
+def test_cycles_through_every_quote_found_once():
+	arbitrage = graph()
+	cycles = [frozenset(arbitrage.describe(cycle)[0]) for cycle in arbitrage.cycles]
+	assert len(cycles) == len(set(cycles))
+	currencies = {frozenset(arbitrage.describe(cycle)[1]) for cycle in arbitrage.cycles}
+	assert currencies == {frozenset({'ETH', 'BTC', 'LTC'}), frozenset({'BTC', 'USDT', 'BNB'})}
+	# Two directions for each triangle
+	assert len(arbitrage.cycles) == 4
+
+"""
+	A mispriced triangle without ETH is detected, with its profit.
+"""
+def test_opportunity_through_usdt():
+	arbitrage = graph()
+	arbitrage.update('BTC/USDT', 30000, 30000)
+	arbitrage.update('BNB/USDT', 300, 300)
+	arbitrage.update('BNB/BTC', 0.0101, 0.0101)
+	opportunities = arbitrage.opportunities(0.5)
+	assert len(opportunities) == 1
+	delta, path, legs = opportunities[0]
+	assert delta == pytest.approx(1, abs=1e-6)
+	assert set(path) == {'BTC', 'USDT', 'BNB'}
+	assert ('BNB/BTC', 'sell') in legs
+
+"""
+	Incremental updates give the same sums as a full recomputation.
+"""
+def test_incremental_sums_match_refresh():
+	arbitrage = graph(max_length=4)
+	arbitrage.update('ETH/BTC', 0.05, 0.0501)
+	arbitrage.update('LTC/ETH', 0.3, 0.301)
+	arbitrage.update('LTC/BTC', 0.015, 0.0151)
+	arbitrage.update('LTC/ETH', 0.31, 0.311)
+	sums = arbitrage.sums.copy()
+	arbitrage.refresh()
+	assert sums == pytest.approx(arbitrage.sums)
@@ -0,0 +1,87 @@
+import time
+import pytest
+import config
+from ledger import BalanceLedger
+
+class Exchange:
+	id = 'binance'
+
+	def __init__(self, free):
+		self.free = free
+		self.calls = 0
+
+	def __str__(self):
+		return 'Binance'
+
+	def fetchBalance(self):
+		self.calls += 1
+		return {'free': dict(self.free)}
+
+"""
+	The ledger is seeded by the first read, later reads are local.
+"""
+def test_seeded_once():
+	ledger = BalanceLedger()
+	exchange = Exchange({'ETH': 2, 'LTC': None})
+	assert ledger.get(exchange, 'ETH') == 2
+	assert ledger.get(exchange, 'LTC') == 0
+	assert exchange.calls == 1
+
+"""
+	Fills move both assets, the fee applies to what we receive.
+"""
+def test_record_fill():
+	ledger = BalanceLedger()
+	exchange = Exchange({'ETH': 2, 'LTC': 0})
+	ledger.get(exchange, 'ETH')
+	ledger.record_fill(exchange, 'LTC', 'ETH', 'buy', 5, 0.3, 0.999)
+	assert ledger.get(exchange, 'LTC') == pytest.approx(4.995)
+	assert ledger.get(exchange, 'ETH') == pytest.approx(0.5)
+	ledger.record_fill(exchange, 'LTC', 'ETH', 'sell', 4, 0.3, 0.999)
+	assert ledger.get(exchange, 'LTC') == pytest.approx(0.995)
+	assert ledger.get(exchange, 'ETH') == pytest.approx(0.5 + 1.2 * 0.999)
+	assert exchange.calls == 1
+
+"""
+	A fill on an exchange never read is ignored, it is in the first fetch.
+"""
+def test_record_fill_before_seed():
+	ledger = BalanceLedger()
+	exchange = Exchange({'ETH': 2})
+	ledger.record_fill(exchange, 'LTC', 'ETH', 'buy', 5, 0.3, 0.999)
+	assert ledger.get(exchange, 'ETH') == 2
+
+"""
+	A reconciliation replaces the local balances and logs the drift.
+"""
+def test_reconcile_logs_drift():
+	logs = []
+	ledger = BalanceLedger(logs.append)
+	exchange = Exchange({'ETH': 2, 'LTC': 1})
+	ledger.get(exchange, 'ETH')
+	ledger.record_fill(exchange, 'LTC', 'ETH', 'sell', 1, 0.3, 1)
+	exchange.free = {'ETH': 2.3}
+	ledger.reconcile(exchange)
+	assert ledger.get(exchange, 'ETH') == 2.3
+	assert logs == []
+	exchange.free = {'ETH': 2}
+	ledger.reconcile(exchange)
+	assert ledger.get(exchange, 'ETH') == 2
+	assert len(logs) == 1
+	assert 'ETH' in logs[0]
+
+"""
+	The background thread reconciles when asked to.
+"""
+def test_request_reconcile(monkeypatch):
+	monkeypatch.setattr(config, 'LEDGER_RECONCILE_INTERVAL', 60)
+	ledger = BalanceLedger()
+	exchange = Exchange({'ETH': 2})
+	ledger.get(exchange, 'ETH')
+	exchange.free = {'ETH': 3}
+	ledger.request_reconcile()
+	for _ in range(100):
+		if (ledger.get(exchange, 'ETH') == 3):
+			break
+		time.sleep(0.01)
+	assert ledger.get(exchange, 'ETH') == 3
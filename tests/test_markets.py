@@ -0,0 +1,86 @@
+import pytest
+from markets import MarketRegistry
+
+class Exchange:
+	id = 'test'
+
+def registry(market, mode):
+	markets = MarketRegistry('/nonexistent')
+	markets.markets['test'] = {'LTC/ETH': MarketRegistry.metadata(market, mode)}
+	markets.loaded['test'] = float('inf')
+	return markets
+
+def market(price, amount):
+	return {
+		'precision': {'price': price, 'amount': amount},
+		'limits': {'amount': {'min': 0.1}, 'cost': {'min': 0.01}},
+	}
+
+"""
+	Decimal places precision: prices and amounts are rounded to a number of
+	decimals, buys down and sells up.
+"""
+def test_decimal_places():
+	markets = registry(market(6, 2), MarketRegistry.DECIMAL_PLACES)
+	assert markets.round_price(Exchange(), 'LTC/ETH', 0.31234567, 'buy') == 0.312345
+	assert markets.round_price(Exchange(), 'LTC/ETH', 0.31234567, 'sell') == 0.312346
+	assert markets.round_amount(Exchange(), 'LTC/ETH', 3.219) == 3.21
+
+"""
+	Tick size precision: the precision is the step itself.
+"""
+def test_tick_size():
+	markets = registry(market(0.05, 0.5), MarketRegistry.TICK_SIZE)
+	assert markets.round_price(Exchange(), 'LTC/ETH', 1.23, 'buy') == 1.2
+	assert markets.round_price(Exchange(), 'LTC/ETH', 1.23, 'sell') == 1.25
+	assert markets.round_price(Exchange(), 'LTC/ETH', 1.25, 'sell') == 1.25
+	assert markets.round_amount(Exchange(), 'LTC/ETH', 3.9) == 3.5
+
+"""
+	Significant digits precision: the step depends on the value.
+"""
+def test_significant_digits():
+	markets = registry(market(5, 3), MarketRegistry.SIGNIFICANT_DIGITS)
+	assert markets.round_price(Exchange(), 'LTC/ETH', 0.0123456, 'buy') == pytest.approx(0.012345)
+	assert markets.round_price(Exchange(), 'LTC/ETH', 1234.56, 'sell') == pytest.approx(1234.6)
+	assert markets.round_amount(Exchange(), 'LTC/ETH', 12.345) == pytest.approx(12.3)
+	assert markets.round_amount(Exchange(), 'LTC/ETH', 0.0012345) == pytest.approx(0.00123)
+
+"""
+	A symbol without precision is not rounded, an unknown one neither.
+"""
+def test_no_precision():
+	markets = registry({}, MarketRegistry.DECIMAL_PLACES)
+	assert markets.round_amount(Exchange(), 'LTC/ETH', 3.219) == 3.219
+	assert markets.round_price(Exchange(), 'XRP/ETH', 0.3123, 'buy') == 0.3123
+
+"""
+	Orders the exchange would refuse are told apart with a reason.
+"""
+def test_check():
+	markets = registry(market(6, 2), MarketRegistry.DECIMAL_PLACES)
+	exchange = Exchange()
+	assert markets.check(exchange, 'LTC/ETH', 1, 0.3) is None
+	assert markets.check(exchange, 'LTC/ETH', 1, None) is None
+	assert 'does not exist' in markets.check(exchange, 'XRP/ETH', 1, 0.3)
+	assert 'rounds to 0' in markets.check(exchange, 'LTC/ETH', markets.round_amount(exchange, 'LTC/ETH', 0.001), 0.3)
+	assert 'rounds to 0' in markets.check(exchange, 'LTC/ETH', 1, markets.round_price(exchange, 'LTC/ETH', 1e-7, 'buy'))
+	assert 'under minimum' in markets.check(exchange, 'LTC/ETH', 0.05, 0.3)
+	assert 'notional' in markets.check(exchange, 'LTC/ETH', 0.2, 0.01)
+	markets.markets['test']['LTC/ETH']['active'] = False
+	assert 'not active' in markets.check(exchange, 'LTC/ETH', 1, 0.3)
+
+"""
+	Only the alts whose two markets exist and are active are tradable.
+"""
+def test_tradable():
+	markets = MarketRegistry('/nonexistent')
+	markets.markets['test'] = {
+		'LTC/ETH': MarketRegistry.metadata({}, MarketRegistry.DECIMAL_PLACES),
+		'LTC/BTC': MarketRegistry.metadata({}, MarketRegistry.DECIMAL_PLACES),
+		'XRP/ETH': MarketRegistry.metadata({}, MarketRegistry.DECIMAL_PLACES),
+		'ADA/ETH': MarketRegistry.metadata({}, MarketRegistry.DECIMAL_PLACES),
+		'ADA/BTC': MarketRegistry.metadata({'active': False}, MarketRegistry.DECIMAL_PLACES),
+	}
+	markets.loaded['test'] = float('inf')
+	assert markets.tradable(Exchange(), ['LTC', 'XRP', 'ADA']) == ['LTC']
@@ -0,0 +1,75 @@
+import pytest
+from metrics import Histogram, Metrics
+
+class Exchange:
+	id = 'binance'
+
+"""
+	Every value falls in a bucket whose upper bound is at most 1 / SUB_BUCKETS
+	above it.
+"""
+def test_bucket_bounds():
+	for micros in list(range(100)) + [1000, 12345, 999999, 123456789]:
+		upper = Histogram.upper(Histogram.index(micros)) * 1e6
+		assert micros < upper <= max(micros * (1 + 1 / Histogram.SUB_BUCKETS), micros + 1) + 1e-6
+
+"""
+	The percentiles of uniform latencies are within the bucket error.
+"""
+def test_percentiles():
+	histogram = Histogram()
+	for ms in range(1, 1001):
+		histogram.record(ms / 1000)
+	assert histogram.count == 1000
+	assert histogram.max == 1
+	for percent in (50, 90, 99):
+		assert histogram.percentile(percent) == pytest.approx(percent / 100, rel=1 / Histogram.SUB_BUCKETS)
+	assert histogram.percentile(100) == 1
+	assert Histogram().percentile(99) == 0
+
+"""
+	A merged histogram has the percentiles of all the records.
+"""
+def test_merge():
+	fast, slow = Histogram(), Histogram()
+	for _ in range(90):
+		fast.record(0.001)
+	for _ in range(10):
+		slow.record(0.5)
+	fast.merge(slow)
+	assert fast.count == 100
+	assert fast.percentile(50) == pytest.approx(0.001, rel=0.1)
+	assert fast.percentile(99) == pytest.approx(0.5, rel=0.1)
+	assert fast.cumulative([0.01, 1]) == [90, 100]
+
+"""
+	Timers record the stage latencies and count their failures.
+"""
+def test_timer_and_counters():
+	metrics = Metrics()
+	with metrics.timer('fetch_order_book', Exchange(), 'LTC/ETH'):
+		pass
+	with pytest.raises(ValueError):
+		with metrics.timer('fetch_order_book', Exchange(), 'LTC/ETH'):
+			raise ValueError()
+	metrics.count('cache_hits', 'get_order_book', 'binance', n=3)
+	assert metrics.histograms[('fetch_order_book', 'binance', 'LTC/ETH')].count == 2
+	assert metrics.counters[('errors', 'fetch_order_book', 'binance', 'LTC/ETH')] == 1
+	assert metrics.counters[('cache_hits', 'get_order_book', 'binance', '')] == 3
+	lines = metrics.summary().split("\n")
+	assert len(lines) == 2
+	assert lines[1].split()[:4] == ['fetch_order_book', 'binance', '2', '1']
+
+"""
+	The export is in the Prometheus text format.
+"""
+def test_export():
+	metrics = Metrics()
+	metrics.observe(('fetch_order_book', 'binance', 'LTC/ETH'), 0.003)
+	metrics.count('cache_hits', 'get_order_book', 'binance')
+	text = metrics.export()
+	labels = 'stage="fetch_order_book",exchange="binance",symbol="LTC/ETH"'
+	assert 'triarb_stage_seconds_bucket{{{},le="0.001"}} 0'.format(labels) in text
+	assert 'triarb_stage_seconds_bucket{{{},le="0.005"}} 1'.format(labels) in text
+	assert 'triarb_stage_seconds_count{{{}}} 1'.format(labels) in text
+	assert 'cache_hits' in text
@@ -0,0 +1,81 @@
+import threading
+import time
+import pytest
+
+websocket = pytest.importorskip('websocket')
+import config
+from orders import OrderTracker
+
+class Exchange:
+	id = 'binance'
+
+	def fetchOrder(self, order_id, symbol):
+		raise Exception("unknown order")
+
+"""
+	Build an executionReport of a trade.
+"""
+def trade_report(order_id, trade_id, last, total, status, maker):
+	return {'e': 'executionReport', 'i': order_id, 'X': status, 'x': 'TRADE', 't': trade_id, 'l': str(last), 'z': str(total), 'm': maker}
+
+"""
+	The reports of the orders nobody tracks are not kept, except the last
+	ORDER_EARLY_REPORTS ones.
+"""
+def test_untracked_reports_are_bounded(monkeypatch):
+	monkeypatch.setattr(config, 'ORDER_EARLY_REPORTS', 10)
+	tracker = OrderTracker()
+	for i in range(100):
+		tracker.on_report(trade_report(i, i, 1, 1, 'FILLED', False))
+	assert tracker.states == {}
+	assert len(tracker.early) == 10
+	assert tracker.get('1') is None
+
+"""
+	A fill reported before the order is tracked is not lost.
+"""
+def test_early_report_is_kept():
+	tracker = OrderTracker()
+	tracker.on_report(trade_report(7, 1, 1, 1, 'PARTIALLY_FILLED', True))
+	tracker.track('7')
+	assert tracker.get('7') == {'status': OrderTracker.OPEN, 'filled': 1, 'maker': 1}
+	assert not tracker.early
+
+"""
+	The maker part of an order comes from the trades, each one counted once.
+"""
+def test_maker_part_from_trades():
+	tracker = OrderTracker()
+	tracker.track('7')
+	tracker.on_report(trade_report(7, 1, 1, 1, 'PARTIALLY_FILLED', True))
+	tracker.on_report(trade_report(7, 1, 1, 1, 'PARTIALLY_FILLED', True))
+	tracker.on_report(trade_report(7, 2, 2, 3, 'FILLED', False))
+	assert tracker.get('7') == {'status': OrderTracker.FILLED, 'filled': 3, 'maker': 1}
+
+"""
+	Resolved orders nobody forgot are dropped after ORDER_STATE_TTL, forgotten
+	ones are not brought back by a late report.
+"""
+def test_resolved_orders_expire(monkeypatch):
+	monkeypatch.setattr(config, 'ORDER_STATE_TTL', 0)
+	tracker = OrderTracker()
+	tracker.track('1')
+	tracker.track('2')
+	tracker.on_report(trade_report(1, 1, 1, 1, 'FILLED', False))
+	tracker.forget('2')
+	tracker.on_report(trade_report(2, 2, 1, 1, 'FILLED', False))
+	time.sleep(0.01)
+	tracker.track('3')
+	assert set(tracker.states) == {'3'}
+
+"""
+	A waiting thread is woken up by the report of the fill.
+"""
+def test_wait_resolved_by_report():
+	tracker = OrderTracker()
+	threading.Timer(0.05, tracker.on_report, args=(trade_report(5, 1, 2, 2, 'FILLED', False),)).start()
+	start = time.time()
+	state = tracker.wait(Exchange(), '5', 'LTC/ETH', 5)
+	assert state['status'] == OrderTracker.FILLED
+	assert state['filled'] == 2
+	assert time.time() - start < 1
@@ -0,0 +1,115 @@
+import pytest
+
+ccxt = pytest.importorskip('ccxt')
+import config
+from paper import PaperExchange
+
+class Source:
+	id = 'binance'
+	markets = {'LTC/ETH': {'maker': 0.001, 'taker': 0.002}}
+
+	def __init__(self, bids, asks):
+		self.order_book = {'bids': bids, 'asks': asks}
+
+	def __str__(self):
+		return 'Binance'
+
+	def fetchOrderBook(self, symbol, limit=None):
+		return self.order_book
+
+"""
+	A paper exchange without latency, whose books are only moved by feed.
+"""
+def paper(monkeypatch, fill_mode, bids, asks, balances=None):
+	monkeypatch.setattr(config, 'PAPER_BOOK_MAX_AGE', 3600)
+	return PaperExchange(Source(bids, asks), balances or {'ETH': 10, 'LTC': 10}, latency=0, jitter=0, fill_mode=fill_mode)
+
+"""
+	What an order takes at placement pays the taker fee, level by level.
+"""
+def test_take_at_placement(monkeypatch):
+	exchange = paper(monkeypatch, 'cross', [[0.29, 5]], [[0.3, 1], [0.31, 3]])
+	order = exchange.createLimitBuyOrder('LTC/ETH', 2, 0.31)
+	assert order['status'] == 'closed'
+	assert [(t['price'], t['amount'], t['takerOrMaker']) for t in order['trades']] == [(0.3, 1, 'taker'), (0.31, 1, 'taker')]
+	assert order['average'] == pytest.approx(0.305)
+	balance = exchange.fetchBalance()
+	assert balance['total']['ETH'] == pytest.approx(10 - 0.61)
+	assert balance['total']['LTC'] == pytest.approx(10 + 2 * 0.998)
+	assert balance['used']['ETH'] == pytest.approx(0)
+
+"""
+	A resting order is filled as maker when the book crosses it, and a book
+	that did not change does not fill it twice.
+"""
+def test_cross(monkeypatch):
+	exchange = paper(monkeypatch, 'cross', [[0.29, 5]], [[0.3, 1]])
+	order = exchange.createLimitBuyOrder('LTC/ETH', 2, 0.295)
+	assert order['status'] == 'open'
+	assert exchange.fetchBalance()['used']['ETH'] == pytest.approx(0.59)
+	exchange.feed('LTC/ETH', {'bids': [[0.29, 5]], 'asks': [[0.294, 1], [0.3, 1]]})
+	exchange.feed('LTC/ETH', {'bids': [[0.29, 5]], 'asks': [[0.294, 1], [0.3, 1]]})
+	order = exchange.fetchOrder(order['id'])
+	assert order['filled'] == 1
+	assert order['trades'][0]['takerOrMaker'] == 'maker'
+	assert order['trades'][0]['price'] == 0.295
+	assert exchange.fetchBalance()['total']['LTC'] == pytest.approx(10 + 0.999)
+
+"""
+	The best price is filled first, then the oldest order.
+"""
+def test_price_time_priority(monkeypatch):
+	exchange = paper(monkeypatch, 'cross', [[0.28, 5]], [[0.3, 1]])
+	first = exchange.createLimitBuyOrder('LTC/ETH', 1, 0.29)
+	second = exchange.createLimitBuyOrder('LTC/ETH', 1, 0.29)
+	best = exchange.createLimitBuyOrder('LTC/ETH', 1, 0.295)
+	exchange.feed('LTC/ETH', {'bids': [[0.28, 5]], 'asks': [[0.29, 1.5], [0.3, 1]]})
+	assert exchange.fetchOrder(best['id'])['filled'] == 1
+	assert exchange.fetchOrder(first['id'])['filled'] == 0.5
+	assert exchange.fetchOrder(second['id'])['filled'] == 0
+
+"""
+	In queue mode an order waits behind the size shown at its price when it
+	was placed, then the trades at its price fill the oldest order first.
+"""
+def test_queue(monkeypatch):
+	asks = [[0.3, 5]]
+	exchange = paper(monkeypatch, 'queue', [[0.29, 2], [0.28, 10]], asks)
+	first = exchange.createLimitBuyOrder('LTC/ETH', 1, 0.29)
+	second = exchange.createLimitBuyOrder('LTC/ETH', 1, 0.29)
+	exchange.feed('LTC/ETH', {'bids': [[0.29, 1], [0.28, 10]], 'asks': asks})
+	assert exchange.fetchOrder(first['id'])['filled'] == 0
+	exchange.feed('LTC/ETH', {'bids': [[0.29, 3], [0.28, 10]], 'asks': asks})
+	exchange.feed('LTC/ETH', {'bids': [[0.29, 1], [0.28, 10]], 'asks': asks})
+	first = exchange.fetchOrder(first['id'])
+	assert first['filled'] == 1
+	assert first['trades'][0]['takerOrMaker'] == 'maker'
+	assert exchange.fetchOrder(second['id'])['filled'] == 0
+	exchange.feed('LTC/ETH', {'bids': [[0.28, 10]], 'asks': asks})
+	assert exchange.fetchOrder(second['id'])['status'] == 'closed'
+
+"""
+	In instant mode a limit order is filled at once at its price, as taker
+	only if it crosses the book.
+"""
+def test_instant(monkeypatch):
+	exchange = paper(monkeypatch, 'instant', [[0.29, 5]], [[0.3, 1]])
+	taker = exchange.createLimitBuyOrder('LTC/ETH', 2, 0.3)
+	maker = exchange.createLimitSellOrder('LTC/ETH', 2, 0.31)
+	assert taker['status'] == maker['status'] == 'closed'
+	assert taker['trades'][0]['takerOrMaker'] == 'taker'
+	assert maker['trades'][0]['takerOrMaker'] == 'maker'
+	assert maker['fee']['cost'] == pytest.approx(2 * 0.31 * 0.001)
+
+"""
+	Funds locked by open orders can not be spent twice, and are given back on
+	cancel.
+"""
+def test_reserved_funds(monkeypatch):
+	exchange = paper(monkeypatch, 'cross', [[0.29, 5]], [[0.3, 1]], {'ETH': 1})
+	order = exchange.createLimitBuyOrder('LTC/ETH', 3, 0.29)
+	with pytest.raises(ccxt.InsufficientFunds):
+		exchange.createLimitBuyOrder('LTC/ETH', 1, 0.29)
+	exchange.cancelOrder(order['id'])
+	assert exchange.fetchBalance()['free']['ETH'] == pytest.approx(1)
+	assert exchange.fetchOrder(order['id'])['status'] == 'canceled'
@@ -0,0 +1,101 @@
+import time
+import pytest
+
+ccxt = pytest.importorskip('ccxt')
+import config
+from ratelimit import RateLimiter
+
+class Exchange:
+	id = 'binance'
+
+	def __init__(self, headers=None, error=None):
+		self.last_response_headers = headers or {}
+		self.error = error
+		self.calls = 0
+
+	def __str__(self):
+		return 'Binance'
+
+	def fetch2(self, path, api='public', method='GET', params={}, headers=None, body=None):
+		self.calls += 1
+		if (self.error is not None):
+			raise self.error
+		return {}
+
+"""
+	Every limiter gets its own bucket, of 100 tokens refilled in 10 seconds.
+"""
+@pytest.fixture
+def limiter(monkeypatch):
+	monkeypatch.setattr(RateLimiter, 'states', {})
+	monkeypatch.setattr(config, 'RATE_LIMITS', {'binance': (100, 10)})
+	monkeypatch.setattr(config, 'RATE_LIMIT_MARGIN', 1)
+	monkeypatch.setattr(config, 'RATE_LIMIT_SHARED', False)
+	return lambda exchange: RateLimiter(exchange)
+
+"""
+	The Binance weights depend on the endpoint and its parameters.
+"""
+def test_weights(limiter):
+	rate = limiter(Exchange())
+	assert rate.weight('depth', params={'limit': 100}) == 5
+	assert rate.weight('depth', params={'limit': 1000}) == 50
+	assert rate.weight('ticker/bookTicker', params={'symbol': 'LTCETH'}) == 2
+	assert rate.weight('ticker/bookTicker') == 4
+	assert rate.weight('order', 'GET') == 4
+	assert rate.weight('order', 'POST') == 1
+	assert rate.weight('time') == 1
+
+"""
+	Tokens are taken until the bucket is empty, then refilled at the budget.
+"""
+def test_token_bucket(limiter):
+	rate = limiter(Exchange())
+	assert rate.reserve(60) == 0
+	assert rate.reserve(40) == 0
+	wait = rate.reserve(5)
+	assert wait == pytest.approx(0.5, abs=0.05)
+	time.sleep(wait)
+	assert rate.reserve(5) == 0
+
+"""
+	The bucket follows the weight the exchange says we used.
+"""
+def test_follows_headers(limiter):
+	rate = limiter(Exchange())
+	rate.observe({'X-MBX-USED-WEIGHT-1M': '90'})
+	assert rate.reserve(10) == 0
+	assert rate.reserve(10) > 0
+
+"""
+	A 429 blocks until Retry-After and halves the refill rate, which grows
+	back on success.
+"""
+def test_penalize(limiter, monkeypatch):
+	monkeypatch.setattr(config, 'RATE_LIMIT_RECOVERY', 0.1)
+	rate = limiter(Exchange())
+	rate.penalize({'Retry-After': '0.2'})
+	with rate.state as values:
+		assert values[3] == 0.5
+	assert rate.reserve(1) == pytest.approx(0.2, abs=0.05)
+	rate.observe({})
+	with rate.state as values:
+		assert values[3] == pytest.approx(0.6)
+
+"""
+	The installed limiter counts the requests and penalizes on a DDoSProtection.
+"""
+def test_install(limiter):
+	exchange = Exchange(headers={'x-mbx-used-weight-1m': '50'})
+	limiter(exchange).install()
+	exchange.fetch2('depth', 'public', 'GET', {'limit': 100})
+	assert exchange.calls == 1
+	assert exchange.enableRateLimit is False
+	with RateLimiter.states['binance'] as values:
+		assert values[0] == pytest.approx(50)
+	exchange.error = ccxt.DDoSProtection('banned')
+	exchange.last_response_headers = {'Retry-After': '5'}
+	with pytest.raises(ccxt.DDoSProtection):
+		exchange.fetch2('depth', 'public', 'GET', {'limit': 100})
+	with RateLimiter.states['binance'] as values:
+		assert values[2] > time.time() + 4
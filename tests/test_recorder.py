@@ -0,0 +1,62 @@
+import queue
+import numpy as np
+from book import Book
+from metrics import Metrics
+from recorder import BookRecorder, BookReader, BID, ASK, SNAPSHOT, UPDATE, TICKER, GAP
+
+class Exchange:
+	id = 'binance'
+
+	def __str__(self):
+		return 'Binance'
+
+def book():
+	return Book.from_ccxt({'bids': [[0.3, 1], [0.29, 2]], 'asks': [[0.31, 3]]})
+
+"""
+	Recorded books, levels and tickers are read back with their symbol.
+"""
+def test_round_trip(tmp_path):
+	recorder = BookRecorder(str(tmp_path))
+	exchange = Exchange()
+	recorder.record_book(exchange, 'LTC/ETH', book())
+	recorder.record_levels(exchange, 'LTC/ETH', [[0.3, 0]], [[0.32, 4]])
+	recorder.record_ticker(exchange, 'ETH/BTC', {'bid': 0.05, 'ask': 0.0501})
+	recorder.close()
+	reader = BookReader(str(tmp_path))
+	days = reader.days('binance')
+	assert len(days) == 1
+	assert set(reader.symbols('binance', days[0])) == {'LTC/ETH', 'ETH/BTC'}
+	records = reader.records('binance', days[0], 'LTC/ETH')
+	assert list(records['kind']) == [SNAPSHOT] * 3 + [UPDATE] * 2
+	assert list(records['side']) == [BID, BID, ASK, BID, ASK]
+	assert np.allclose(records['price'], [0.3, 0.29, 0.31, 0.3, 0.32])
+	assert np.allclose(records['size'], [1, 2, 3, 0, 4])
+	tickers = reader.records('binance', days[0], 'ETH/BTC')
+	assert list(tickers['kind']) == [TICKER, TICKER]
+	assert np.allclose(tickers['price'], [0.05, 0.0501])
+
+"""
+	Records dropped on a full queue are counted and logged, and the next
+	record of the symbol is preceded by a GAP.
+"""
+def test_dropped_records_leave_a_gap(tmp_path):
+	logs = []
+	metrics = Metrics()
+	recorder = BookRecorder(str(tmp_path), log=logs.append, metrics=metrics)
+	# The writer waits on the first queue, this one is never read
+	recorder.queue = queue.Queue(maxsize=2)
+	exchange = Exchange()
+	recorder.record_levels(exchange, 'LTC/ETH', [[0.3, 1]], [])
+	recorder.record_levels(exchange, 'LTC/ETH', [[0.3, 2]], [])
+	recorder.record_levels(exchange, 'LTC/ETH', [[0.3, 3]], [])
+	recorder.record_levels(exchange, 'LTC/ETH', [[0.3, 4]], [])
+	assert recorder.dropped == 2
+	assert recorder.lost(exchange, 'LTC/ETH')
+	assert len(logs) == 1
+	assert metrics.counters[('dropped', 'recorder', 'binance', 'LTC/ETH')] == 2
+	recorder.queue.get_nowait()
+	recorder.queue.get_nowait()
+	recorder.record_book(exchange, 'LTC/ETH', book())
+	assert not recorder.lost(exchange, 'LTC/ETH')
+	assert [recorder.queue.get_nowait()[4] for _ in range(2)] == [GAP, SNAPSHOT]
@@ -0,0 +1,59 @@
+import time
+import pytest
+import config
+from scheduler import PriorityScheduler
+
+"""
+	New alts are due at once, within the budget.
+"""
+def test_new_alts_due():
+	scheduler = PriorityScheduler()
+	scheduler.sync(['LTC', 'XRP', 'ADA'])
+	assert sorted(scheduler.next(2) + scheduler.next(2)) == ['ADA', 'LTC', 'XRP']
+	assert scheduler.next(2) == []
+
+"""
+	An alt near the threshold is scanned again sooner than one far from it.
+"""
+def test_near_threshold_first(monkeypatch):
+	monkeypatch.setattr(config, 'THRESHOLD', 0)
+	scheduler = PriorityScheduler(max_interval=30)
+	scheduler.sync(['LTC', 'XRP'])
+	scheduler.next(2)
+	scheduler.record('LTC', -0.01)
+	scheduler.record('XRP', -5)
+	state = {row['alt']: row for row in scheduler.state()}
+	assert state['LTC']['due'] < 1
+	assert state['XRP']['due'] == pytest.approx(30, abs=1)
+	assert scheduler.state()[0]['alt'] == 'LTC'
+
+"""
+	A moving estimate is scanned sooner than a quiet one at the same level.
+"""
+def test_volatility_shortens_interval(monkeypatch):
+	monkeypatch.setattr(config, 'THRESHOLD', 0)
+	monkeypatch.setattr(config, 'SCHEDULER_GAP_SCALE', 10)
+	scheduler = PriorityScheduler(max_interval=30)
+	scheduler.sync(['LTC', 'XRP'])
+	for delta in [-2, -2, -2]:
+		scheduler.record('LTC', delta)
+	for delta in [-1, -3, -2]:
+		scheduler.record('XRP', delta)
+	state = {row['alt']: row for row in scheduler.state()}
+	assert state['XRP']['volatility'] > state['LTC']['volatility'] == 0
+	assert state['XRP']['due'] < state['LTC']['due']
+
+"""
+	An alt whose estimation is not recorded is due again after its maximum
+	interval, removed alts are never returned.
+"""
+def test_unrecorded_and_removed():
+	scheduler = PriorityScheduler(max_interval=30)
+	scheduler.sync(['LTC', 'XRP'], {'XRP': 0.05})
+	assert sorted(scheduler.next(10)) == ['LTC', 'XRP']
+	assert scheduler.next(10) == []
+	time.sleep(0.1)
+	assert scheduler.next(10) == ['XRP']
+	scheduler.sync(['LTC'])
+	assert scheduler.next(10) == []
+	assert scheduler.wait() > 29
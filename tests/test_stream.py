@@ -0,0 +1,104 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer
+import pytest
+
+websocket = pytest.importorskip('websocket')
+from stream import DepthStream
+
+"""
+	Build a depthUpdate event of LTC/ETH.
+"""
+def depth_event(first, last, bid, ask, size):
+	return {'e': 'depthUpdate', 'E': last * 10, 's': 'LTCETH', 'U': first, 'u': last, 'b': [[bid, size]], 'a': [[ask, size]]}
+
+def free_port():
+	with socket.socket() as sock:
+		sock.bind(('127.0.0.1', 0))
+		return sock.getsockname()[1]
+
+class Exchange:
+	id = 'binance'
+
+"""
+	A gap found while replaying the buffered events keeps the events after
+	it, and the next snapshot is followed by all of them.
+"""
+def test_resync_keeps_events_after_gap():
+	snapshots = [
+		{'nonce': 4, 'bids': [[0.3, 1]], 'asks': [[0.31, 1]]},
+		{'nonce': 7, 'bids': [[0.3, 1]], 'asks': [[0.31, 1]]},
+	]
+	stream = DepthStream(Exchange(), ['LTC/ETH'], snapshot=lambda symbol: snapshots.pop(0))
+	stream.running = True
+	stream.syncing.add('LTC/ETH')
+	stream.pending['LTC/ETH'] = [
+		depth_event(5, 5, 0.29, 0.32, 5),
+		depth_event(6, 6, 0.28, 0.33, 6),
+		depth_event(8, 8, 0.27, 0.34, 8),
+		depth_event(9, 9, 0.26, 0.35, 9),
+	]
+	stream.resync('LTC/ETH')
+	assert not snapshots
+	assert stream.is_synced('LTC/ETH')
+	book = stream.books['LTC/ETH'].to_ccxt()
+	assert book['nonce'] == 9
+	assert [0.26, 9.0] in book['bids']
+	assert [0.35, 9.0] in book['asks']
+
+"""
+	Replay a session through the feed server, dropping updates, and check the
+	stream resyncs to the same book as the server.
+"""
+def test_stream_resyncs_against_feed_server(tmp_path):
+	pytest.importorskip('websockets')
+	import websockets
+	import feed_server
+	path = tmp_path / 'session.jsonl'
+	with open(path, 'w') as file:
+		file.write(json.dumps({'type': 'snapshot', 'symbol': 'LTC/ETH', 'book': {'nonce': 1, 'bids': [[0.3, 1]], 'asks': [[0.31, 1]]}}) + '\n')
+		for i in range(2, 61):
+			event = depth_event(i, i, round(0.3 - i * 0.0001, 6), round(0.31 + i * 0.0001, 6), i)
+			file.write(json.dumps({'stream': 'ltceth@depth@100ms', 'data': event}) + '\n')
+	server = feed_server.FeedServer(str(path), speed=1, drop_every=20)
+	ws_port = free_port()
+	http = ThreadingHTTPServer(('127.0.0.1', 0), feed_server.snapshot_handler(server))
+	threading.Thread(target=http.serve_forever, daemon=True).start()
+	done = threading.Event()
+	replayed = threading.Event()
+
+	async def serve():
+		async with websockets.serve(server.handler, '127.0.0.1', ws_port):
+			while (not server.clients):
+				await asyncio.sleep(0.01)
+			await server.replay()
+			replayed.set()
+			while (not done.is_set()):
+				await asyncio.sleep(0.05)
+	threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+
+	fetch = feed_server.snapshot_fetcher('http://127.0.0.1:{}'.format(http.server_address[1]))
+	fetched = []
+	def snapshot(symbol):
+		fetched.append(symbol)
+		return fetch(symbol)
+	stream = DepthStream(Exchange(), ['LTC/ETH'], url='ws://127.0.0.1:{}/stream'.format(ws_port), snapshot=snapshot)
+	stream.start()
+	try:
+		assert replayed.wait(10)
+		deadline = time.time() + 5
+		while (time.time() < deadline):
+			if (stream.is_synced('LTC/ETH') and stream.books['LTC/ETH'].to_ccxt() == server.snapshot('LTC/ETH')):
+				break
+			time.sleep(0.05)
+		assert stream.books['LTC/ETH'].to_ccxt() == server.snapshot('LTC/ETH')
+		assert stream.books['LTC/ETH'].last_update_id == 60
+		# The first sync, then one resync per dropped update
+		assert len(fetched) >= 3
+	finally:
+		done.set()
+		stream.stop()
+		http.shutdown()
@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+import config
+
+"""
+	Universe of tradable triangles.
+	Instead of static lists, the alts are taken from the loaded markets: every
+	alt with an active ALT/ETH and ALT/BTC market. They are ranked with the 24h
+	volume of their thinnest leg, their spread and how often their estimations
+	came close to the threshold. The best UNIVERSE_HOT_SIZE alts are hot, the
+	others are cold and may wait UNIVERSE_COLD_EVERY times longer between two
+	scans. The ranking is refreshed every UNIVERSE_REFRESH_INTERVAL seconds.
+	For example:
+	universe = UniverseManager(crypto, crypto.binance)
+	alts = universe.refresh()
+	universe.record('LTC', -0.4)
+"""
+class UniverseManager:
+
+	def __init__(self, crypto, exchange):
+		self.crypto = crypto
+		self.exchange = exchange
+		self.lock = threading.Lock()
+		self.alts = []
+		self.hot = []
+		self.cold = []
+		self.stats = {}
+		self.scores = {}
+		self.hits = {}
+		self.refreshed = 0
+
+	"""
+		Get every alt that has an active ALT/ETH and ALT/BTC market.
+	"""
+	def triangles(self):
+		markets = self.crypto.markets.all(self.exchange)
+		alts = set()
+		for symbol, market in markets.items():
+			base, quote = symbol.split('/') if '/' in symbol else (None, None)
+			if (quote == 'ETH' and base != 'BTC' and market['active']):
+				other = markets.get('{}/BTC'.format(base))
+				if (other and other['active']):
+					alts.add(base)
+		return sorted(alts)
+
+	"""
+		Get the 24h volume in BTC of the thinnest leg and the widest relative
+		spread of an alt.
+		tickers:	the ccxt tickers keyed by symbol.
+		returns:	the volume and the spread, None if a ticker is missing.
+	"""
+	@staticmethod
+	def liquidity(tickers, alt):
+		alt_ETH = tickers.get('{}/ETH'.format(alt))
+		alt_BTC = tickers.get('{}/BTC'.format(alt))
+		ETH_BTC = tickers.get('ETH/BTC')
+		if (not alt_ETH or not alt_BTC or not ETH_BTC or not ETH_BTC.get('last')):
+			return None
+		volume = min((alt_ETH.get('quoteVolume') or 0) * ETH_BTC['last'], alt_BTC.get('quoteVolume') or 0)
+		spreads = []
+		for ticker in (alt_ETH, alt_BTC):
+			if (not ticker.get('bid') or not ticker.get('ask')):
+				return None
+			spreads.append((ticker['ask'] - ticker['bid']) / ((ticker['ask'] + ticker['bid']) / 2))
+		return volume, max(spreads)
+
+	"""
+		Get the hit rate of an alt: the share of its estimations that were
+		within UNIVERSE_NEAR_MARGIN of the threshold.
+	"""
+	def hit_rate(self, alt):
+		hits, total = self.hits.get(alt, (0, 0))
+		if (total == 0):
+			return 0
+		return hits / total
+
+	"""
+		Score an alt, higher is better.
+	"""
+	def score(self, alt, volume, spread):
+		return math.log1p(volume) * (1 + config.UNIVERSE_HIT_WEIGHT * self.hit_rate(alt)) / (1 + 100 * spread)
+
+	"""
+		Rebuild the universe from the markets and the 24h tickers.
+		returns:	the ranked alts.
+	"""
+	def refresh(self):
+		alts = self.triangles()
+		try:
+			tickers = self.exchange.fetchTickers()
+		except Exception as e:
+			self.crypto.log("Error while fetching tickers for the universe: {}".format(str(e)))
+			tickers = {}
+		stats = {}
+		for alt in alts:
+			liquidity = UniverseManager.liquidity(tickers, alt)
+			if (liquidity is None):
+				if (not tickers):
+					stats[alt] = (0, 0)
+				continue
+			volume, spread = liquidity
+			if (volume >= config.UNIVERSE_MIN_VOLUME_BTC and spread <= config.UNIVERSE_MAX_SPREAD):
+				stats[alt] = (volume, spread)
+		with self.lock:
+			self.stats = stats
+			self.scores = {alt: self.score(alt, volume, spread) for alt, (volume, spread) in stats.items()}
+			self.alts = sorted(stats, key=lambda alt: -self.scores[alt])
+			self.hot = self.alts[:config.UNIVERSE_HOT_SIZE]
+			self.cold = self.alts[config.UNIVERSE_HOT_SIZE:]
+			self.refreshed = time.time()
+		self.crypto.log("Universe of {}: {} triangles, {} hot, {} pruned".format(str(self.exchange), len(self.alts), len(self.hot), len(alts) - len(self.alts)))
+		return self.alts
+
+	"""
+		Check if the universe must be ranked again.
+	"""
+	def expired(self):
+		return time.time() - self.refreshed > config.UNIVERSE_REFRESH_INTERVAL
+
+	"""
+		Get the longest time each alt may wait between two scans, longer for
+		the cold ones.
+		returns:	a dict of seconds keyed by alt.
+	"""
+	def max_intervals(self):
+		with self.lock:
+			intervals = {alt: config.SCHEDULER_MAX_INTERVAL * config.UNIVERSE_COLD_EVERY for alt in self.cold}
+			intervals.update({alt: config.SCHEDULER_MAX_INTERVAL for alt in self.hot})
+		return intervals
+
+	"""
+		Record an estimation to compute the hit rate of an alt.
+		alt:	the estimated alt.
+		delta:	the best estimated percentage.
+	"""
+	def record(self, alt, delta):
+		with self.lock:
+			hits, total = self.hits.get(alt, (0, 0))
+			hit = 1 if delta > config.THRESHOLD - config.UNIVERSE_NEAR_MARGIN else 0
+			self.hits[alt] = (hits + hit, total + 1)